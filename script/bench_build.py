@@ -0,0 +1,306 @@
+"""build.py 的基准测试脚本
+
+在临时 Git 项目中用一个假的 go 可执行文件替代真实工具链, 通过 build.py 的
+真实入口执行单平台与批量构建, 测量构建脚本自身的开销:
+不同并发数下的吞吐量、每个目标的编排开销与打包速度。
+
+假工具链的行为由环境变量控制: 模拟编译耗时、输出文件大小与失败概率,
+因此无需安装 Go 即可发现调度、环境构造、打包与 Git 探测等环节的性能回退。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from build import print_success, print_error  # noqa: E402
+
+
+BUILD_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "build.py")
+
+# 假 go 可执行文件的实现, 只模拟 build.py 会调用的子命令
+FAKE_GO_SOURCE = r'''
+import os
+import sys
+import time
+import random
+
+args = sys.argv[1:]
+command = args[0] if args else ""
+latency = float(os.environ.get("FAKE_GO_LATENCY", "0"))
+check_latency = float(os.environ.get("FAKE_GO_CHECK_LATENCY", "0"))
+goos = os.environ.get("GOOS", "linux")
+goarch = os.environ.get("GOARCH", "amd64")
+
+if command == "version":
+    print(f"go version go1.22.0 {goos}/{goarch}")
+elif command == "env":
+    defaults = {
+        "GOCACHE": os.path.join(os.environ["FAKE_GO_ROOT"], "gocache"),
+        "GOMODCACHE": os.path.join(os.environ["FAKE_GO_ROOT"], "gomodcache"),
+        "GOPATH": os.path.join(os.environ["FAKE_GO_ROOT"], "gopath"),
+        "GOROOT": os.environ["FAKE_GO_ROOT"],
+    }
+    for name in args[1:]:
+        print(os.environ.get(name) or defaults.get(name, ""))
+elif command == "list":
+    print("runtime\nfmt\nos")
+elif command == "tool":
+    print("darwin/amd64\ndarwin/arm64\nlinux/386\nlinux/amd64\nlinux/arm\nlinux/arm64\nlinux/riscv64\nwindows/386\nwindows/amd64\nwindows/arm\nwindows/arm64")
+elif command == "build":
+    if "-o" not in args:
+        # 预热阶段编译标准库
+        time.sleep(latency / 4)
+        sys.exit(0)
+    time.sleep(latency)
+    if random.random() < float(os.environ.get("FAKE_GO_FAIL_RATE", "0")):
+        print(f"fake: simulated compile error for {goos}/{goarch}", file=sys.stderr)
+        sys.exit(1)
+    output = args[args.index("-o") + 1]
+    size = int(os.environ.get("FAKE_GO_OUTPUT_SIZE", "0"))
+    with open(output, "wb") as f:
+        # 一半随机字节一半重复字节, 接近真实可执行文件的压缩率
+        f.write(os.urandom(size // 2))
+        f.write(b"\0" * (size - size // 2))
+else:
+    # mod tidy/vendor/download, vet, fmt
+    time.sleep(check_latency)
+'''
+
+
+def create_toolchain(root):
+    """在 root/bin 下生成假的 go 可执行文件, 返回 bin 目录"""
+    bin_dir = os.path.join(root, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    source = os.path.join(bin_dir, "fake_go.py")
+    with open(source, "w", encoding="utf-8") as f:
+        f.write(FAKE_GO_SOURCE)
+    if os.name == "nt":
+        with open(os.path.join(bin_dir, "go.bat"), "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{source}" %*\n')
+    else:
+        go_path = os.path.join(bin_dir, "go")
+        with open(go_path, "w", encoding="utf-8") as f:
+            f.write(f"#!{sys.executable}\n")
+            f.write(FAKE_GO_SOURCE)
+        os.chmod(go_path, 0o755)
+    return bin_dir
+
+
+def create_project(root):
+    """创建一个带有提交与标签的最小 Go 项目, 返回项目目录"""
+    project = os.path.join(root, "project")
+    os.makedirs(project, exist_ok=True)
+    with open(os.path.join(project, "go.mod"), "w", encoding="utf-8") as f:
+        f.write("module example.com/bench\n\ngo 1.21\n")
+    with open(os.path.join(project, "main.go"), "w", encoding="utf-8") as f:
+        f.write('package main\n\nfunc main() {}\n')
+    git = ["git", "-c", "user.name=bench", "-c", "user.email=bench@example.com"]
+    for command in (
+        ["init", "-q"],
+        ["add", "."],
+        ["commit", "-q", "-m", "init"],
+        ["tag", "v0.1.0"],
+    ):
+        subprocess.run(git + command, cwd=project, check=True, capture_output=True)
+    return project
+
+
+def run_build(project, env, build_args):
+    """执行一次 build.py, 返回 (墙钟耗时, 追踪事件列表, 退出码)"""
+    trace_file = os.path.join(project, "trace.json")
+    shutil.rmtree(os.path.join(project, "output"), ignore_errors=True)
+    start_time = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, BUILD_SCRIPT, *build_args, "--trace", trace_file],
+        cwd=project,
+        env=env,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+    )
+    elapsed = time.perf_counter() - start_time
+    events = []
+    if os.path.exists(trace_file):
+        with open(trace_file, "r", encoding="utf-8") as f:
+            events = [e for e in json.load(f)["traceEvents"] if e["ph"] == "X"]
+    if result.returncode != 0 and not events:
+        print_error(result.stdout.strip() or result.stderr.strip())
+    return elapsed, events, result.returncode
+
+
+def summarize_targets(events, latency):
+    """由追踪事件计算各目标耗时、编排开销(秒)以及打包总耗时与打包次数"""
+    builds = {
+        e["name"][len("build "):]: e["dur"] / 1e6
+        for e in events
+        if e["cat"] == "target"
+    }
+    overheads = [max(0.0, duration - latency) for duration in builds.values()]
+    archives = [
+        e["dur"] / 1e6
+        for e in events
+        if e["cat"] == "archive" and e["name"].startswith("archive ")
+    ]
+    return builds, overheads, sum(archives), len(archives)
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="使用假 Go 工具链测量 build.py 自身的开销")
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="模拟单个目标的编译耗时(秒), 默认0.2"
+    )
+    parser.add_argument(
+        "--check-latency",
+        type=float,
+        default=0.0,
+        help="模拟 tidy/vet/fmt 等检查命令的耗时(秒), 默认0",
+    )
+    parser.add_argument(
+        "--size",
+        type=float,
+        default=8.0,
+        help="模拟输出文件的大小(MB), 默认8",
+    )
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.0, help="模拟编译失败的概率(0~1), 默认0"
+    )
+    parser.add_argument(
+        "--workers",
+        default="1,2,4,8",
+        help="需要对比吞吐量的并发数列表, 逗号分隔, 默认1,2,4,8",
+    )
+    parser.add_argument(
+        "--archs",
+        default="amd64,arm64,386",
+        help="批量构建的架构列表, 逗号分隔, 默认amd64,arm64,386",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="每组参数重复执行的次数, 默认3"
+    )
+    parser.add_argument(
+        "--archive-format", default="zip", help="打包格式, 默认zip"
+    )
+    parser.add_argument(
+        "--json", default=None, help="将结果以 JSON 格式写入指定文件, 便于对比两次结果"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="保留临时目录, 便于检查产物与追踪文件"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    root = tempfile.mkdtemp(prefix="verman-bench-")
+    results = {"config": vars(args).copy(), "single": {}, "batch": []}
+    try:
+        bin_dir = create_toolchain(root)
+        project = create_project(root)
+        env = dict(os.environ)
+        env.update(
+            PATH=bin_dir + os.pathsep + env.get("PATH", ""),
+            # 缓存、历史记录与预热记录写入临时目录, 不影响本机的真实缓存
+            HOME=root,
+            USERPROFILE=root,
+            FAKE_GO_ROOT=root,
+            FAKE_GO_LATENCY=str(args.latency),
+            FAKE_GO_CHECK_LATENCY=str(args.check_latency),
+            FAKE_GO_OUTPUT_SIZE=str(int(args.size * 1024 * 1024)),
+            FAKE_GO_FAIL_RATE=str(args.fail_rate),
+        )
+        common = ["-git", "--no-cache", "--archive-format", args.archive_format]
+
+        # 单平台构建: 走 main() 的完整路径
+        walls, overheads = [], []
+        for _ in range(args.repeat):
+            elapsed, events, _ = run_build(project, env, [*common, "-z"])
+            walls.append(elapsed)
+            _, target_overheads, _, _ = summarize_targets(events, args.latency)
+            overheads.extend(target_overheads)
+        results["single"] = {"wall": median(walls), "target_overhead": median(overheads)}
+        print_success(
+            f"单平台构建: 墙钟 {median(walls):.3f} 秒, 目标编排开销 {median(overheads) * 1000:.1f} 毫秒"
+        )
+
+        # 批量构建: 对比不同并发数下的吞吐量
+        print_success(
+            f"{'并发数':>6} {'目标数':>6} {'墙钟(s)':>9} {'吞吐(个/s)':>11} {'开销(ms)':>9} {'打包(MB/s)':>11} {'失败':>4}"
+        )
+        for workers in [int(w) for w in args.workers.split(",")]:
+            walls, overheads, failures = [], [], 0
+            archive_time, archive_count, target_count = 0.0, 0, 0
+            for _ in range(args.repeat):
+                elapsed, events, _ = run_build(
+                    project,
+                    env,
+                    [
+                        *common,
+                        "-batch",
+                        "-z",
+                        "--no-warmup",
+                        "--batch-archs",
+                        args.archs,
+                        "-w",
+                        str(workers),
+                    ],
+                )
+                builds, target_overheads, spent, count = summarize_targets(
+                    events, args.latency
+                )
+                walls.append(elapsed)
+                overheads.extend(target_overheads)
+                archive_time += spent
+                archive_count += count
+                target_count = len(builds)
+                failures += sum(
+                    1
+                    for e in events
+                    if e["cat"] == "target" and not e.get("args", {}).get("ok")
+                )
+            wall = median(walls)
+            row = {
+                "workers": workers,
+                "targets": target_count,
+                "wall": wall,
+                "throughput": target_count / wall if wall else 0.0,
+                "target_overhead": median(overheads),
+                "archive_mb_per_s": (
+                    archive_count * args.size / archive_time if archive_time else 0.0
+                ),
+                "failures": failures,
+            }
+            results["batch"].append(row)
+            print_success(
+                f"{workers:>6} {target_count:>6} {wall:>9.3f} {row['throughput']:>11.2f} {row['target_overhead'] * 1000:>9.1f} {row['archive_mb_per_s']:>11.1f} {failures:>4}"
+            )
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            print_success(f"已写入结果文件: {args.json}")
+    finally:
+        if args.keep:
+            print_success(f"临时目录已保留: {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
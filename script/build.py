@@ -1,15 +1,34 @@
+import time
+
+# 脚本开始执行的时间, --profile-startup 据此统计导入模块的耗时
+SCRIPT_START_TIME = time.perf_counter()
+
 import os
+import re
+import json
+import shutil
+import tempfile
+import hashlib
+import hmac
 import subprocess
 import sys
 import argparse
-import time
-import zipfile
+import signal
+import contextvars
+import collections
+import select
+import struct
 from datetime import datetime, timezone
 import platform
 import threading
-import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+from dataclasses import dataclass, replace
+from typing import Optional
+
+# 只在打包、远程缓存、监视等少数路径上使用的模块(zipfile、tarfile、urllib、ctypes、
+# multiprocessing 等)在使用处导入, 不计入每次启动的耗时
+IMPORTS_END_TIME = time.perf_counter()
 
 
 ############################### 以下为可配置的变量 #################################
@@ -33,10 +52,26 @@ DEFAULT_SIMPLE_NAME = False
 DEFAULT_CURRENT_PLATFORM_ONLY = False
 # 是否将构建成功的可执行文件打包为zip文件, 默认为False
 DEFAULT_PACKAGE_ZIP = False
-# 批量构建时默认的并发线程数
-DEFAULT_CONCURRENCY = max(1, os.cpu_count() - 1)  # 使用CPU核心数-1
+# 默认的打包格式, 可选值见 ARCHIVE_FORMATS
+DEFAULT_ARCHIVE_FORMAT = "zip"
+# 默认的压缩级别, None 表示使用各格式自身的默认级别
+DEFAULT_COMPRESS_LEVEL = None
+# 是否在输出目录生成 SHA256SUMS 与 JSON 清单, 默认为True
+DEFAULT_WRITE_CHECKSUMS = True
+# 批量构建时默认的目标平台列表
+DEFAULT_BATCH_PLATFORMS = ["windows", "linux", "darwin"]
+# 批量构建时默认的目标架构列表, 可选值见 SUPPORTED_ARCHITECTURES
+DEFAULT_BATCH_ARCHITECTURES = ["amd64"]
+# 批量构建时默认的并发线程数, 0 表示根据 CPU 配额与可用内存自动计算(可用CPU数-1)
+DEFAULT_CONCURRENCY = 0
+# 单个 go build 进程预估占用的内存(字节), 用于限制并发数与内存不足时暂缓启动新目标
+DEFAULT_BUILD_MEMORY = 1024 * 1024 * 1024
 # 批量构建时默认的超时时间(秒)
 DEFAULT_TIMEOUT = 1800
+# 监视模式下合并连续修改的静默时间(秒), 最后一次修改后等待该时间再重新构建
+DEFAULT_WATCH_DEBOUNCE = 0.3
+# 监视模式下无法使用 inotify 时的轮询间隔(秒)
+DEFAULT_WATCH_POLL_INTERVAL = 0.5
 # 默认环境变量字典
 DEFAULT_ENV_VARS = {
     "GOPROXY": "https://goproxy.cn,https://goproxy.io,direct",  # Go 代理地址, 默认为 goproxy.cn 和 goproxy.io
@@ -44,20 +79,203 @@ DEFAULT_ENV_VARS = {
     "CC": "gcc",  # 默认使用gcc编译器
     "CXX": "g++",  # 默认使用g++编译器
 }
+# 是否默认以可复现模式构建(固定构建时间、去除路径与 build ID、规范化归档元数据), 默认为False
+DEFAULT_REPRODUCIBLE = False
+# 是否启用本地构建产物缓存, 默认为True
+DEFAULT_USE_CACHE = True
+# 本地构建缓存目录(位于用户目录下, 避免污染工作区导致 git 状态变为 dirty)
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "verman-build")
+# 构建产物缓存的最大容量(字节), 超出后按最近最少使用(LRU)淘汰, 默认2GB
+DEFAULT_CACHE_MAX_SIZE = 2 * 1024 * 1024 * 1024
+# 多个构建节点共享的远程产物缓存, 可以是目录(如 NFS 挂载点)或 http(s) 地址, None 表示不使用
+DEFAULT_REMOTE_CACHE = None
+# 是否缓存 go mod tidy/go vet/go fmt 的检查结果, 输入未变化时跳过检查, 默认为True
+DEFAULT_USE_CHECK_CACHE = True
+# 构建守护进程监听的 Unix 套接字路径
+DEFAULT_DAEMON_SOCKET = os.path.join(DEFAULT_CACHE_DIR, "daemon.sock")
+# 不支持 Unix 套接字的平台上, 构建守护进程监听的本机端口
+DEFAULT_DAEMON_PORT = 47300
+# 构建守护进程的访问令牌文件(仅当前用户可读), 客户端请求必须携带其中的令牌
+DEFAULT_DAEMON_TOKEN_FILE = os.path.join(DEFAULT_CACHE_DIR, "daemon.token")
+# 构建代理默认监听的端口(--agent 只指定主机时使用)
+DEFAULT_AGENT_PORT = 47301
+# 批量构建时默认分发目标的构建代理列表, 格式为 "主机:端口"
+DEFAULT_AGENTS = []
+# 构建代理与协调端共享的访问令牌文件, None 表示缓存目录下的 agent.token;
+# 构建代理首次启动时生成该文件, 多台机器时将其复制到协调端的同一路径
+DEFAULT_AGENT_TOKEN_FILE = None
+# 每个目标的构建日志目录, go build 的输出逐行写入其中
+DEFAULT_LOG_DIR = os.path.join(DEFAULT_OUTPUT_DIR, "logs")
+# 构建失败时在终端中显示的日志末尾行数
+DEFAULT_LOG_TAIL_LINES = 40
+# 是否在终端中显示每个在途目标的实时进度
+DEFAULT_SHOW_PROGRESS = True
 ####################################################################################
 
 
 ############################### 以下为内部使用的变量 ###############################
 # Git信息缓存字典
 _git_info_cache = {"version": None, "commit": None, "commit_time": None, "status": None}
+# Go 工具链探测结果的内存缓存, 键为 toolchain_probe_key 的 JSON 文本
+_toolchain_cache = {}
+# 探测工具链时读取的 go env 变量
+TOOLCHAIN_PROBE_ENV = ("GOROOT", "GOPATH", "GOCACHE", "GOMODCACHE")
+# 影响 go env 输出或工具链选择的环境变量, 参与工具链探测缓存键
+TOOLCHAIN_ENV_VARS = (
+    "GOROOT",
+    "GOPATH",
+    "GOCACHE",
+    "GOMODCACHE",
+    "GOENV",
+    "GOTOOLCHAIN",
+    "GOFLAGS",
+    "HOME",
+    "USERPROFILE",
+    "LOCALAPPDATA",
+    "APPDATA",
+    "XDG_CACHE_HOME",
+    "XDG_CONFIG_HOME",
+)
+# 源码树哈希缓存, 同一次运行内只计算一次
+_source_hash_cache = {"hash": None}
+# 源码文件的 stat 索引, files 的键为相对路径, 值为 [修改时间, 大小, inode, 内容哈希]
+_stat_index = {"root": None, "files": {}}
+# stat 索引的读写锁, 检查线程与构建任务可能同时计算指纹
+_stat_index_lock = threading.Lock()
+# 修改时间距今小于该值(纳秒)的文件可能在同一时间粒度内再次被修改, 不写入索引
+STAT_INDEX_RACY_WINDOW = 2 * 10**9
+# 构建产物缓存的命中统计(本次运行), 结束时合并写入磁盘
+_cache_stats = {
+    "hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions": 0,
+    "remote_hits": 0,
+    "remote_misses": 0,
+    "remote_stores": 0,
+    "remote_errors": 0,
+}
+# 构建产物缓存的操作锁
+_cache_lock = threading.Lock()
+# 本进程对构建缓存总大小(字节)的估计, None 表示尚未统计; 写入时累加, 超出上限才遍历缓存目录
+_cache_size = {"bytes": None}
+# 同一时间只有一个线程遍历缓存目录执行淘汰
+_cache_evict_lock = threading.Lock()
+# 参与缓存键计算的环境变量(除 GO*/CGO_* 开头的变量外)
+CACHE_KEY_ENV_VARS = ("CC", "CXX")
+# 仅表示缓存位置、不影响产物内容的环境变量, 计算缓存键时忽略
+# (远程缓存在多个节点间共享, 节点本地的路径也不能影响缓存键)
+CACHE_KEY_IGNORED_ENV_VARS = (
+    "GOCACHE",
+    "GOMODCACHE",
+    "GOTMPDIR",
+    "GOMAXPROCS",
+    "GOPATH",
+    "GOENV",
+)
+# 已创建的远程缓存后端, 键为 --remote-cache 参数
+_cache_backends = {}
+# 预热阶段解析出的共享 GOCACHE/GOMODCACHE, 所有构建子进程统一使用
+_shared_go_env = {}
+# 匹配链接器标志中易变的构建时间, 计算缓存键时将其剔除
+BUILD_TIME_PATTERN = re.compile(r"(\.buildTime=)[^'\s]*")
+# 匹配链接器标志中注入的源码树指纹, 检查阶段改写源码后据此替换为新的指纹
+SOURCE_HASH_PATTERN = re.compile(r"(\.sourceHash=)[^'\s]*")
+# Git 信息的内存缓存, 键为 (Git目录, 缓存键), 守护进程内跨请求复用
+_git_info_memo = {}
+# 已通过的检查结果, 键为源码与工具链指纹; 仅守护进程中启用, 普通运行时为 None
+_check_memo = None
+# 实时进度的最短刷新间隔(秒)
+PROGRESS_REFRESH_INTERVAL = 0.2
+# 构建日志中单行的最大字节数, 超过时截断为多行, 避免无换行的输出占满内存
+LOG_MAX_LINE = 64 * 1024
+# 当前协程/线程所在的追踪泳道, 异步构建任务按工作槽位区分泳道
+_trace_lane = contextvars.ContextVar("trace_lane", default=None)
 # 支持的平台列表
 SUPPORTED_PLATFORMS = ["windows", "linux", "darwin"]
 # 平台简写映射
 PLATFORM_SHORTCUTS = {"w": "windows", "l": "linux", "d": "darwin"}
 # 支持的架构列表
-SUPPORTED_ARCHITECTURES = ["amd64"]
+SUPPORTED_ARCHITECTURES = ["amd64", "arm64", "386", "arm", "riscv64"]
 # 架构简写映射
-ARCHITECTURE_SHORTCUTS = {"a64": "amd64"}
+ARCHITECTURE_SHORTCUTS = {"a64": "amd64", "x86": "386", "rv64": "riscv64"}
+# 不支持的平台/架构组合及原因
+UNSUPPORTED_TARGETS = {
+    ("darwin", "386"): "macOS不支持32位架构",
+    ("darwin", "arm"): "macOS不支持32位架构",
+    ("darwin", "riscv64"): "Go 不支持 darwin/riscv64",
+    ("windows", "riscv64"): "Go 不支持 windows/riscv64",
+}
+# 构建耗时历史的平滑系数, 新样本所占的权重
+HISTORY_SMOOTHING = 0.5
+# 支持的打包格式及其文件后缀(均只依赖标准库)
+ARCHIVE_FORMATS = {
+    "zip": ".zip",
+    "tar": ".tar",
+    "tar.gz": ".tar.gz",
+    "tar.bz2": ".tar.bz2",
+    "tar.xz": ".tar.xz",
+}
+# 校验和文件名
+CHECKSUM_FILE_NAME = "SHA256SUMS"
+# 产物清单文件名
+MANIFEST_FILE_NAME = "manifest.json"
+# 流式读写文件时的块大小
+STREAM_CHUNK_SIZE = 1024 * 1024
+# 访问 HTTP 远程缓存的超时时间(秒)
+REMOTE_CACHE_TIMEOUT = 30
+# 构建代理协议的帧头: 4 字节大端序的 JSON 头部长度
+AGENT_FRAME = struct.Struct(">I")
+# 构建代理协议中 JSON 头部的最大长度
+AGENT_MAX_HEADER = 16 * 1024 * 1024
+# 连接构建代理并完成握手的超时时间(秒)
+AGENT_CONNECT_TIMEOUT = 5
+# 认证完成前构建代理接受的 JSON 头部最大长度
+AGENT_AUTH_MAX_HEADER = 1024
+# 构建代理接受的目标环境变量, 其余环境变量(如 GOFLAGS 的 -toolexec)可能执行任意程序;
+# CC/CXX 等由代理按目标平台自行确定
+AGENT_ENV_KEYS = frozenset(
+    {
+        "GOOS",
+        "GOARCH",
+        "GOARM",
+        "GOAMD64",
+        "GO386",
+        "GOMIPS",
+        "GOMIPS64",
+        "GOPPC64",
+        "GORISCV64",
+        "GOWASM",
+        "CGO_ENABLED",
+    }
+)
+# 构建代理上保留的已解包源码快照数量, 超出后删除最久未使用的快照
+AGENT_MAX_SNAPSHOTS = 8
+# 构建代理返回的构建日志的最大长度(字符), 超出时只保留末尾
+AGENT_LOG_LIMIT = 64 * 1024
+# 可复现模式下归档内可执行文件统一使用的权限
+REPRODUCIBLE_FILE_MODE = 0o755
+# zip 格式能表示的最早时间(1980-01-01T00:00:00Z)
+ZIP_EPOCH = 315532800
+# cgroup 文件系统的挂载点
+CGROUP_ROOT = "/sys/fs/cgroup"
+# cgroup v1 中不小于该值的内存限制表示未设置限制
+CGROUP_UNLIMITED_MEMORY = 1 << 60
+# 内存不足时检查可用内存的间隔(秒)
+MEMORY_POLL_INTERVAL = 0.5
+# 模块文件, 变化时监视模式需要重新执行 vendor/tidy
+MODULE_FILES = ("go.mod", "go.sum")
+# 可缓存结果的检查阶段, 键为 --recheck 参数中使用的简称
+CACHED_CHECKS = {"tidy": "go mod tidy", "vet": "go vet", "fmt": "go fmt"}
+# inotify 事件掩码: 修改、写入关闭、移入移出、创建、删除
+INOTIFY_MASK = 0x2 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+# inotify 事件标志: 目录、事件队列溢出
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x4000
+# 监视器丢失事件时返回的标记, 表示需要完整重新扫描并重新构建(包括模块检查)
+WATCH_RESCAN = "<rescan>"
+# inotify_event 结构体头部: wd, mask, cookie, len
+INOTIFY_EVENT = struct.Struct("iIII")
 # 定义颜色转义字符
 RED_BOLD = "\033[1;31m"  # 红色加粗
 GREEN_BOLD = "\033[1;32m"  # 绿色加粗
@@ -65,38 +283,271 @@ RESET = "\033[0m"  # 重置颜色
 # 默认构建时的链接器标志
 DEFAULT_LDFLAGS = "-s -w"
 # 启用git信息注入时的链接器标志模板
-LD_FLAGS_TEMPLATE = "-X 'gitee.com/MM-Q/verman.appName={app_name}' -X 'gitee.com/MM-Q/verman.gitVersion={git_version}' -X 'gitee.com/MM-Q/verman.gitCommit={git_commit}' -X 'gitee.com/MM-Q/verman.gitCommitTime={commit_time}' -X 'gitee.com/MM-Q/verman.buildTime={build_time}' -X 'gitee.com/MM-Q/verman.gitTreeState={tree_state}' -s -w"
+LD_FLAGS_TEMPLATE = "-X 'gitee.com/MM-Q/verman.appName={app_name}' -X 'gitee.com/MM-Q/verman.gitVersion={git_version}' -X 'gitee.com/MM-Q/verman.gitCommit={git_commit}' -X 'gitee.com/MM-Q/verman.gitCommitTime={commit_time}' -X 'gitee.com/MM-Q/verman.buildTime={build_time}' -X 'gitee.com/MM-Q/verman.gitTreeState={tree_state}' -X 'gitee.com/MM-Q/verman.sourceHash={source_hash}' -s -w"
 ####################################################################################
 
 
 # 函数定义 #
 def print_success(message):
     """打印成功信息"""
-    print(f"{GREEN_BOLD}ok: {message}{RESET}")
+    # 将换行符与内容一次写出, 避免多线程输出时行内容交错
+    _progress.write(f"{GREEN_BOLD}ok: {message}{RESET}\n")
 
 
 def print_error(message):
     """打印错误信息"""
-    print(f"{RED_BOLD}error: {message}{RESET}")
+    _progress.write(f"{RED_BOLD}error: {message}{RESET}\n")
+
+
+class Tracer:
+    """以 Chrome trace-event 格式记录各阶段耗时
+
+    未指定输出文件时所有操作均为空操作。每个区间记录为 "X" 事件,
+    泳道默认取当前线程名, 异步任务通过 _trace_lane 指定所在的工作槽位。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._events = []
+        self._lanes = {}
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def _lane_id(self, lane):
+        """将泳道名映射为整数 tid, 首次出现时写入泳道名元数据"""
+        if lane not in self._lanes:
+            self._lanes[lane] = len(self._lanes) + 1
+            self._events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": self._lanes[lane],
+                    "args": {"name": lane},
+                }
+            )
+        return self._lanes[lane]
+
+    def add(self, name, category, start, end, lane=None, pid=None, args=None):
+        """添加一个完整区间, start/end 为 time.time() 时间戳"""
+        if not self.enabled:
+            return
+        lane = lane or _trace_lane.get() or threading.current_thread().name
+        with self._lock:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round(start * 1e6),
+                "dur": round((end - start) * 1e6),
+                "pid": pid or os.getpid(),
+                "tid": self._lane_id(lane) if pid is None else 0,
+            }
+            if args:
+                event["args"] = args
+            self._events.append(event)
+
+    def name_process(self, pid, name):
+        """为进程写入名称元数据, 用于区分打包进程池中的工作进程"""
+        if self.enabled and pid not in self._processes:
+            with self._lock:
+                self._processes.add(pid)
+                self._events.append(
+                    {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+                )
+
+    @contextmanager
+    def span(self, name, category="build", lane=None, **args):
+        """记录 with 块的耗时, 产出的字典可用于补充退出码等参数"""
+        start = time.time()
+        try:
+            yield args
+        finally:
+            self.add(name, category, start, time.time(), lane, args=args)
+
+    def save(self):
+        """写出追踪文件, 可在 chrome://tracing 或 Perfetto 中打开"""
+        if not self.enabled:
+            return
+        self.name_process(os.getpid(), "build.py")
+        trace = {
+            "traceEvents": self._events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "argv": sys.argv[1:],
+                "git_version": _git_info_cache["version"],
+                "python": platform.python_version(),
+            },
+        }
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(trace, f, ensure_ascii=False)
+        except OSError as e:
+            print_error(f"写入追踪文件 {self.path} 失败: {str(e)}")
+            return
+        print_success(f"已写入追踪文件: {self.path}")
+
+
+# 全局追踪器, 由 --trace 参数启用
+_tracer = Tracer()
+
+
+class ProgressDisplay:
+    """终端底部的实时进度, 每个在途目标占一行, 显示已用时间与最新一行构建输出
+
+    其余输出经 print_success/print_error 写在进度块上方。未指定输出流时
+    所有进度操作均为空操作, write 直接打印。
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._rows = {}  # 目标名 -> [开始时间, 状态]
+        self._drawn = 0
+        self._last_draw = 0.0
+        self._lock = threading.Lock()
+        self._ticker = None
+
+    @property
+    def enabled(self):
+        return self.stream is not None
+
+    def write(self, text):
+        """在进度块上方输出一段文本"""
+        if not self.enabled:
+            print(text, end="")
+            return
+        with self._lock:
+            self._clear()
+            self.stream.write(text)
+            self._draw()
+
+    def start(self, name, status):
+        """开始显示一个目标"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._rows[name] = [time.time(), status]
+            self._clear()
+            self._draw()
+            if self._ticker is None:
+                # 没有新输出时也定期刷新已用时间
+                self._ticker = threading.Thread(target=self._tick, daemon=True)
+                self._ticker.start()
+
+    def update(self, name, status):
+        """更新目标的状态, 按刷新间隔节流重绘"""
+        if not self.enabled or name not in self._rows:
+            return
+        with self._lock:
+            if name in self._rows:
+                self._rows[name][1] = status
+                if time.time() - self._last_draw >= PROGRESS_REFRESH_INTERVAL:
+                    self._clear()
+                    self._draw()
+
+    def finish(self, name):
+        """目标结束, 从进度块中移除"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._rows.pop(name, None) is not None:
+                self._clear()
+                self._draw()
+
+    def _tick(self):
+        while True:
+            time.sleep(1)
+            with self._lock:
+                if self._rows:
+                    self._clear()
+                    self._draw()
+
+    def _clear(self):
+        if self._drawn:
+            # 光标上移到进度块首行并清除到屏幕末尾
+            self.stream.write(f"\033[{self._drawn}F\033[J")
+            self._drawn = 0
+
+    def _draw(self):
+        width = shutil.get_terminal_size().columns - 1
+        now = time.time()
+        for name, (start, status) in self._rows.items():
+            line = f"{name:<16} {now - start:6.1f}s  {status}".replace("\t", " ")
+            self.stream.write(line[:width] + "\n")
+        self._drawn = len(self._rows)
+        self._last_draw = now
+        self.stream.flush()
+
+
+# 全局实时进度显示, 标准输出为终端时在 main 中启用
+_progress = ProgressDisplay()
+
+
+class StartupProfile:
+    """记录启动阶段(从脚本开始执行到开始构建前)各步骤的耗时
+
+    未启用时所有操作均为空操作。note 为步骤附加说明, 如工具链信息来自缓存还是重新探测。
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = []
+        self.notes = {}
+
+    def add(self, name, seconds):
+        if self.enabled:
+            self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def note(self, name, text):
+        if self.enabled:
+            self.notes[name] = text
+
+    def report(self, total):
+        if not self.enabled:
+            return
+        print_success("启动耗时(不含 Python 解释器自身的启动):")
+        for name, seconds in self.phases:
+            note = f" ({self.notes[name]})" if name in self.notes else ""
+            print_success(f"  {seconds * 1000:8.1f} ms  {name}{note}")
+        print_success(f"  {total * 1000:8.1f} ms  合计")
+
+
+# 全局启动耗时记录, 指定 --profile-startup 时在 main 中启用
+_startup_profile = StartupProfile()
+
+
+class CheckFailed(SystemExit):
+    """检查命令执行失败, 携带诊断输出
+
+    继承 SystemExit, 未被捕获时与原先调用 sys.exit(1) 的行为一致。
+    """
+
+    def __init__(self, diagnostics):
+        super().__init__(1)
+        self.diagnostics = diagnostics
 
 
 def check_go_installed(go_compiler):
-    """检查指定的 Go 编译器是否可用"""
-    try:
-        print_success("正在检查 Go 编译器是否可用...")
-        subprocess.run(
-            [go_compiler, "version"],
-            capture_output=True,
-            text=True,
-            check=True,
-            encoding="utf-8",
-        )
+    """检查指定的 Go 编译器是否可用, 与缓存键共用 go version 的探测结果"""
+    print_success("正在检查 Go 编译器是否可用...")
+    if get_go_version(go_compiler) is not None:
         return True
-    except subprocess.CalledProcessError:
-        print_error(
-            f"未检测到 {go_compiler} 编译器, 请确保已安装并添加到 PATH 中, 或者指定正确的路径。"
-        )
-        return False
+    print_error(
+        f"未检测到 {go_compiler} 编译器, 请确保已安装并添加到 PATH 中, 或者指定正确的路径。"
+    )
+    return False
 
 
 def check_go_mod_file():
@@ -110,15 +561,91 @@ def check_go_mod_file():
 
 
 def check_entry_file(entry_file):
-    """检查指定的入口文件是否存在"""
+    """检查指定的入口文件是否存在, 包模式由 go list 展开, 不做检查"""
     print_success(f"正在检查指定的入口文件 {entry_file} 是否存在...")
-    if os.path.exists(entry_file):
+    missing = missing_entries(entry_file)
+    if not missing:
         return True
     else:
-        print_error(f"未找到入口文件 {entry_file}。")
+        print_error(f"未找到入口文件 {', '.join(missing)}。")
         return False
 
 
+def split_entries(entry_file):
+    """将 -e 参数拆分为入口列表, 多个入口以逗号分隔"""
+    return [entry.strip() for entry in entry_file.split(",") if entry.strip()]
+
+
+def is_package_pattern(entry):
+    """判断入口是否为 ./cmd/... 形式的包模式"""
+    return "..." in entry
+
+
+def missing_entries(entry_file):
+    """返回不存在的入口文件或包目录列表"""
+    return [
+        entry
+        for entry in split_entries(entry_file)
+        if not is_package_pattern(entry) and not os.path.exists(entry)
+    ]
+
+
+def default_exec_name(package):
+    """返回 go build -o 目录时包的可执行文件名: 导入路径的最后一段, 忽略 /v2 等主版本后缀"""
+    parent, _, name = package.rstrip("/").rpartition("/")
+    if parent and re.fullmatch(r"v([2-9]|[1-9][0-9]+)", name):
+        name = parent.rpartition("/")[2]
+    return name
+
+
+def resolve_main_packages(go_compiler, entry_file):
+    """将入口参数解析为 [(包, 可执行文件名), ...]
+
+    只有一个入口且不是包模式时原样返回, 可执行文件名为 None, 保持单入口的构建方式;
+    否则通过 go list 展开为全部 main 包的导入路径, 同一目标的这些包由一次 go build 构建。
+    无法解析时返回 None。
+    """
+    entries = split_entries(entry_file)
+    if len(entries) == 1 and not is_package_pattern(entries[0]):
+        return [(entries[0], None)]
+    files = [entry for entry in entries if entry.endswith(".go")]
+    if files:
+        print_error(f"多入口构建时请指定包目录或包模式, 而不是源文件: {', '.join(files)}")
+        return None
+    try:
+        # -find 只识别包本身而不解析依赖, 依赖尚未下载时也能展开
+        listed = subprocess.run(
+            [
+                go_compiler,
+                "list",
+                "-e",
+                "-find",
+                "-f",
+                '{{if eq .Name "main"}}{{.ImportPath}}{{end}}',
+                *entries,
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            encoding="utf-8",
+        ).stdout.split()
+    except (OSError, subprocess.CalledProcessError) as e:
+        print_error(f"展开入口包失败: {getattr(e, 'stderr', None) or str(e)}")
+        return None
+    packages = list(dict.fromkeys(listed))
+    if not packages:
+        print_error(f"入口 {entry_file} 中没有找到 main 包")
+        return None
+    names = {}
+    for package in packages:
+        name = default_exec_name(package)
+        if name in names:
+            print_error(f"{names[name]} 与 {package} 的可执行文件名均为 {name}, 无法输出到同一目录")
+            return None
+        names[name] = package
+    return [(package, default_exec_name(package)) for package in packages]
+
+
 def run_go_mod_vendor(go_compiler):
     """执行 go mod vendor 克隆依赖"""
     try:
@@ -134,7 +661,7 @@ def run_go_mod_vendor(go_compiler):
     except subprocess.CalledProcessError as e:
         print_error("go mod vendor 执行失败：")
         print_error(e.stderr.strip())
-        sys.exit(1)
+        raise CheckFailed(e.stderr.strip())
 
 
 def run_go_mod_tidy(go_compiler, use_vendor):
@@ -150,7 +677,7 @@ def run_go_mod_tidy(go_compiler, use_vendor):
     except subprocess.CalledProcessError as e:
         print_error("go mod tidy 执行失败：")
         print_error(e.stderr.strip())
-        sys.exit(1)
+        raise CheckFailed(e.stderr.strip())
 
 
 def run_code_check(go_compiler):
@@ -164,7 +691,7 @@ def run_code_check(go_compiler):
     except subprocess.CalledProcessError as e:
         print_error("go vet 检查失败：")
         print_error(e.stderr.strip())
-        sys.exit(1)
+        raise CheckFailed(e.stderr.strip())
 
 
 def run_gofmt(go_compiler):
@@ -181,7 +708,7 @@ def run_gofmt(go_compiler):
     except subprocess.CalledProcessError as e:
         print_error("代码格式化失败：")
         print_error(e.stderr.strip())
-        sys.exit(1)
+        raise CheckFailed(e.stderr.strip())
 
 
 # 数据类封装构建配置参数
@@ -193,384 +720,4126 @@ class BuildConfig:
     ldflags: str
     use_vendor_in_build: bool
     is_batch: bool = False
-    args: argparse.Namespace = None
+    env: dict = None  # 目标专属的环境变量, 覆盖在当前进程环境之上
+    use_cache: bool = False
+    cache_hit: bool = False
+    parallelism: Optional[int] = None  # go build -p 与 GOMAXPROCS, None 表示不限制
+    reproducible: bool = False  # 使用 -trimpath -buildvcs=false 构建
+    remote_cache: Optional[str] = None  # 远程缓存地址, 仅在启用本地缓存时使用
+    workdir: Optional[str] = None  # 执行 go build 的目录, None 表示当前目录
+    # 多个可执行文件时为 ((包, 输出文件, 链接器标志), ...), 共用一次 go build;
+    # 此时 output_file/entry_file/ldflags 为其中第一个
+    binaries: tuple = ()
+    log_file: Optional[str] = None  # go build 输出的日志文件, None 时只在内存中保留末尾若干行
+    target_name: Optional[str] = None  # 目标名称, 用于实时进度与错误提示
+    verbose: bool = False  # 向 go build 传递 -v, 输出正在编译的包
 
 
-def build_go_app(
-    config: BuildConfig,
-):
-    """组装并执行构建命令"""
-    command = [
-        config.go_compiler,
-        "build",
-        "-o",
-        config.output_file,
-        "-ldflags",
-        config.ldflags,
-    ]
+def binary_fields(binaries):
+    """由 [(包, 输出文件, 链接器标志), ...] 生成 BuildConfig 中描述可执行文件的字段"""
+    package, output_file, ldflags = binaries[0]
+    return {
+        "entry_file": package,
+        "output_file": output_file,
+        "ldflags": ldflags,
+        "binaries": tuple(binaries) if len(binaries) > 1 else (),
+    }
+
+
+def config_binaries(config: BuildConfig):
+    """返回构建配置中的全部可执行文件 ((包, 输出文件, 链接器标志), ...)"""
+    return config.binaries or ((config.entry_file, config.output_file, config.ldflags),)
+
+
+# 构建目标中的一个可执行文件
+@dataclass(frozen=True)
+class BuildBinary:
+    package: str  # 入口文件或 main 包的导入路径
+    name: str  # 注入的 appName, 也是归档文件名的前缀
+    output_file: str
+    archive_file: Optional[str]
+    ldflags: str
+
+
+# 单个构建目标, 包含执行构建所需的全部已解析信息
+@dataclass(frozen=True)
+class BuildTarget:
+    system: str
+    arch: str
+    binaries: tuple  # BuildBinary 元组, 由同一次 go build 构建
+    env: tuple  # ((键, 值), ...), 目标专属的环境变量
+    estimate: Optional[float] = None  # 历史构建耗时(秒)
+
+    @property
+    def name(self):
+        return f"{self.system}/{self.arch}"
+
+
+def target_log_file(target):
+    """返回目标的构建日志路径"""
+    return os.path.join(DEFAULT_LOG_DIR, f"{target.system}_{target.arch}.log")
+
+
+# 由命令行参数一次性解析得到的不可变构建计划, 工作线程只负责执行
+@dataclass(frozen=True)
+class BuildPlan:
+    go_compiler: str
+    entry_file: str
+    use_vendor: bool
+    use_vendor_in_build: bool
+    use_cache: bool
+    remote_cache: Optional[str]
+    use_check_cache: bool
+    recheck: tuple  # 忽略缓存强制重新执行的检查阶段(tidy/vet/fmt/all)
+    is_batch: bool
+    archive_format: str
+    compress_level: Optional[int]
+    write_checksums: bool
+    max_workers: int  # 同时运行的构建数
+    parallelism: int  # 每个构建的 -p 与 GOMAXPROCS
+    reproducible: bool
+    source_date_epoch: Optional[int]  # 可复现模式下的构建时间与归档时间戳
+    verbose_build: bool  # 向 go build 传递 -v
+    targets: tuple  # BuildTarget 元组, 已按调度顺序排列
+    skipped: tuple = ()  # ((目标, 原因), ...)
+    agents: tuple = ()  # 分发构建目标的构建代理地址
+
+    def to_dict(self):
+        """转换为可序列化为 JSON 的字典"""
+        return {
+            "go_compiler": self.go_compiler,
+            "entry_file": self.entry_file,
+            "use_vendor": self.use_vendor,
+            "use_vendor_in_build": self.use_vendor_in_build,
+            "use_cache": self.use_cache,
+            "remote_cache": self.remote_cache,
+            "use_check_cache": self.use_check_cache,
+            "recheck": list(self.recheck),
+            "is_batch": self.is_batch,
+            "archive_format": self.archive_format,
+            "compress_level": self.compress_level,
+            "write_checksums": self.write_checksums,
+            "max_workers": self.max_workers,
+            "parallelism": self.parallelism,
+            "reproducible": self.reproducible,
+            "source_date_epoch": self.source_date_epoch,
+            "verbose_build": self.verbose_build,
+            "targets": [
+                {
+                    "target": t.name,
+                    "system": t.system,
+                    "arch": t.arch,
+                    "binaries": [
+                        {
+                            "package": b.package,
+                            "name": b.name,
+                            "output_file": b.output_file,
+                            "archive_file": b.archive_file,
+                            "ldflags": b.ldflags,
+                        }
+                        for b in t.binaries
+                    ],
+                    "env": dict(t.env),
+                    "log_file": target_log_file(t),
+                    "estimate": t.estimate,
+                }
+                for t in self.targets
+            ],
+            "skipped": [{"target": name, "reason": reason} for name, reason in self.skipped],
+            "agents": list(self.agents),
+        }
+
+
+def host_architecture():
+    """返回当前运行平台的 Go 架构名称"""
+    machine = platform.machine().lower()
+    # 自动转换x86_64为amd64
+    if machine == "x86_64":
+        machine = "amd64"
+    return machine
+
+
+def _read_text(path):
+    """读取文本文件并去除首尾空白, 读取失败时返回 None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except (OSError, ValueError):
+        return None
+
+
+def cgroup_dirs(controller):
+    """返回当前进程所在 cgroup 从叶子到根的已挂载目录列表
+
+    同时兼容 cgroup v2 统一层级与 v1 按控制器挂载的层级;
+    非 Linux 系统或未挂载 cgroup 时返回空列表。
+    """
+    content = _read_text("/proc/self/cgroup")
+    if not content:
+        return []
+    unified = os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers"))
+    for line in content.splitlines():
+        _, controllers, path = line.split(":", 2)
+        if unified and not controllers:
+            base = CGROUP_ROOT
+        elif not unified and controller in controllers.split(","):
+            base = os.path.join(CGROUP_ROOT, controller)
+        else:
+            continue
+        # 容器内通常只挂载了自身的 cgroup, 逐级向上查找实际存在的目录
+        parts = [part for part in path.split("/") if part]
+        dirs = []
+        while True:
+            directory = os.path.join(base, *parts)
+            if os.path.isdir(directory):
+                dirs.append(directory)
+            if not parts:
+                return dirs
+            parts.pop()
+    return []
+
+
+def cgroup_cpu_limit():
+    """返回 cgroup 的 CPU 配额(可用核数, 可为小数), 未设置配额时返回 None"""
+    limits = []
+    for directory in cgroup_dirs("cpu"):
+        cpu_max = _read_text(os.path.join(directory, "cpu.max"))
+        if cpu_max:
+            quota, period = cpu_max.split()[:2]
+        else:
+            quota = _read_text(os.path.join(directory, "cpu.cfs_quota_us"))
+            period = _read_text(os.path.join(directory, "cpu.cfs_period_us"))
+        if quota and period and quota != "max" and int(quota) > 0:
+            limits.append(int(quota) / int(period))
+    return min(limits) if limits else None
+
+
+def cgroup_memory():
+    """返回 cgroup 的 (内存限制, 剩余可用内存), 未设置限制时为 (None, None)
+
+    已用内存扣除可回收的 inactive_file 页缓存, 与 OOM 判断使用的工作集一致。
+    """
+    limit = available = None
+    for directory in cgroup_dirs("memory"):
+        value = _read_text(os.path.join(directory, "memory.max")) or _read_text(
+            os.path.join(directory, "memory.limit_in_bytes")
+        )
+        if not value or value == "max" or int(value) >= CGROUP_UNLIMITED_MEMORY:
+            continue
+        usage = _read_text(os.path.join(directory, "memory.current")) or _read_text(
+            os.path.join(directory, "memory.usage_in_bytes")
+        )
+        inactive = 0
+        for line in (_read_text(os.path.join(directory, "memory.stat")) or "").splitlines():
+            name, _, amount = line.partition(" ")
+            if name in ("inactive_file", "total_inactive_file"):
+                inactive = int(amount)
+        free = max(0, int(value) - max(0, int(usage or 0) - inactive))
+        limit = int(value) if limit is None else min(limit, int(value))
+        available = free if available is None else min(available, free)
+    return limit, available
+
+
+def available_memory():
+    """返回当前可用内存(字节), 取 cgroup 剩余额度与系统 MemAvailable 的较小值
+
+    无法探测时返回 None。
+    """
+    values = [cgroup_memory()[1]]
+    for line in (_read_text("/proc/meminfo") or "").splitlines():
+        if line.startswith("MemAvailable:"):
+            values.append(int(line.split()[1]) * 1024)
+    values = [value for value in values if value is not None]
+    return min(values) if values else None
+
+
+def effective_cpu_count():
+    """返回 (实际可用的 CPU 数, 来源), 综合 CPU 核心数、亲和性与 cgroup 配额"""
+    count, source = os.cpu_count() or 1, "CPU 核心数"
+    if hasattr(os, "sched_getaffinity"):
+        affinity = len(os.sched_getaffinity(0))
+        if affinity < count:
+            count, source = affinity, "CPU 亲和性"
+    quota = cgroup_cpu_limit()
+    if quota is not None and quota < count:
+        count, source = max(1, int(quota)), f"cgroup CPU 配额 {quota:g}"
+    return count, source
+
+
+def resolve_concurrency(requested, target_count, verbose=True):
+    """计算 (并发构建数, 每个构建的 -p/GOMAXPROCS)
+
+    未指定并发数时取可用 CPU 数-1, 并受可用内存能容纳的构建数限制;
+    go build 自身会并行编译, 因此把可用 CPU 平均分给同时运行的构建。
+    """
+    cpus, cpu_source = effective_cpu_count()
+    memory_limit = cgroup_memory()[0]
+    available = available_memory()
+    if requested:
+        workers, reason = requested, "由 -w 参数指定"
+    else:
+        workers, reason = max(1, cpus - 1), f"可用 CPU 数 {cpus} 减 1" if cpus > 1 else "仅有 1 个可用 CPU"
+        if available is not None and available // DEFAULT_BUILD_MEMORY < workers:
+            workers = max(1, available // DEFAULT_BUILD_MEMORY)
+            reason = f"可用内存仅够 {workers} 个构建"
+    workers = max(1, min(workers, target_count))
+    parallelism = max(1, cpus // workers)
+    if verbose:
+        memory_desc = "未知"
+        if available is not None:
+            memory_desc = f"{available / 1024 / 1024 / 1024:.2f} GB"
+        if memory_limit is not None:
+            memory_desc += f" (cgroup 限制 {memory_limit / 1024 / 1024 / 1024:.2f} GB)"
+        print_success(f"可用 CPU: {cpus} (来源: {cpu_source}), 可用内存: {memory_desc}")
+        print_success(
+            f"并发构建数: {workers} ({reason}), 每个构建 -p {parallelism}, GOMAXPROCS={parallelism}"
+        )
+    return workers, parallelism
+
+
+def build_target_env(system, architecture, custom_env=None):
+    """组装目标平台专属的环境变量, 执行时覆盖在当前进程环境之上"""
+    # 添加默认环境变量
+    env = dict(DEFAULT_ENV_VARS)
+    # 添加自定义环境变量
+    for env_var in custom_env or []:
+        if "=" in env_var:
+            key, value = env_var.split("=", 1)
+            env[key] = value
+    env["GOOS"] = system
+    env["GOARCH"] = architecture
+
+    # 为arm64架构设置特定的交叉编译工具链
+    if architecture == "arm64":
+        env["CC"] = "aarch64-linux-gnu-gcc"
+        env["CXX"] = "aarch64-linux-gnu-g++"
+    return env
+
+
+def prepare_build_env(config: BuildConfig):
+    """根据构建配置组装 go build 子进程使用的完整环境变量"""
+    env = os.environ.copy()
+    # 使用预热阶段确定的共享缓存目录
+    env.update(_shared_go_env)
+    env.update(
+        config.env
+        if config.env is not None
+        else build_target_env(platform.system().lower(), host_architecture())
+    )
+    if config.parallelism:
+        env["GOMAXPROCS"] = str(config.parallelism)
+    return env
+
+
+def build_output_dir(config: BuildConfig):
+    """多个可执行文件时 go build -o 使用的临时输出目录, 与第一个输出文件同级"""
+    output_dir, name = os.path.split(config.output_file)
+    return os.path.join(output_dir, f".{name}.d")
+
+
+def prepare_build_command(config: BuildConfig):
+    """组装 go build 命令, vendor 目录缺失时返回 None
+
+    多个可执行文件时输出到目录, 并按包分别指定链接器标志(-ldflags=包=标志),
+    一次 go build 中各包共享依赖的编译结果。
+    """
+    if config.binaries:
+        command = [config.go_compiler, "build", "-o", build_output_dir(config) + os.sep]
+        command.extend(
+            f"-ldflags={package}={ldflags}" for package, _, ldflags in config.binaries
+        )
+    else:
+        command = [
+            config.go_compiler,
+            "build",
+            "-o",
+            config.output_file,
+            "-ldflags",
+            config.ldflags,
+        ]
+    if config.parallelism:
+        command.extend(["-p", str(config.parallelism)])
+    if config.verbose:
+        command.append("-v")
+    if config.reproducible:
+        # 不嵌入 vcs.* 信息: 本机构建与代理(源码快照不是 Git 仓库)的产物保持一致,
+        # 版本信息已由链接器标志注入
+        command.extend(["-trimpath", "-buildvcs=false"])
     if config.use_vendor_in_build:
         # 检查 vendor 目录是否存在
-        if not os.path.exists("vendor"):
+        if not os.path.exists(os.path.join(config.workdir or ".", "vendor")):
             print_error("vendor 目录不存在, 无法使用 -mod=vendor 选项。")
-            return False
+            return None
         command.extend(["-mod=vendor"])
-    command.append(config.entry_file)
-    try:
-        # 强制设置环境变量
-        env = os.environ.copy()
-        # 添加默认环境变量
-        env.update(DEFAULT_ENV_VARS)
-
-        # 为arm64架构设置特定的交叉编译工具链
-        if env.get("GOARCH") == "arm64":
-            env["CC"] = "aarch64-linux-gnu-gcc"
-            env["CXX"] = "aarch64-linux-gnu-g++"
-        # 添加自定义环境变量
-        if config.args and hasattr(config.args, "env") and config.args.env:
-            for env_var in config.args.env:
-                if "=" in env_var:
-                    key, value = env_var.split("=", 1)
-                    env[key] = value
-        # 从输出文件名中提取平台信息
-        if "_windows_" in config.output_file:
-            env["GOOS"] = "windows"
-        elif "_linux_" in config.output_file:
-            env["GOOS"] = "linux"
-        elif "_darwin_" in config.output_file:
-            env["GOOS"] = "darwin"
-        else:
-            env["GOOS"] = platform.system().lower()
-
-        # 从输出文件名中提取架构信息
-        if "_amd64" in config.output_file:
-            env["GOARCH"] = "amd64"
-        elif "_arm64" in config.output_file:
-            env["GOARCH"] = "arm64"
-        elif "_386" in config.output_file:
-            env["GOARCH"] = "386"
-        elif "_arm" in config.output_file:
-            env["GOARCH"] = "arm"
-        else:
-            machine = platform.machine().lower()
-            # 自动转换x86_64为amd64
-            if machine == "x86_64":
-                machine = "amd64"
-            env["GOARCH"] = machine
+    command.extend(package for package, _, _ in config_binaries(config))
+    return command
 
-        # 使用指定的链接器标志和环境变量进行构建
-        subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            env=env,
-            encoding="utf-8",
+
+def collect_build_outputs(config: BuildConfig, success=True):
+    """多个可执行文件时将 go build 写入临时输出目录的文件移动到各自的输出路径"""
+    if not config.binaries:
+        return
+    build_dir = build_output_dir(config)
+    try:
+        for package, output_file, _ in config.binaries:
+            if success:
+                suffix = ".exe" if output_file.endswith(".exe") else ""
+                os.replace(
+                    os.path.join(build_dir, default_exec_name(package) + suffix),
+                    output_file,
+                )
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def try_build_cache(config: BuildConfig, env):
+    """查找构建缓存, 返回 (是否命中, 缓存键); 未启用缓存时缓存键为 None"""
+    if not config.use_cache:
+        return False, None
+    with _tracer.span("cache lookup", "cache") as span:
+        cache_key = compute_artifact_key(config, env)
+        span["hit"] = bool(cache_key) and cache_lookup(cache_key, config.output_file)
+    if span["hit"]:
+        config.cache_hit = True
+        if not config.is_batch:
+            print_success(f"命中构建缓存, 输出文件：{config.output_file}")
+        return True, cache_key
+
+    # 本地未命中时查找远程缓存, 命中后同时存入本地缓存
+    if cache_key and config.remote_cache:
+        backend = get_cache_backend(config.remote_cache)
+        with _tracer.span("remote cache lookup", "cache") as span:
+            span["hit"] = remote_cache_lookup(backend, cache_key, config.output_file)
+        if span["hit"]:
+            config.cache_hit = True
+            cache_store(cache_key, config.output_file)
+            if not config.is_batch:
+                print_success(f"命中远程构建缓存, 输出文件：{config.output_file}")
+            return True, cache_key
+    return False, cache_key
+
+
+def resolve_build_cache(config: BuildConfig, env):
+    """逐个可执行文件查找构建缓存, 返回 (仍需构建的配置, [(缓存键, 输出文件配置), ...])
+
+    多个可执行文件时只构建未命中的部分; 全部命中时第一个返回值为 None,
+    并将 config.cache_hit 置为 True。
+    """
+    pending = []
+    for binary in config_binaries(config):
+        part = replace(config, **binary_fields([binary]))
+        cache_hit, cache_key = try_build_cache(part, env)
+        if not cache_hit:
+            pending.append((cache_key, part))
+    if not pending:
+        config.cache_hit = True
+        return None, []
+    for _, part in pending:
+        os.makedirs(os.path.dirname(part.output_file) or ".", exist_ok=True)
+    remaining = [(part.entry_file, part.output_file, part.ldflags) for _, part in pending]
+    return replace(config, **binary_fields(remaining)), pending
+
+
+def target_build_config(plan, target, output_dir=None, extra_env=None, **kwargs):
+    """由构建计划中的目标创建构建配置
+
+    output_dir 不为 None 时将各输出文件改写到该目录, extra_env 覆盖在目标环境变量之上。
+    """
+    binaries = [
+        (
+            b.package,
+            b.output_file
+            if output_dir is None
+            else os.path.join(output_dir, os.path.basename(b.output_file)),
+            b.ldflags,
         )
+        for b in target.binaries
+    ]
+    return BuildConfig(
+        go_compiler=plan.go_compiler,
+        use_vendor_in_build=plan.use_vendor_in_build,
+        env=dict(target.env, **(extra_env or {})),
+        reproducible=plan.reproducible,
+        **binary_fields(binaries),
+        **kwargs,
+    )
+
+
+def has_cached_artifact(plan, target):
+    """判断目标的全部产物是否已在本机构建缓存中, 用于决定是否还需要分发给构建代理"""
+    config = target_build_config(plan, target)
+    env = prepare_build_env(config)
+    for binary in config_binaries(config):
+        cache_key = compute_artifact_key(replace(config, **binary_fields([binary])), env)
+        if not cache_key or not os.path.isfile(_cache_entry_path(cache_key)):
+            return False
+    return True
+
+
+def store_build_cache(config: BuildConfig, cache_key):
+    """将构建成功的产物存入本地缓存, 配置了远程缓存时同时上传"""
+    with _tracer.span("cache store", "cache"):
+        cache_store(cache_key, config.output_file)
+    if config.remote_cache:
+        with _tracer.span("remote cache store", "cache"):
+            remote_cache_store(
+                get_cache_backend(config.remote_cache), cache_key, config.output_file
+            )
+
+
+def build_go_app(
+    config: BuildConfig,
+):
+    """组装并执行构建命令"""
+    command = prepare_build_command(config)
+    if command is None:
+        return False
+    try:
+        env = prepare_build_env(config)
+
+        # 命中构建缓存时直接取出产物, 跳过 go build
+        pending_config, pending = resolve_build_cache(config, env)
+        if pending_config is None:
+            return True
+        command = prepare_build_command(pending_config)
+
+        # 使用指定的链接器标志和环境变量进行构建, 输出逐行写入日志
+        with _tracer.span("go build", "build") as span, BuildLog(
+            config.log_file, config.target_name
+        ) as log:
+            returncode = stream_process(command, log, env=env)
+            span["exit_code"] = returncode
+        collect_build_outputs(pending_config, returncode == 0)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command, log.summary())
+
+        for cache_key, part in pending:
+            if cache_key:
+                store_build_cache(part, cache_key)
 
         if not config.is_batch:
-            print_success(f"构建成功, 输出文件：{config.output_file}")
+            outputs = ", ".join(output for _, output, _ in config_binaries(pending_config))
+            print_success(f"构建成功, 输出文件：{outputs}")
         return True
     except subprocess.CalledProcessError as e:
         print_error("构建失败：")
-        print_error(e.stderr.strip())
+        print_error(e.output)
         return False
 
 
-def zip_executable(output_file, zip_file, is_batch=False):
-    """将构建成功的可执行文件打包到 ZIP 文件中"""
-    try:
-        if not is_batch:
-            print_success(f"{output_file} --> {zip_file}")
-        with zipfile.ZipFile(zip_file, "w", zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(output_file)
+async def build_go_app_async(config: BuildConfig, timeout):
+    """以异步子进程执行构建, 超过 timeout 秒或被取消时终止整个构建进程组"""
+    import asyncio
+
+    command = prepare_build_command(config)
+    if command is None:
+        return False
+    env = prepare_build_env(config)
+
+    pending_config, pending = await asyncio.to_thread(resolve_build_cache, config, env)
+    if pending_config is None:
+        return True
+    command = prepare_build_command(pending_config)
 
+    label = config.target_name or config.output_file
+    with _tracer.span("go build", "build") as span, BuildLog(
+        config.log_file, config.target_name
+    ) as log:
         try:
-            os.remove(output_file)
-        except Exception as e:
-            print_error(f"删除源文件 {output_file} 失败: {str(e)}")
-    except Exception as e:
-        print_error(f"打包到 {zip_file} 失败：{str(e)}")
+            returncode = await run_process_group(command, env, timeout, log)
+        except asyncio.TimeoutError:
+            span["timeout"] = True
+            print_error(f"构建 {label} 超时({timeout} 秒), 已终止构建进程")
+            returncode = None
+        except asyncio.CancelledError:
+            collect_build_outputs(pending_config, False)
+            raise
+        span["exit_code"] = returncode
+    collect_build_outputs(pending_config, returncode == 0)
+    if returncode is None:
+        return False
+    if returncode != 0:
+        print_error(f"构建 {label} 失败：")
+        print_error(log.summary())
+        return False
 
+    for cache_key, part in pending:
+        if cache_key:
+            await asyncio.to_thread(store_build_cache, part, cache_key)
+    return True
 
-def batch_build(args):
-    """批量构建所有支持的平台和架构组合"""
-    print_success("开始批量构建所有支持的平台和架构组合...")
-    total_start_time = time.time()
-    success_count = 0
-    fail_count = 0
-    skip_count = 0
-    total_tasks = len(SUPPORTED_PLATFORMS) * len(SUPPORTED_ARCHITECTURES)
-    print_success(f"总任务数: {total_tasks}")
-    lock = threading.Lock()
 
-    # 执行构建前的检查工作
-    print_success("开始检查构建环境...")
-    if not pre_build_checks(args.go_compiler, args.entry, args.use_vendor):
-        sys.exit(1)
+class BuildLog:
+    """逐行接收子进程的输出: 写入日志文件, 内存中只保留末尾若干行
 
-    # 根据参数注入 Git 信息
-    if args.git:
-        print_success("正在获取 Git 信息...")
-        if _git_info_cache["version"] is None:
-            print_error("Git 信息获取失败, 请检查 Git 环境是否正确配置。")
-            sys.exit(1)
+    path 为 None 时不写文件; name 不为 None 时每收到一行都会更新该目标的实时进度。
+    """
 
-    # 创建临时args对象用于批量构建
-    batch_args = argparse.Namespace(**vars(args))
+    def __init__(self, path=None, name=None, tail_lines=DEFAULT_LOG_TAIL_LINES):
+        self.path = path
+        self.name = name
+        self.tail = collections.deque(maxlen=tail_lines)
+        self.lines = 0
+        self._partial = b""
+        self._file = None
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "w", encoding="utf-8")
 
-    def build_task(system, architecture):
-        nonlocal success_count, fail_count, skip_count
-        # 跳过不支持的darwin/386和darwin/arm组合
-        if system == "darwin" and architecture in ("386", "arm"):
-            with lock:
-                skip_count += 1
-                print_success(f"跳过不支持的平台/架构组合: {system}/{architecture}")
-            return
+    def __enter__(self):
+        return self
 
-        # 如果启用了仅构建当前平台且平台不一致则跳过
-        if args.current_platform_only and system != platform.system().lower():
-            with lock:
-                skip_count += 1
-                print_success(f"跳过非当前平台: {system}/{architecture}")
-            return
+    def __exit__(self, *exc_info):
+        self.close()
 
-        batch_args.platform = system
-        batch_args.arch = architecture
+    def start(self, command):
+        """在日志开头记录执行的命令"""
+        if self._file is not None:
+            self._file.write(f"$ {subprocess.list2cmdline(command)}\n")
 
-        # 检查架构组合是否支持
-        if parse_arguments() is None:
-            return
+    def feed(self, data):
+        """接收一段原始输出, 按行切分; 不完整的末行留待下次拼接"""
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        if len(self._partial) > LOG_MAX_LINE:
+            lines.append(self._partial)
+            self._partial = b""
+        for line in lines:
+            self._add_line(line)
 
-        # 如果使用简单文件名格式, 则生成输出文件名时不包含系统和架构信息
-        if args.simple_name:
-            base_name = f"{BASE_OUTPUT_NAME}"
-            git_version = _git_info_cache["version"] if args.git else None
-            output_file = generate_output_file_name(base_name, system, git_version)
-        else:
-            base_name = f"{BASE_OUTPUT_NAME}_{system}_{architecture}"
-            git_version = _git_info_cache["version"] if args.git else None
-            output_file = generate_output_file_name(base_name, system, git_version)
-
-        # 生成zip文件名
-        if args.zip:
-            if args.zip_file is None:
-                git_version = _git_info_cache["version"] if args.git else None
-                zip_file = generate_zip_file_name(
-                    BASE_OUTPUT_NAME, system, architecture, git_version
-                )
-            else:
-                zip_file = args.zip_file
-        else:
-            zip_file = None
+    def _add_line(self, raw):
+        line = raw.decode("utf-8", errors="replace").rstrip("\r")
+        self.tail.append(line)
+        self.lines += 1
+        if self._file is not None:
+            self._file.write(line + "\n")
+        if self.name is not None and line:
+            _progress.update(self.name, line)
 
-        try:
-            # 执行构建
-            build_result = single_build(
-                args, system, architecture, output_file, zip_file
-            )
+    def close(self):
+        if self._partial:
+            self._add_line(self._partial)
+            self._partial = b""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
 
-            with lock:
-                if build_result:
-                    success_count += 1
-                else:
-                    fail_count += 1
-                completed_count = success_count + fail_count
+    def summary(self):
+        """返回用于错误提示的日志末尾, 有省略时注明完整日志的位置"""
+        text = "\n".join(self.tail).strip()
+        omitted = self.lines - len(self.tail)
+        if omitted > 0:
+            location = f", 完整日志: {self.path}" if self.path else ""
+            text = f"... 省略前 {omitted} 行{location}\n{text}"
+        elif self.path:
+            text = f"{text}\n(日志: {self.path})"
+        return text
+
+
+def process_group_kwargs():
+    """使子进程运行在独立的进程组中, 便于超时或取消时终止其派生的全部进程"""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def stream_process(command, log, env=None, cwd=None, timeout=None):
+    """运行子进程并将合并后的 stdout/stderr 逐块写入 log, 返回退出码
+
+    超过 timeout 秒时终止整个进程组并抛出 subprocess.TimeoutExpired。
+    """
+    log.start(command)
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+        cwd=cwd,
+        **process_group_kwargs(),
+    )
+    timed_out = threading.Event()
+
+    def expire():
+        timed_out.set()
+        kill_process_group(process)
+
+    timer = None
+    if timeout:
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+    try:
+        with process.stdout:
+            for chunk in iter(lambda: process.stdout.read1(STREAM_CHUNK_SIZE), b""):
+                log.feed(chunk)
+        process.wait()
+    except BaseException:
+        kill_process_group(process)
+        process.wait()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(command, timeout)
+    return process.returncode
+
+
+async def run_process_group(command, env, timeout, log):
+    """在独立的进程组中运行子进程, 合并后的 stdout/stderr 逐块写入 log, 返回退出码
+
+    超时抛出 asyncio.TimeoutError, 超时或任务被取消时都会终止整个进程组,
+    确保 go build 派生的编译/链接子进程不会残留。
+    """
+    import asyncio
+
+    log.start(command)
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        env=env,
+        **process_group_kwargs(),
+    )
+
+    async def pump():
+        while True:
+            chunk = await process.stdout.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            log.feed(chunk)
+        return await process.wait()
+
+    try:
+        return await asyncio.wait_for(pump(), timeout)
+    except BaseException:
+        kill_process_group(process)
+        await process.wait()
+        raise
+
+
+def kill_process_group(process):
+    """强制终止子进程及其所在进程组中的全部进程"""
+    if process.returncode is not None:
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                capture_output=True,
+            )
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def get_go_version(go_compiler):
+    """获取 Go 编译器的版本字符串(go version 的输出), 编译器不可用时返回 None"""
+    toolchain = probe_toolchain(go_compiler)
+    return toolchain["version"] if toolchain else None
+
+
+def toolchain_probe_key(go_compiler):
+    """计算工具链探测结果的缓存键, 找不到编译器时返回 None
+
+    除编译器的实际路径与修改时间外, 还包含影响 go env 输出的环境变量、
+    go env -w 写入的配置文件, 以及 go.mod 中可能触发工具链切换的 go/toolchain 指令。
+    """
+    path, mtime = toolchain_stamp(go_compiler)
+    if mtime is None:
+        return None
+    env_file = os.environ.get("GOENV") or os.path.join(
+        os.environ.get("APPDATA", "")
+        if os.name == "nt"
+        else os.environ.get("XDG_CONFIG_HOME")
+        or os.path.join(os.path.expanduser("~"), ".config"),
+        "go",
+        "env",
+    )
+    try:
+        env_file_mtime = os.stat(env_file).st_mtime_ns
+    except OSError:
+        env_file_mtime = None
+    directives = []
+    try:
+        with open("go.mod", "r", encoding="utf-8") as f:
+            directives = [
+                line.strip()
+                for line in f
+                if line.startswith("go ") or line.startswith("toolchain ")
+            ]
+    except OSError:
+        pass
+    return [
+        path,
+        mtime,
+        [os.environ.get(name, "") for name in TOOLCHAIN_ENV_VARS],
+        env_file_mtime,
+        directives,
+    ]
+
+
+def _toolchain_cache_file(key):
+    """返回工具链探测结果的磁盘缓存文件路径"""
+    digest = hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+    return os.path.join(DEFAULT_CACHE_DIR, "toolchain", f"{digest[:16]}.json")
+
+
+def query_toolchain(go_compiler):
+    """调用 go version、go env 与 go tool dist list 探测工具链, go version 失败时返回 None"""
+
+    def run(*command):
+        return subprocess.run(
+            [go_compiler, *command],
+            capture_output=True,
+            text=True,
+            check=True,
+            encoding="utf-8",
+        ).stdout
+
+    try:
+        version = run("version").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    toolchain = {"version": version, "env": {}, "targets": []}
+    try:
+        values = run("env", *TOOLCHAIN_PROBE_ENV).splitlines()
+        toolchain["env"] = dict(zip(TOOLCHAIN_PROBE_ENV, values))
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    try:
+        toolchain["targets"] = run("tool", "dist", "list").split()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return toolchain
+
+
+def probe_toolchain(go_compiler):
+    """返回工具链信息: version(go version 的输出)、env(GOROOT 等路径)与 targets(支持的平台/架构)
+
+    结果按 toolchain_probe_key 缓存在内存与磁盘中, 编译器或相关配置未变化时
+    后续运行无需再启动 go 子进程。编译器不可用时返回 None, 且不写入缓存。
+    """
+    key = toolchain_probe_key(go_compiler)
+    if key is None:
+        return None
+    memo_key = json.dumps(key)
+    if memo_key in _toolchain_cache:
+        return _toolchain_cache[memo_key]
+
+    cache_file = _toolchain_cache_file(key)
+    toolchain = None
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            toolchain = cached.get("toolchain")
+    except (OSError, ValueError):
+        pass
+
+    if toolchain is None:
+        toolchain = query_toolchain(go_compiler)
+        if toolchain is None:
+            return None
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            tmp_file = f"{cache_file}.tmp{os.getpid()}"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "toolchain": toolchain}, f)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            print_error(f"写入工具链缓存失败: {str(e)}")
+        _startup_profile.note("探测工具链", "重新探测")
+    else:
+        _startup_profile.note("探测工具链", "磁盘缓存")
+    _toolchain_cache[memo_key] = toolchain
+    return toolchain
+
+
+def toolchain_env(go_compiler, name):
+    """返回探测到的 go env 变量值, 未知时返回 None"""
+    toolchain = probe_toolchain(go_compiler)
+    return (toolchain["env"].get(name) or None) if toolchain else None
+
+
+def toolchain_supports(go_compiler, system, architecture):
+    """按 go tool dist list 判断工具链是否支持目标平台/架构, 无法探测时视为支持"""
+    toolchain = probe_toolchain(go_compiler)
+    if not toolchain or not toolchain["targets"]:
+        return True
+    return f"{system}/{architecture}" in toolchain["targets"]
+
+
+def toolchain_stamp(go_compiler):
+    """返回 (编译器实际路径, 修改时间), 找不到编译器时修改时间为 None"""
+    path = shutil.which(go_compiler) or go_compiler
+    try:
+        return os.path.realpath(path), os.stat(path).st_mtime_ns
+    except OSError:
+        return path, None
+
+
+def iter_source_files(root="."):
+    """按稳定顺序遍历模块目录下的源文件, 返回 (路径, 相对路径) 迭代器
+
+    除 .go 与 go.mod/go.sum 外, 其余文件也可能通过 go:embed 或 cgo 影响产物,
+    因此统一纳入; 隐藏文件、隐藏目录、测试文件与输出目录会被跳过。
+    """
+    for dirpath, filenames in iter_source_dirs(root):
+        for filename in sorted(filenames):
+            if not is_source_file(filename):
+                continue
+            path = os.path.join(dirpath, filename)
+            yield path, os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def iter_source_dirs(root="."):
+    """按稳定顺序遍历模块目录, 返回 (目录, 文件名列表) 迭代器, 跳过隐藏目录和输出目录"""
+    output_dir = os.path.normpath(DEFAULT_OUTPUT_DIR)
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.normpath(os.path.relpath(dirpath, root))
+        dirnames[:] = sorted(
+            d
+            for d in dirnames
+            if not d.startswith(".")
+            and os.path.normpath(os.path.join(rel_dir, d)) != output_dir
+        )
+        yield dirpath, filenames
+
+
+def is_source_file(filename):
+    """判断文件名是否属于参与构建的源文件"""
+    return not filename.startswith(".") and not filename.endswith("_test.go")
+
+
+def hash_source_tree(root="."):
+    """计算模块目录下所有源文件的内容指纹, 即注入到 verman.sourceHash 的值"""
+    if _source_hash_cache["hash"] is not None:
+        return _source_hash_cache["hash"]
+
+    digest = hashlib.sha256()
+    for rel_path, file_digest in file_digests(iter_source_files(root), root).items():
+        digest.update(f"{rel_path}\0{file_digest}\n".encode("utf-8"))
+
+    _source_hash_cache["hash"] = digest.hexdigest()
+    return _source_hash_cache["hash"]
+
+
+def _stat_index_file(root):
+    """返回项目对应的 stat 索引文件路径"""
+    digest = hashlib.sha256(os.path.abspath(root).encode("utf-8")).hexdigest()
+    return os.path.join(DEFAULT_CACHE_DIR, "index", f"{digest[:16]}.json")
+
+
+def file_digests(paths, root="."):
+    """返回 {相对路径: 内容 SHA-256}, 保持 paths 的顺序
+
+    paths 为 (路径, 相对路径) 迭代器。修改时间、大小与 inode 均未变化的文件
+    直接复用磁盘索引中的哈希, 只有变化的文件会被重新读取。
+    """
+    with _stat_index_lock:
+        index_file = _stat_index_file(root)
+        if _stat_index["root"] != os.path.abspath(root):
+            try:
+                with open(index_file, "r", encoding="utf-8") as f:
+                    files = json.load(f)["files"]
+            except (OSError, ValueError, KeyError):
+                files = {}
+            _stat_index.update(root=os.path.abspath(root), files=files)
+        files = _stat_index["files"]
+
+        result = {}
+        dirty = False
+        now_ns = time.time_ns()
+        for path, rel_path in paths:
+            st = os.stat(path)
+            stamp = [st.st_mtime_ns, st.st_size, st.st_ino]
+            entry = files.get(rel_path)
+            if entry and entry[:3] == stamp:
+                result[rel_path] = entry[3]
+                continue
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            result[rel_path] = digest.hexdigest()
+            if now_ns - st.st_mtime_ns > STAT_INDEX_RACY_WINDOW:
+                files[rel_path] = stamp + [result[rel_path]]
+                dirty = True
+            elif files.pop(rel_path, None) is not None:
+                dirty = True
+
+        if dirty:
+            # 顺带清理已删除文件的索引项
+            for rel_path in [p for p in files if p not in result]:
+                if not os.path.exists(os.path.join(root, rel_path)):
+                    del files[rel_path]
+            try:
+                os.makedirs(os.path.dirname(index_file), exist_ok=True)
+                tmp_file = f"{index_file}.tmp{os.getpid()}"
+                with open(tmp_file, "w", encoding="utf-8") as f:
+                    json.dump({"files": files}, f)
+                os.replace(tmp_file, index_file)
+            except OSError as e:
+                print_error(f"写入源码索引失败: {str(e)}")
+    return result
+
+
+def compute_artifact_key(config: BuildConfig, env):
+    """计算构建产物的内容寻址缓存键
+
+    键覆盖源码、go.mod/go.sum、目标平台及相关环境变量、编译器版本,
+    以及剔除了构建时间的链接器标志。可复现模式下构建时间是确定的,
+    链接器标志原样参与计算。无法确定编译器版本时返回 None。
+    """
+    go_version = get_go_version(config.go_compiler)
+    if go_version is None:
+        return None
+
+    custom_keys = set(config.env or {})
+    key_env = {
+        k: v
+        for k, v in env.items()
+        if (k.startswith(("GO", "CGO_")) or k in CACHE_KEY_ENV_VARS or k in custom_keys)
+        and k not in CACHE_KEY_IGNORED_ENV_VARS
+    }
+    material = {
+        "source": hash_source_tree(),
+        "go_version": go_version,
+        "env": sorted(key_env.items()),
+        "ldflags": (
+            config.ldflags
+            if config.reproducible
+            else BUILD_TIME_PATTERN.sub(r"\1", config.ldflags)
+        ),
+        "trimpath": config.reproducible,
+        "buildvcs": not config.reproducible,
+        "entry": config.entry_file,
+        "vendor": config.use_vendor_in_build,
+        "exe": os.path.splitext(config.output_file)[1],
+    }
+    encoded = json.dumps(material, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _cache_entry_path(key):
+    """返回缓存键对应的产物存储路径"""
+    return os.path.join(DEFAULT_CACHE_DIR, "artifacts", key[:2], key)
+
+
+def cache_lookup(key, output_file):
+    """查找构建缓存, 命中时将产物复制到输出路径"""
+    entry = _cache_entry_path(key)
+    if not os.path.isfile(entry):
+        with _cache_lock:
+            _cache_stats["misses"] += 1
+        return False
+    try:
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        tmp_file = f"{output_file}.tmp{threading.get_ident()}"
+        shutil.copyfile(entry, tmp_file)
+        os.chmod(tmp_file, 0o755)
+        os.replace(tmp_file, output_file)
+        # 更新修改时间, 作为 LRU 淘汰的访问时间依据
+        os.utime(entry)
+    except OSError as e:
+        print_error(f"读取构建缓存失败: {str(e)}")
+        with _cache_lock:
+            _cache_stats["misses"] += 1
+        return False
+    with _cache_lock:
+        _cache_stats["hits"] += 1
+    return True
+
+
+def cache_store(key, output_file):
+    """将构建成功的产物存入缓存, 累计大小超出容量上限时执行淘汰
+
+    本进程首次写入时遍历一次缓存目录得到总大小, 此后只累加新写入的产物;
+    其他进程的写入由下一次淘汰时的遍历校正。
+    """
+    entry = _cache_entry_path(key)
+    try:
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp_file = f"{entry}.tmp{os.getpid()}_{threading.get_ident()}"
+        shutil.copyfile(output_file, tmp_file)
+        size = os.path.getsize(tmp_file)
+        try:
+            replaced = os.path.getsize(entry)
+        except OSError:
+            replaced = 0
+        # 原子替换, 避免并发构建读取到不完整的产物
+        os.replace(tmp_file, entry)
+    except OSError as e:
+        print_error(f"写入构建缓存失败: {str(e)}")
+        return
+    with _cache_lock:
+        _cache_stats["stores"] += 1
+        if _cache_size["bytes"] is not None:
+            _cache_size["bytes"] += size - replaced
+        over_limit = _cache_size["bytes"] is None or _cache_size["bytes"] > DEFAULT_CACHE_MAX_SIZE
+    if over_limit:
+        evict_cache(DEFAULT_CACHE_MAX_SIZE)
+
+
+def list_cache_entries():
+    """列出缓存中的全部产物, 返回 (路径, 大小, 最近访问时间) 列表"""
+    entries = []
+    artifacts_dir = os.path.join(DEFAULT_CACHE_DIR, "artifacts")
+    if not os.path.isdir(artifacts_dir):
+        return entries
+    for dirpath, _, filenames in os.walk(artifacts_dir):
+        for filename in filenames:
+            if ".tmp" in filename:
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+    return entries
+
+
+def evict_cache(max_size):
+    """按最近最少使用顺序淘汰缓存条目, 直到总大小不超过上限
+
+    遍历缓存目录时不持有 _cache_lock, 其他线程可以继续读写缓存; 已有线程
+    在淘汰时直接返回, 期间写入的产物计入累计大小, 由下一次淘汰处理。
+    """
+    if not _cache_evict_lock.acquire(blocking=False):
+        return
+    try:
+        entries = list_cache_entries()
+        total_size = sum(size for _, size, _ in entries)
+        evictions = 0
+        if total_size > max_size:
+            for path, size, _ in sorted(entries, key=lambda e: e[2]):
+                if total_size <= max_size:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total_size -= size
+                evictions += 1
+        with _cache_lock:
+            _cache_size["bytes"] = total_size
+            _cache_stats["evictions"] += evictions
+    finally:
+        _cache_evict_lock.release()
+
+
+def save_cache_stats():
+    """将本次运行的缓存统计合并写入磁盘"""
+    with _cache_lock:
+        if not any(_cache_stats.values()):
+            return
+        stats = load_cache_stats()
+        for name, value in _cache_stats.items():
+            stats[name] = stats.get(name, 0) + value
+            _cache_stats[name] = 0
+        try:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            tmp_file = os.path.join(DEFAULT_CACHE_DIR, f"stats.json.tmp{os.getpid()}")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(stats, f)
+            os.replace(tmp_file, os.path.join(DEFAULT_CACHE_DIR, "stats.json"))
+        except OSError as e:
+            print_error(f"写入缓存统计失败: {str(e)}")
+
+
+def load_cache_stats():
+    """读取磁盘上累计的缓存统计"""
+    try:
+        with open(
+            os.path.join(DEFAULT_CACHE_DIR, "stats.json"), "r", encoding="utf-8"
+        ) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def print_cache_stats():
+    """打印构建缓存的统计信息"""
+    stats = load_cache_stats()
+    entries = list_cache_entries()
+    total_size = sum(size for _, size, _ in entries)
+    hits = stats.get("hits", 0)
+    misses = stats.get("misses", 0)
+    hit_rate = hits / (hits + misses) * 100 if hits + misses else 0.0
+    print_success(f"缓存目录: {DEFAULT_CACHE_DIR}")
+    print_success(
+        f"缓存条目: {len(entries)} 个, 占用 {total_size / 1024 / 1024:.2f} MB / 上限 {DEFAULT_CACHE_MAX_SIZE / 1024 / 1024:.2f} MB"
+    )
+    print_success(
+        f"命中 {hits} 次, 未命中 {misses} 次, 命中率 {hit_rate:.1f}%, 写入 {stats.get('stores', 0)} 次, 淘汰 {stats.get('evictions', 0)} 次"
+    )
+    remote_hits = stats.get("remote_hits", 0)
+    remote_misses = stats.get("remote_misses", 0)
+    if remote_hits or remote_misses or stats.get("remote_stores", 0):
+        lookups = remote_hits + remote_misses
+        remote_rate = remote_hits / lookups * 100 if lookups else 0.0
+        print_success(
+            f"远程缓存: 命中 {remote_hits} 次, 未命中 {remote_misses} 次, 命中率 {remote_rate:.1f}%, 上传 {stats.get('remote_stores', 0)} 次, 出错 {stats.get('remote_errors', 0)} 次"
+        )
+
+
+class CacheBackend:
+    """远程构建缓存后端的接口, 按对象名存取文件
+
+    对象名形如 "ab/<缓存键>" 与 "ab/<缓存键>.json"。put 必须保证其他节点
+    不会读到写了一半的对象; 产物的哈希校验由调用方完成。
+    访问出错后 available 置为 False, 本次运行不再访问该后端。
+    """
+
+    available = True
+
+    def get(self, name, dest):
+        """下载对象到本地文件 dest, 对象不存在时返回 False, 出错时抛出 OSError"""
+        raise NotImplementedError
+
+    def put(self, name, src):
+        """上传本地文件 src 为指定对象, 出错时抛出 OSError"""
+        raise NotImplementedError
+
+
+class DirectoryCacheBackend(CacheBackend):
+    """以共享目录(如 NFS 挂载点)作为远程缓存"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def get(self, name, dest):
+        try:
+            shutil.copyfile(os.path.join(self.root, name), dest)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, name, src):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 临时文件名包含主机名, 多个节点同时上传时互不覆盖; 同目录内 rename 是原子的
+        tmp_file = f"{path}.tmp{platform.node()}_{os.getpid()}_{threading.get_ident()}"
+        try:
+            shutil.copyfile(src, tmp_file)
+            os.replace(tmp_file, path)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+
+class HttpCacheBackend(CacheBackend):
+    """以支持 GET/PUT 的 HTTP 服务(如 nginx WebDAV)作为远程缓存"""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def get(self, name, dest):
+        import urllib.error
+        import urllib.request
+
+        try:
+            with urllib.request.urlopen(
+                f"{self.url}/{name}", timeout=REMOTE_CACHE_TIMEOUT
+            ) as response, open(dest, "wb") as f:
+                shutil.copyfileobj(response, f, STREAM_CHUNK_SIZE)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return False
+            raise
+        return True
+
+    def put(self, name, src):
+        import urllib.request
+
+        with open(src, "rb") as f:
+            request = urllib.request.Request(
+                f"{self.url}/{name}",
+                data=f,
+                method="PUT",
+                headers={
+                    "Content-Length": str(os.path.getsize(src)),
+                    "Content-Type": "application/octet-stream",
+                },
+            )
+            urllib.request.urlopen(request, timeout=REMOTE_CACHE_TIMEOUT).close()
+
+
+def get_cache_backend(spec):
+    """根据 --remote-cache 参数返回远程缓存后端, http(s) 地址使用 HTTP 后端, 其余视为目录"""
+    with _cache_lock:
+        if spec not in _cache_backends:
+            if spec.startswith(("http://", "https://")):
+                _cache_backends[spec] = HttpCacheBackend(spec)
+            else:
+                _cache_backends[spec] = DirectoryCacheBackend(os.path.expanduser(spec))
+        return _cache_backends[spec]
+
+
+def remote_cache_lookup(backend, key, output_file):
+    """在远程缓存中查找产物, 与元数据中记录的哈希一致时才放到输出路径"""
+    if not backend.available:
+        return False
+    name = f"{key[:2]}/{key}"
+    tmp_file = f"{output_file}.remote{threading.get_ident()}"
+    meta_file = f"{tmp_file}.json"
+    outcome = "remote_misses"
+    try:
+        # 元数据在产物之后上传, 读到元数据即说明产物已完整可用
+        if backend.get(f"{name}.json", meta_file):
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if backend.get(name, tmp_file):
+                if hash_file(tmp_file)["sha256"] == meta.get("sha256"):
+                    os.chmod(tmp_file, 0o755)
+                    os.replace(tmp_file, output_file)
+                    outcome = "remote_hits"
+                else:
+                    print_error(f"远程缓存中的产物与记录的哈希不一致, 已忽略: {key}")
+                    outcome = "remote_errors"
+    except (OSError, ValueError) as e:
+        print_error(f"读取远程缓存失败, 本次运行不再使用远程缓存: {str(e)}")
+        backend.available = False
+        outcome = "remote_errors"
+    finally:
+        for path in (tmp_file, meta_file):
+            if os.path.exists(path):
+                os.remove(path)
+    with _cache_lock:
+        _cache_stats[outcome] += 1
+    return outcome == "remote_hits"
+
+
+def remote_cache_store(backend, key, output_file):
+    """上传产物与其元数据到远程缓存, 先传产物后传元数据"""
+    if not backend.available:
+        return
+    name = f"{key[:2]}/{key}"
+    digest = hash_file(output_file)
+    meta = {
+        "sha256": digest["sha256"],
+        "size": digest["size"],
+        "commit": _git_info_cache["commit"],
+        "host": platform.node(),
+        "created": int(time.time()),
+    }
+    meta_file = f"{output_file}.remote{threading.get_ident()}.json"
+    try:
+        with open(meta_file, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        backend.put(name, output_file)
+        backend.put(f"{name}.json", meta_file)
+    except OSError as e:
+        print_error(f"上传远程缓存失败, 本次运行不再使用远程缓存: {str(e)}")
+        backend.available = False
+        with _cache_lock:
+            _cache_stats["remote_errors"] += 1
+        return
+    finally:
+        if os.path.exists(meta_file):
+            os.remove(meta_file)
+    with _cache_lock:
+        _cache_stats["remote_stores"] += 1
+
+
+class HashingStream:
+    """包装文件对象, 在读写数据的同时计算 SHA-256/SHA-512 与字节数
+
+    不提供 tell/seek, zipfile 与 tarfile 会按不可寻址的流式方式写入,
+    从而保证经过本对象的字节与最终落盘的内容完全一致。
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._sha256 = hashlib.sha256()
+        self._sha512 = hashlib.sha512()
+        self._size = 0
+
+    def _update(self, data):
+        self._sha256.update(data)
+        self._sha512.update(data)
+        self._size += len(data)
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self._update(data)
+        return data
+
+    def write(self, data):
+        self._update(data)
+        return self._fileobj.write(data)
+
+    def flush(self):
+        self._fileobj.flush()
+
+    def digest(self):
+        """返回 {"size", "sha256", "sha512"} 摘要字典"""
+        return {
+            "size": self._size,
+            "sha256": self._sha256.hexdigest(),
+            "sha512": self._sha512.hexdigest(),
+        }
+
+
+def hash_file(path):
+    """一次流式读取文件, 同时计算 SHA-256 与 SHA-512"""
+    with open(path, "rb") as f:
+        stream = HashingStream(f)
+        while stream.read(STREAM_CHUNK_SIZE):
+            pass
+    return stream.digest()
+
+
+def archive_executable(
+    output_file,
+    archive_file,
+    archive_format="zip",
+    level=None,
+    is_batch=False,
+    mtime=None,
+):
+    """将构建成功的可执行文件打包到指定格式的归档文件中
+
+    归档内只保存文件名本身, 不包含输出目录前缀。指定 mtime 时归档内的时间戳、
+    权限与属主统一规范化, 相同的可执行文件总是得到逐字节相同的归档。可执行文件只读取一次,
+    读取与写入归档的同时计算两者的摘要, 返回 {"archive": 摘要, "binary": 摘要,
+    "timing": 执行进程与起止时间}, 失败时返回 None。该函数会在进程池中执行,
+    因此只接收可序列化的简单参数。
+    """
+    import tarfile
+    import zipfile
+
+    start_time = time.time()
+    arcname = os.path.basename(output_file)
+    try:
+        if not is_batch:
+            print_success(f"{output_file} --> {archive_file}")
+        with open(archive_file, "wb") as raw, open(output_file, "rb") as src:
+            archive_stream = HashingStream(raw)
+            binary_stream = HashingStream(src)
+            if archive_format == "zip":
+                with zipfile.ZipFile(
+                    archive_stream, "w", zipfile.ZIP_DEFLATED, compresslevel=level
+                ) as zipf:
+                    zinfo = zipfile.ZipInfo.from_file(output_file, arcname)
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    # from_file 不会继承 ZipFile 的压缩级别, 需要手动指定
+                    zinfo._compresslevel = level
+                    if mtime is not None:
+                        zinfo.date_time = time.gmtime(max(mtime, ZIP_EPOCH))[:6]
+                        zinfo.create_system = 3  # Unix, 使权限位在各平台上一致
+                        zinfo.external_attr = (0o100000 | REPRODUCIBLE_FILE_MODE) << 16
+                    with zipf.open(zinfo, "w") as dest:
+                        shutil.copyfileobj(binary_stream, dest, STREAM_CHUNK_SIZE)
+            else:
+                compression = archive_format.partition(".")[2]
+                compressor = open_compressor(archive_stream, compression, level, mtime)
+                with tarfile.open(fileobj=compressor or archive_stream, mode="w|") as tar:
+                    tarinfo = tar.gettarinfo(output_file, arcname)
+                    if mtime is not None:
+                        tarinfo.mtime = mtime
+                        tarinfo.mode = REPRODUCIBLE_FILE_MODE
+                        tarinfo.uid = tarinfo.gid = 0
+                        tarinfo.uname = tarinfo.gname = ""
+                    tar.addfile(tarinfo, binary_stream)
+                if compressor is not None:
+                    compressor.close()
+
+        try:
+            os.remove(output_file)
+        except Exception as e:
+            print_error(f"删除源文件 {output_file} 失败: {str(e)}")
+        return {
+            "archive": archive_stream.digest(),
+            "binary": binary_stream.digest(),
+            "timing": {"pid": os.getpid(), "start": start_time, "end": time.time()},
+        }
+    except Exception as e:
+        print_error(f"打包到 {archive_file} 失败：{str(e)}")
+        return None
+
+
+def open_compressor(fileobj, compression, level=None, mtime=None):
+    """为 tar 流创建压缩层, 不压缩时返回 None; mtime 为写入 gzip 头部的时间戳"""
+    import bz2
+    import gzip
+    import lzma
+
+    if compression == "gz":
+        return gzip.GzipFile(
+            fileobj=fileobj,
+            mode="wb",
+            compresslevel=9 if level is None else level,
+            mtime=mtime,
+        )
+    if compression == "bz2":
+        return bz2.BZ2File(fileobj, "wb", compresslevel=9 if level is None else level)
+    if compression == "xz":
+        return lzma.LZMAFile(fileobj, "wb", preset=level)
+    return None
+
+
+def write_checksum_manifest(entries):
+    """在输出目录生成 SHA256SUMS 与 JSON 清单
+
+    entries 为本次生成的产物列表; 清单中已有且文件未变化的其他产物会被保留,
+    使清单覆盖输出目录中的全部产物。
+    """
+    manifest_path = os.path.join(DEFAULT_OUTPUT_DIR, MANIFEST_FILE_NAME)
+    artifacts = {entry["file"]: entry for entry in entries}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f).get("artifacts", [])
+    except (OSError, ValueError):
+        previous = []
+    for entry in previous:
+        path = os.path.join(DEFAULT_OUTPUT_DIR, entry.get("file", ""))
+        if entry.get("file") in artifacts or not os.path.isfile(path):
+            continue
+        st = os.stat(path)
+        if st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime_ns"):
+            artifacts[entry["file"]] = entry
+
+    ordered = [artifacts[name] for name in sorted(artifacts)]
+    manifest = {
+        "version": _git_info_cache["version"],
+        "commit": _git_info_cache["commit"],
+        "artifacts": ordered,
+    }
+    try:
+        os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
+        with open(
+            os.path.join(DEFAULT_OUTPUT_DIR, CHECKSUM_FILE_NAME), "w", encoding="utf-8"
+        ) as f:
+            for entry in ordered:
+                f.write(f"{entry['sha256']}  {entry['file']}\n")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+    except OSError as e:
+        print_error(f"写入校验和清单失败: {str(e)}")
+        return
+    print_success(f"已生成校验和清单: {CHECKSUM_FILE_NAME}, {MANIFEST_FILE_NAME}")
+
+
+def trace_archive(target, binary, result):
+    """将打包进程返回的耗时记录到追踪文件, 每个打包进程单独一条泳道"""
+    if not result or not _tracer.enabled:
+        return
+    timing = result["timing"]
+    if timing["pid"] != os.getpid():
+        _tracer.name_process(timing["pid"], "archive worker")
+    _tracer.add(
+        f"archive {target.name}",
+        "archive",
+        timing["start"],
+        timing["end"],
+        pid=timing["pid"] if timing["pid"] != os.getpid() else None,
+        args={"file": os.path.basename(binary.archive_file), "size": result["archive"]["size"]},
+    )
+
+
+def collect_artifact_entry(target, binary, result=None):
+    """生成清单中的产物条目, result 为打包结果, 未打包时读取可执行文件计算摘要"""
+    path = binary.archive_file if result else binary.output_file
+    if result:
+        entry = dict(result["archive"])
+        entry["binary"] = dict(result["binary"], file=os.path.basename(binary.output_file))
+    else:
+        entry = hash_file(path)
+    entry.update(
+        file=os.path.relpath(path, DEFAULT_OUTPUT_DIR).replace(os.sep, "/"),
+        target=target.name,
+        name=binary.name,
+        git_version=_git_info_cache["version"],
+        mtime_ns=os.stat(path).st_mtime_ns,
+    )
+    return entry
+
+
+def batch_build(args, plan):
+    """按构建计划批量构建所有平台和架构组合"""
+    import asyncio
+
+    print_success("开始批量构建所有支持的平台和架构组合...")
+    total_start_time = time.time()
+    print_success(f"总任务数: {len(plan.targets) + len(plan.skipped)}")
+
+    # 计划中的目标已按历史耗时从长到短排序, 缩短整体完成时间
+    history = load_build_history()
+    if args.estimate:
+        print_build_estimate(
+            [(t.system, t.arch) for t in plan.targets], history, plan.max_workers
+        )
+
+    # 根据参数注入 Git 信息
+    if args.git:
+        print_success("正在获取 Git 信息...")
+        if _git_info_cache["version"] is None:
+            print_error("Git 信息获取失败, 请检查 Git 环境是否正确配置。")
+            sys.exit(1)
+
+    # 预热模块缓存和各目标的标准库, 避免并发构建争抢下载和重复编译
+    if not args.no_warmup:
+        with _tracer.span("warm-up", "warmup"):
+            warm_up_caches(
+                args, [(t.system, t.arch) for t in plan.targets], plan.max_workers
+            )
+
+    try:
+        counts, checks_ok = asyncio.run(
+            run_batch_async(plan, plan.max_workers, args.timeout, history)
+        )
+    except KeyboardInterrupt:
+        save_build_history(history)
+        print_error("收到中断信号, 已终止全部构建进程")
+        sys.exit(130)
+
+    # 检查失败时在途编译已被取消, 整个批量构建视为失败
+    save_cache_stats()
+    save_build_history(history)
+    if not checks_ok:
+        print_error("构建环境检查未通过, 批量构建已中止")
+        sys.exit(1)
+    total_elapsed_time = time.time() - total_start_time
+    print_success(
+        f"批量构建完成, 成功 {counts['success']} 个, 失败 {counts['fail']} 个, 跳过 {counts['skip']} 个"
+    )
+    if counts["remote"]:
+        print_success(f"其中 {counts['remote']} 个目标由构建代理完成")
+    print_success(f"总耗时: {total_elapsed_time:.2f} 秒")
+
+
+async def run_batch_async(plan, max_workers, timeout, history):
+    """在事件循环中执行构建计划, 返回 (计数字典, 检查是否通过)
+
+    本机最多同时运行 max_workers 个构建, 计划中配置了构建代理时每个代理
+    另外提供其声明的并发数个槽位; 构建前检查在线程中执行, 依赖整理完成后
+    首批目标即开始推测性编译, 检查失败时取消全部构建任务。
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    counts = {"success": 0, "fail": 0, "skip": len(plan.skipped), "remote": 0}
+    entries = []
+    total_tasks = len(plan.targets) + len(plan.skipped)
+    agents = await connect_agents(plan.agents, get_go_version(plan.go_compiler))
+    # 工作槽位: (追踪泳道名, 构建代理), 本机槽位的构建代理为 None; 空闲槽位按编号从小到大分配
+    slots = [(f"worker {i}", None) for i in range(1, max_workers + 1)]
+    for agent in agents:
+        slots.extend((f"{agent.address} #{i}", agent) for i in range(1, agent.workers + 1))
+    free_slots = asyncio.PriorityQueue()
+    for slot in range(len(slots)):
+        free_slots.put_nowait(slot)
+    active = 0
+    mod_ready = asyncio.Event()
+    checks_done = asyncio.Event()
+    snapshot_dir = tempfile.mkdtemp(prefix="verman-snapshot-") if agents else None
+    snapshot_future = None
+
+    for name, reason in plan.skipped:
+        print_success(f"跳过{reason}: {name}")
+
+    async def wait_for_memory(target):
+        # 可用内存不足一个构建的预估用量时暂缓启动, 没有在途构建时总是放行
+        wait_start = time.time()
+        waited = False
+        while active > 0:
+            available = available_memory()
+            if available is None or available >= DEFAULT_BUILD_MEMORY:
+                break
+            if not waited:
                 print_success(
-                    f"已完成 {completed_count}/{total_tasks} 个任务 (成功 {success_count} 个, 失败 {fail_count} 个, 跳过 {skip_count} 个)"
+                    f"可用内存 {available / 1024 / 1024:.0f} MB 不足, 暂缓启动 {target.name} (在途构建 {active} 个)"
+                )
+                waited = True
+            await asyncio.sleep(MEMORY_POLL_INTERVAL)
+        if waited:
+            _tracer.add(f"memory wait {target.name}", "schedule", wait_start, time.time())
+            print_success(f"内存压力缓解, 开始构建 {target.name}")
+
+    async def acquire_slot():
+        # 已失效代理的槽位取出后直接丢弃, 不再放回
+        while True:
+            slot = await free_slots.get()
+            agent = slots[slot][1]
+            if agent is None or agent.alive:
+                return slot
+
+    def source_snapshot():
+        # 源码快照在全部检查通过后只创建一次, 所有构建代理共用
+        nonlocal snapshot_future
+        if snapshot_future is None:
+            snapshot_future = asyncio.ensure_future(
+                asyncio.to_thread(create_source_snapshot, snapshot_dir)
+            )
+        return asyncio.shield(snapshot_future)
+
+    async def build_on_agent(agent, target):
+        # 返回 (构建结果, 各可执行文件的打包结果); 代理不可用或本机缓存已有产物时返回 None, 由调用方在本机完成
+        await checks_done.wait()
+        if plan.use_cache and await asyncio.to_thread(has_cached_artifact, plan, target):
+            return None
+        if agent_target_env(target.env) is None:
+            print_success(f"{target.name} 使用了构建代理不接受的环境变量, 在本机构建")
+            return None
+        _progress.start(target.name, f"构建代理 {agent.address}")
+        try:
+            snapshot = await source_snapshot()
+            await upload_snapshot(agent, snapshot)
+            with _tracer.span(f"build {target.name}", "target") as span:
+                span["agent"] = agent.address
+                result = await asyncio.wait_for(
+                    request_agent_build(agent, snapshot[0], plan, target, timeout), timeout
+                )
+                span["ok"] = result[0]
+            return result
+        except asyncio.TimeoutError:
+            print_error(f"构建 {target.name} 超时({timeout} 秒), 构建代理: {agent.address}")
+            return False, None
+        except (OSError, ValueError, EOFError) as e:
+            agent.alive = False
+            print_error(f"构建代理 {agent.address} 不可用, 改为在本机构建 {target.name}: {str(e)}")
+            return None
+
+    async def archive_binary(target, binary):
+        if not binary.archive_file:
+            return None
+        result = await loop.run_in_executor(
+            archive_pool,
+            archive_executable,
+            binary.output_file,
+            binary.archive_file,
+            plan.archive_format,
+            plan.compress_level,
+            True,
+            plan.source_date_epoch,
+        )
+        trace_archive(target, binary, result)
+        return result
+
+    def report_progress():
+        completed_count = counts["success"] + counts["fail"]
+        print_success(
+            f"已完成 {completed_count}/{total_tasks} 个任务 (成功 {counts['success']} 个, 失败 {counts['fail']} 个, 跳过 {counts['skip']} 个)"
+        )
+
+    async def build_task(index):
+        # 首批任务在依赖整理完成后推测性地开始编译, 其余任务等待全部检查通过
+        await (mod_ready if index < max_workers else checks_done).wait()
+        # 检查阶段可能改写了源码, 使用更新了 sourceHash 的计划
+        target = plan.targets[index]
+
+        nonlocal active
+        # 占用一个空闲的工作槽位, 追踪文件中每个槽位对应一条泳道
+        slot = await acquire_slot()
+        lane, agent = slots[slot]
+        _trace_lane.set(lane)
+        remote = None
+        try:
+            if agent is not None:
+                remote = await build_on_agent(agent, target)
+            if remote is not None:
+                build_result, archive_results = remote
+            else:
+                await wait_for_memory(target)
+                active += 1
+                _progress.start(target.name, "编译中")
+                try:
+                    with _tracer.span(f"build {target.name}", "target") as span:
+                        build_result = await single_build(plan, target, timeout, history)
+                        span["ok"] = build_result
+                finally:
+                    active -= 1
+        except asyncio.CancelledError:
+            _progress.finish(target.name)
+            raise
+        except Exception as e:
+            build_result = False
+            print_error(f"构建 {target.name} 时发生异常: {str(e)}")
+        finally:
+            if agent is None or agent.alive:
+                free_slots.put_nowait(slot)
+
+        try:
+            # 代理已在远端完成打包; 本机构建的打包在进程池中执行, 与其余目标的编译并行
+            if remote is not None:
+                counts["remote"] += build_result
+            elif build_result:
+                _progress.update(target.name, "打包中")
+                archive_results = await asyncio.gather(
+                    *(archive_binary(target, binary) for binary in target.binaries)
+                )
+            if build_result and plan.write_checksums:
+                for binary, archive_result in zip(target.binaries, archive_results):
+                    if archive_result or not binary.archive_file:
+                        entries.append(
+                            await asyncio.to_thread(
+                                collect_artifact_entry, target, binary, archive_result
+                            )
+                        )
+        finally:
+            _progress.finish(target.name)
+        counts["success" if build_result else "fail"] += 1
+        report_progress()
+
+    archive_pool = None
+    if any(b.archive_file for target in plan.targets for b in target.binaries):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # 事件循环已启动了多个线程, 使用 fork 创建子进程可能继承被占用的锁而死锁
+        start_method = (
+            "forkserver"
+            if "forkserver" in multiprocessing.get_all_start_methods()
+            else "spawn"
+        )
+        archive_pool = ProcessPoolExecutor(
+            max_workers=min(
+                sum(len(target.binaries) for target in plan.targets), os.cpu_count() or 1
+            ),
+            mp_context=multiprocessing.get_context(start_method),
+        )
+    build_tasks = [
+        asyncio.create_task(build_task(index)) for index in range(len(plan.targets))
+    ]
+
+    def on_mod_ready():
+        # 在检查线程中按改写后的源码更新计划, 再切回事件循环放行推测性编译
+        refreshed = with_source_hash(plan)
+
+        def release():
+            nonlocal plan
+            plan = refreshed
+            mod_ready.set()
+
+        loop.call_soon_threadsafe(release)
+
+    # 在线程中执行构建前的检查工作
+    print_success("开始检查构建环境...")
+    checks_ok = await loop.run_in_executor(
+        None,
+        lambda: pre_build_checks(
+            plan.go_compiler,
+            plan.entry_file,
+            plan.use_vendor,
+            on_mod_ready=on_mod_ready,
+            use_check_cache=plan.use_check_cache,
+            recheck=plan.recheck,
+        ),
+    )
+    if not checks_ok:
+        running = sum(1 for task in build_tasks if not task.done())
+        for task in build_tasks:
+            task.cancel()
+        if running:
+            print_error(f"构建环境检查失败, 已取消 {running} 个构建任务")
+    mod_ready.set()
+    checks_done.set()
+
+    try:
+        await asyncio.gather(*build_tasks, return_exceptions=True)
+    finally:
+        if archive_pool is not None:
+            archive_pool.shutdown(wait=True, cancel_futures=True)
+        if snapshot_dir is not None:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+    if entries:
+        with _tracer.span("checksum manifest", "archive"):
+            write_checksum_manifest(entries)
+    return counts, checks_ok
+
+
+def resolve_single_target(args):
+    """解析单平台构建的目标平台和架构, 不支持时直接退出"""
+    # 获取操作系统和架构信息
+    system = args.platform if args.platform else platform.system().lower()
+    architecture = args.arch if args.arch else platform.machine().lower()
+
+    # 检查是否仅构建当前平台
+    if args.current_platform_only and system != platform.system().lower():
+        print_error(
+            f"当前平台为 {platform.system().lower()}, 不允许构建 {system} 平台的可执行文件"
+        )
+        sys.exit(1)
+
+    # 自动转换x86_64为amd64
+    if architecture == "x86_64":
+        architecture = "amd64"
+
+    # 校验平台和架构是否支持
+    if system not in SUPPORTED_PLATFORMS:
+        print_error(f"不支持的平台: {system}, 支持的平台: {SUPPORTED_PLATFORMS}")
+        print_error(
+            "支持的平台简写: "
+            + ", ".join([f"{k}({v})" for k, v in PLATFORM_SHORTCUTS.items()])
+        )
+        sys.exit(1)
+    if architecture not in SUPPORTED_ARCHITECTURES:
+        print_error(
+            f"不支持的架构: {architecture}, 支持的架构: {SUPPORTED_ARCHITECTURES}"
+        )
+        print_error(
+            "支持的架构简写: "
+            + ", ".join([f"{k}({v})" for k, v in ARCHITECTURE_SHORTCUTS.items()])
+        )
+        sys.exit(1)
+    return system, architecture
+
+
+def create_build_plan(args, verbose=True):
+    """将命令行参数一次性解析为不可变的构建计划
+
+    批量模式下按历史耗时从长到短排列目标; 单平台模式下计划只包含一个目标。
+    同一计划内的所有目标共用同一个构建时间, 可复现模式下构建时间取自
+    SOURCE_DATE_EPOCH 或 HEAD 的提交时间, 无法确定时直接退出。
+    入口为多个包或包模式时, 每个目标包含全部 main 包, 各可执行文件以包名
+    作为 appName 与输出、归档文件名的前缀。
+    """
+    packages = resolve_main_packages(args.go_compiler, args.entry)
+    if packages is None:
+        sys.exit(1)
+    if args.zip_file and len(packages) > 1:
+        print_error("构建多个可执行文件时不能指定归档文件名, 请移除--zip-file参数")
+        sys.exit(1)
+    epoch = None
+    if args.reproducible:
+        epoch = source_date_epoch()
+        if epoch is None:
+            print_error("可复现模式需要设置 SOURCE_DATE_EPOCH 或在 Git 仓库中构建")
+            sys.exit(1)
+        build_time = datetime.fromtimestamp(epoch, timezone.utc)
+    else:
+        build_time = datetime.now(timezone.utc)
+    build_time = build_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+    git_version = _git_info_cache["version"] if args.git else None
+    if args.batch:
+        history = load_build_history()
+        candidates = schedule_targets(resolve_batch_targets(args), history)
+        # 批量模式下注入的 appName 与归档文件名均使用 BASE_OUTPUT_NAME
+        app_name = BASE_OUTPUT_NAME
+    else:
+        history = {}
+        candidates = [resolve_single_target(args)]
+        app_name = args.output
+
+    targets = []
+    skipped = []
+    for system, architecture in candidates:
+        name = f"{system}/{architecture}"
+        # 跳过不支持的平台/架构组合
+        if (system, architecture) in UNSUPPORTED_TARGETS:
+            skipped.append((name, "不支持的平台/架构组合"))
+            continue
+        if not toolchain_supports(args.go_compiler, system, architecture):
+            skipped.append((name, "当前 Go 工具链不支持"))
+            continue
+        # 如果启用了仅构建当前平台且平台不一致则跳过
+        if args.current_platform_only and system != platform.system().lower():
+            skipped.append((name, "非当前平台"))
+            continue
+
+        binaries = []
+        for package, exec_name in packages:
+            # 单入口沿用原有命名, 多入口时以可执行文件名区分
+            binary_name = exec_name or app_name
+            base_name = exec_name or BASE_OUTPUT_NAME
+
+            # 处理Git信息
+            ldflags = args.ldflags
+            if args.git:
+                ldflags = LD_FLAGS_TEMPLATE.format(
+                    app_name=binary_name,
+                    git_version=_git_info_cache["version"],
+                    git_commit=_git_info_cache["commit"],
+                    commit_time=_git_info_cache["commit_time"],
+                    build_time=build_time,
+                    tree_state=_git_info_cache["status"],
+                    source_hash=hash_source_tree(),
+                )
+            if args.reproducible:
+                # 清空链接器写入的 build ID, 使产物只取决于源码与工具链
+                ldflags = f"{ldflags} -buildid="
+
+            # 如果使用简单文件名格式, 则生成输出文件名时不包含系统架构和版本信息
+            if args.simple_name:
+                output_file = generate_output_file_name(base_name, system, None)
+            else:
+                output_file = generate_output_file_name(
+                    f"{base_name}_{system}_{architecture}", system, git_version
+                )
+
+            # 生成归档文件名
+            archive_file = None
+            if args.zip:
+                archive_file = args.zip_file or generate_archive_file_name(
+                    binary_name, system, architecture, git_version, args.archive_format
+                )
+
+            binaries.append(
+                BuildBinary(
+                    package=package,
+                    name=binary_name,
+                    output_file=output_file,
+                    archive_file=archive_file,
+                    ldflags=ldflags,
+                )
+            )
+
+        targets.append(
+            BuildTarget(
+                system=system,
+                arch=architecture,
+                binaries=tuple(binaries),
+                env=tuple(
+                    sorted(build_target_env(system, architecture, args.env).items())
+                ),
+                estimate=history.get(name),
+            )
+        )
+
+    max_workers, parallelism = resolve_concurrency(
+        args.max_workers, max(1, len(targets)), verbose=verbose and not args.plan_json
+    )
+    return BuildPlan(
+        go_compiler=args.go_compiler,
+        entry_file=args.entry,
+        use_vendor=args.use_vendor,
+        use_vendor_in_build=args.use_vendor_in_build,
+        use_cache=not args.no_cache,
+        remote_cache=args.remote_cache,
+        use_check_cache=not args.no_check_cache,
+        recheck=args.recheck,
+        is_batch=args.batch,
+        archive_format=args.archive_format,
+        compress_level=args.compress_level,
+        write_checksums=not args.no_checksums,
+        max_workers=max_workers,
+        parallelism=parallelism,
+        reproducible=args.reproducible,
+        source_date_epoch=epoch,
+        verbose_build=args.verbose_build,
+        targets=tuple(targets),
+        skipped=tuple(skipped),
+        agents=tuple(args.agents),
+    )
+
+
+def with_source_hash(plan):
+    """按当前源码树的指纹更新计划中注入的 sourceHash, 返回新的计划
+
+    计划在构建前检查之前生成, 而 go mod tidy 与 go fmt 可能改写源码;
+    检查完成后调用本函数, 使注入的指纹与实际编译的源码一致。
+    """
+    source_hash = hash_source_tree()
+
+    def update(binary):
+        ldflags = SOURCE_HASH_PATTERN.sub(
+            lambda m: m.group(1) + source_hash, binary.ldflags
+        )
+        return replace(binary, ldflags=ldflags)
+
+    return replace(
+        plan,
+        targets=tuple(
+            replace(t, binaries=tuple(update(b) for b in t.binaries))
+            for t in plan.targets
+        ),
+    )
+
+
+def write_plan_json(plan, path):
+    """将构建计划以 JSON 格式输出到文件, path 为 - 时输出到标准输出"""
+    content = json.dumps(plan.to_dict(), indent=2, ensure_ascii=False)
+    if path == "-":
+        print(content)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content + "\n")
+    print_success(f"构建计划已写入 {path}")
+
+
+def resolve_batch_targets(args):
+    """解析批量构建的平台/架构矩阵, 返回 (平台, 架构) 列表"""
+    platforms = [
+        PLATFORM_SHORTCUTS.get(p.strip(), p.strip())
+        for p in args.batch_platforms.split(",")
+        if p.strip()
+    ]
+    architectures = [
+        ARCHITECTURE_SHORTCUTS.get(a.strip(), a.strip())
+        for a in args.batch_archs.split(",")
+        if a.strip()
+    ]
+    for system in platforms:
+        if system not in SUPPORTED_PLATFORMS:
+            print_error(f"不支持的平台: {system}, 支持的平台: {SUPPORTED_PLATFORMS}")
+            sys.exit(1)
+    for architecture in architectures:
+        if architecture not in SUPPORTED_ARCHITECTURES:
+            print_error(
+                f"不支持的架构: {architecture}, 支持的架构: {SUPPORTED_ARCHITECTURES}"
+            )
+            sys.exit(1)
+    return [(system, arch) for system in platforms for arch in architectures]
+
+
+def _history_file():
+    """返回当前项目的构建耗时历史文件路径"""
+    digest = hashlib.sha256(os.path.abspath(".").encode("utf-8")).hexdigest()
+    return os.path.join(DEFAULT_CACHE_DIR, "history", f"{digest[:16]}.json")
+
+
+def load_build_history():
+    """读取当前项目各目标的历史构建耗时(秒)"""
+    try:
+        with open(_history_file(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_build_history(history):
+    """将构建耗时历史写入磁盘"""
+    history_file = _history_file()
+    try:
+        os.makedirs(os.path.dirname(history_file), exist_ok=True)
+        tmp_file = f"{history_file}.tmp{os.getpid()}"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, history_file)
+    except OSError as e:
+        print_error(f"写入构建耗时历史失败: {str(e)}")
+
+
+def record_build_duration(history, target, elapsed):
+    """以指数加权平均的方式记录目标的构建耗时"""
+    with _cache_lock:
+        previous = history.get(target)
+        if previous is None:
+            history[target] = round(elapsed, 3)
+        else:
+            history[target] = round(
+                previous + HISTORY_SMOOTHING * (elapsed - previous), 3
+            )
+
+
+def schedule_targets(targets, history):
+    """按历史耗时从长到短排列目标, 没有历史记录的目标排在最前"""
+    return sorted(
+        targets,
+        key=lambda t: history.get(f"{t[0]}/{t[1]}", float("inf")),
+        reverse=True,
+    )
+
+
+def print_build_estimate(targets, history, max_workers):
+    """模拟最长任务优先调度, 打印预计总耗时和关键路径"""
+    targets = [t for t in targets if t not in UNSUPPORTED_TARGETS]
+    known = [history[f"{s}/{a}"] for s, a in targets if f"{s}/{a}" in history]
+    if not known:
+        print_success("暂无历史构建耗时, 无法估算总耗时")
+        return
+    default = sum(known) / len(known)
+    lanes = [(0.0, [])] * max(1, max_workers)
+    for system, architecture in targets:
+        target = f"{system}/{architecture}"
+        # 每个任务分配给当前最早空闲的工作线程
+        index = min(range(len(lanes)), key=lambda i: lanes[i][0])
+        finish, path = lanes[index]
+        lanes[index] = (finish + history.get(target, default), path + [target])
+    makespan, critical_path = max(lanes, key=lambda lane: lane[0])
+    print_success(
+        f"预计总耗时 {makespan:.2f} 秒 ({len(targets) - len(known)} 个目标无历史, 按平均 {default:.2f} 秒估算)"
+    )
+    print_success(f"关键路径: {' -> '.join(critical_path)}")
+
+
+def _warmup_stamp_file():
+    """返回当前项目的预热记录文件路径"""
+    digest = hashlib.sha256(os.path.abspath(".").encode("utf-8")).hexdigest()
+    return os.path.join(DEFAULT_CACHE_DIR, "warmup", f"{digest[:16]}.json")
+
+
+def warm_up_caches(args, targets, max_workers):
+    """批量构建前的预热阶段
+
+    先执行一次 go mod download, 再在共享的 GOCACHE/GOMODCACHE 下为矩阵中的
+    每个目标预编译入口包依赖的标准库。已预热且编译器与 go.sum 未变化的目标会被跳过。
+    """
+    start_time = time.time()
+    targets = [
+        t
+        for t in targets
+        if t not in UNSUPPORTED_TARGETS
+        and not (args.current_platform_only and t[0] != platform.system().lower())
+    ]
+    gocache = toolchain_env(args.go_compiler, "GOCACHE")
+    gomodcache = toolchain_env(args.go_compiler, "GOMODCACHE")
+    if not gocache or not gomodcache:
+        print_error("获取 Go 缓存目录失败, 跳过预热阶段")
+        return
+    _shared_go_env["GOCACHE"], _shared_go_env["GOMODCACHE"] = gocache, gomodcache
+
+    # 编译器版本、依赖或缓存目录变化后, 之前的预热记录失效
+    go_sum = b""
+    if os.path.exists("go.sum"):
+        with open("go.sum", "rb") as f:
+            go_sum = f.read()
+    stamp_key = [
+        get_go_version(args.go_compiler),
+        hashlib.sha256(go_sum).hexdigest(),
+        _shared_go_env["GOCACHE"],
+    ]
+    stamp = {"key": stamp_key, "targets": []}
+    try:
+        with open(_warmup_stamp_file(), "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") == stamp_key and os.path.isdir(_shared_go_env["GOCACHE"]):
+            stamp = cached
+    except (OSError, ValueError):
+        pass
+    # -trimpath 会改变编译动作, 可复现模式下预热的是另一份标准库缓存
+    build_flags = ["-trimpath"] if args.reproducible else []
+    mode = " (trimpath)" if args.reproducible else ""
+    pending = [t for t in targets if f"{t[0]}/{t[1]}{mode}" not in stamp["targets"]]
+    if not pending:
+        print_success("缓存已预热, 跳过预热阶段")
+        return
+
+    print_success(f"开始预热阶段, 共 {len(pending)} 个目标...")
+
+    def target_env(system, architecture):
+        return prepare_build_env(
+            BuildConfig(
+                go_compiler=args.go_compiler,
+                output_file="",
+                entry_file=args.entry,
+                ldflags="",
+                use_vendor_in_build=args.use_vendor_in_build,
+                env=build_target_env(system, architecture, args.env),
+            )
+        )
+
+    mod_flags = ["-mod=vendor"] if args.use_vendor_in_build else []
+    if not stamp["targets"] and not args.use_vendor_in_build:
+        step_start = time.time()
+        try:
+            with _tracer.span("go mod download", "warmup"):
+                subprocess.run(
+                    [args.go_compiler, "mod", "download"],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    env=target_env(platform.system().lower(), host_architecture()),
+                    encoding="utf-8",
+                )
+        except (OSError, subprocess.CalledProcessError) as e:
+            print_error(f"go mod download 执行失败, 跳过预热阶段: {str(e)}")
+            return
+        print_success(f"go mod download 完成, 耗时 {time.time() - step_start:.2f} 秒")
+
+    def warm_target(system, architecture):
+        step_start = time.time()
+        env = target_env(system, architecture)
+        try:
+            # 仅预编译入口包实际依赖的标准库, 而非整个 std
+            packages = subprocess.run(
+                [
+                    args.go_compiler,
+                    "list",
+                    *mod_flags,
+                    "-deps",
+                    "-f",
+                    "{{if .Standard}}{{.ImportPath}}{{end}}",
+                    *split_entries(args.entry),
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+                env=env,
+                encoding="utf-8",
+            ).stdout.split()
+            subprocess.run(
+                [args.go_compiler, "build", *mod_flags, *build_flags, *packages],
+                capture_output=True,
+                text=True,
+                check=True,
+                env=env,
+                encoding="utf-8",
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            print_error(f"预热 {system}/{architecture} 失败: {str(e)}")
+            return None
+        print_success(
+            f"预热 {system}/{architecture} 完成 ({len(packages)} 个标准库包), 耗时 {time.time() - step_start:.2f} 秒"
+        )
+        return f"{system}/{architecture}{mode}"
+
+    def traced_warm_target(target):
+        with _tracer.span(f"warm {target[0]}/{target[1]}", "warmup") as span:
+            span["ok"] = warm_target(*target) is not None
+        return f"{target[0]}/{target[1]}{mode}" if span["ok"] else None
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="warmup"
+    ) as executor:
+        warmed = [t for t in executor.map(traced_warm_target, pending) if t]
+    stamp["targets"] = sorted(set(stamp["targets"]) | set(warmed))
+    stamp_file = _warmup_stamp_file()
+    try:
+        os.makedirs(os.path.dirname(stamp_file), exist_ok=True)
+        with open(stamp_file, "w", encoding="utf-8") as f:
+            json.dump(stamp, f)
+    except OSError as e:
+        print_error(f"写入预热记录失败: {str(e)}")
+    print_success(f"预热阶段完成, 耗时 {time.time() - start_time:.2f} 秒")
+
+
+async def single_build(plan, target, timeout, history=None):
+    """执行构建计划中的单个目标, 实际编译的耗时会记录到 history 中"""
+    try:
+        build_config = target_build_config(
+            plan,
+            target,
+            is_batch=True,
+            use_cache=plan.use_cache,
+            remote_cache=plan.remote_cache,
+            parallelism=plan.parallelism,
+            log_file=target_log_file(target),
+            target_name=target.name,
+            verbose=plan.verbose_build,
+        )
+
+        # 构建
+        build_start_time = time.time()
+        build_result = await build_go_app_async(build_config, timeout)
+        if history is not None and build_result and not build_config.cache_hit:
+            record_build_duration(history, target.name, time.time() - build_start_time)
+
+        return build_result
+    except Exception as e:
+        print_error(f"构建 {target.name} 失败: {str(e)}")
+        return False
+
+
+def find_git_dir(start="."):
+    """向上查找 Git 目录, 返回 (git目录, 公共目录, 工作区根目录), 未找到时返回 (None, None, None)
+
+    兼容 git worktree: .git 为文件时读取其中的 gitdir, 引用存放在 commondir 中。
+    """
+    current = os.path.abspath(start)
+    while True:
+        dot_git = os.path.join(current, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git, dot_git, current
+        if os.path.isfile(dot_git):
+            try:
+                with open(dot_git, "r", encoding="utf-8") as f:
+                    content = f.read().strip()
+            except OSError:
+                return None, None, None
+            if not content.startswith("gitdir:"):
+                return None, None, None
+            git_dir = os.path.normpath(
+                os.path.join(current, content[len("gitdir:") :].strip())
+            )
+            common_dir = git_dir
+            try:
+                with open(os.path.join(git_dir, "commondir"), "r", encoding="utf-8") as f:
+                    common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+            except OSError:
+                pass
+            return git_dir, common_dir, current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None, None, None
+        current = parent
+
+
+def read_git_ref(common_dir, ref):
+    """读取引用对应的提交哈希, 依次查找松散引用和 packed-refs"""
+    try:
+        with open(os.path.join(common_dir, ref), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(common_dir, "packed-refs"), "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.strip().split(" ", 1)
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    except OSError:
+        pass
+    return None
+
+
+def read_git_head(git_dir, common_dir):
+    """直接读取 HEAD 指向的提交哈希, 无法解析时返回 None"""
+    try:
+        with open(os.path.join(git_dir, "HEAD"), "r", encoding="utf-8") as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+    if head.startswith("ref:"):
+        return read_git_ref(common_dir, head[len("ref:") :].strip())
+    return head or None
+
+
+def git_info_cache_key(git_dir, common_dir, worktree):
+    """根据 .git 中的文件状态与已跟踪文件的状态生成 Git 信息缓存键, 无法生成时返回 None
+
+    键包含 HEAD 提交哈希、HEAD/index/packed-refs/refs/tags 的修改时间,
+    以及已跟踪文件的状态摘要(未暂存的修改与未跟踪的文件都不会更新 index)。
+    """
+    head = read_git_head(git_dir, common_dir)
+    if head is None:
+        return None
+    tracked = read_git_index(git_dir, common_dir)
+    if tracked is None:
+        return None
+
+    def mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+
+    return [
+        head,
+        mtime(os.path.join(git_dir, "HEAD")),
+        mtime(os.path.join(git_dir, "index")),
+        mtime(os.path.join(common_dir, "packed-refs")),
+        mtime(os.path.join(common_dir, "refs", "tags")),
+        tracked_files_state(worktree, tracked),
+    ]
+
+
+def read_git_index(git_dir, common_dir):
+    """读取 .git/index 中已跟踪文件的相对路径列表, 不支持的 index 格式返回 None
+
+    支持 index 版本 2~4 与 SHA-1/SHA-256 仓库; split index 只记录部分条目, 按不支持处理。
+    """
+    index_file = os.path.join(git_dir, "index")
+    try:
+        with open(index_file, "rb") as f:
+            data = f.read()
+        if any(name.startswith("sharedindex.") for name in os.listdir(git_dir)):
+            return None
+    except FileNotFoundError:
+        # 尚未暂存任何文件的新仓库
+        return []
+    except OSError:
+        return None
+    if len(data) < 12 or data[:4] != b"DIRC":
+        return None
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in (2, 3, 4):
+        return None
+    hash_size = 32 if git_object_format(common_dir) == "sha256" else 20
+    paths = []
+    previous = b""
+    offset = 12
+    try:
+        for _ in range(count):
+            entry_start = offset
+            # ctime、mtime、dev、ino、mode、uid、gid、size 共 40 字节, 其后为对象哈希
+            offset += 40 + hash_size
+            (flags,) = struct.unpack_from(">H", data, offset)
+            offset += 2
+            if version >= 3 and flags & 0x4000:
+                offset += 2
+            if version == 4:
+                # 路径以前缀压缩存储: 先去掉上一路径末尾的若干字节, 再追加本条目的后缀
+                byte = data[offset]
+                offset += 1
+                strip = byte & 0x7F
+                while byte & 0x80:
+                    byte = data[offset]
+                    offset += 1
+                    strip = ((strip + 1) << 7) | (byte & 0x7F)
+                end = data.index(b"\0", offset)
+                path = previous[: len(previous) - strip] + data[offset:end]
+                offset = end + 1
+            else:
+                end = data.index(b"\0", offset)
+                path = data[offset:end]
+                # 条目以 1~8 个 NUL 填充到 8 字节对齐
+                offset = entry_start + ((end - entry_start + 8) & ~7)
+            paths.append(path)
+            previous = path
+    except (IndexError, ValueError, struct.error):
+        return None
+    return [os.fsdecode(path) for path in paths]
+
+
+def git_object_format(common_dir):
+    """返回仓库的对象哈希算法(sha1 或 sha256)"""
+    try:
+        with open(os.path.join(common_dir, "config"), "r", encoding="utf-8") as f:
+            config = f.read()
+    except OSError:
+        return "sha1"
+    match = re.search(r"^\s*objectformat\s*=\s*(\w+)", config, re.MULTILINE | re.IGNORECASE)
+    return match.group(1).lower() if match else "sha1"
+
+
+def tracked_files_state(worktree, tracked):
+    """计算已跟踪文件及其所在目录的 (相对路径, 修改时间, 大小) 摘要
+
+    只检查 index 中的文件, 不遍历被忽略的目录; 新增或删除未跟踪文件会改变
+    所在目录的修改时间, 因此同样会使缓存失效。
+    """
+    dirs = {""}
+    for path in tracked:
+        parent = os.path.dirname(path)
+        while parent not in dirs:
+            dirs.add(parent)
+            parent = os.path.dirname(parent)
+    digest = hashlib.sha256()
+    for rel_path in (*sorted(dirs), *tracked):
+        try:
+            st = os.lstat(os.path.join(worktree, rel_path))
+            state = f"{st.st_mtime_ns}\0{st.st_size}"
+        except OSError:
+            state = "-"
+        digest.update(f"{rel_path}\0{state}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _git_info_cache_file(git_dir):
+    """返回 Git 目录对应的磁盘缓存文件路径"""
+    digest = hashlib.sha256(os.path.abspath(git_dir).encode("utf-8")).hexdigest()
+    return os.path.join(DEFAULT_CACHE_DIR, "git", f"{digest[:16]}.json")
+
+
+def load_git_info_cache(git_dir, key):
+    """读取磁盘上的 Git 信息缓存, 缓存键不一致时返回 None"""
+    try:
+        with open(_git_info_cache_file(git_dir), "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("key") != key:
+        return None
+    return cached.get("info")
+
+
+def save_git_info_cache(git_dir, key, info):
+    """将 Git 信息写入磁盘缓存"""
+    cache_file = _git_info_cache_file(git_dir)
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.tmp{os.getpid()}"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "info": info}, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print_error(f"写入 Git 信息缓存失败: {str(e)}")
+
+
+def query_git_info(worktree="."):
+    """调用 git 获取版本信息: log 与 status 两次调用
+
+    log 同时输出短哈希、提交时间与 describe 版本号(git 2.32 之前不支持 %(describe),
+    此时额外调用一次 describe)。status --porcelain=v2 可以利用 git 的未跟踪文件缓存:
+    已跟踪文件的修改使版本号带上 -dirty 后缀(与 describe --dirty 一致), 未跟踪且
+    未被忽略的文件(如新增的 .go 文件)同样会被编译进产物, 两者任一存在时仓库状态为 dirty。
+    """
+    git_commit, git_commit_time, git_version = (
+        subprocess.run(
+            ["git", "log", "-1", "--format=%h%n%cd%n%(describe:tags=true)", "--date=iso"],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=10,
+            encoding="utf-8",
+        )
+        .stdout.strip("\n")
+        .split("\n", 2)
+    )
+    if git_version.startswith("%("):
+        git_version = subprocess.run(
+            ["git", "describe", "--tags", "--always"],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=10,
+            encoding="utf-8",
+        ).stdout.strip()
+    # 没有可用的标签时与 describe --always 一样使用短哈希
+    git_version = git_version or git_commit
+    # 构建输出目录不影响产物内容, 不计入未跟踪文件; 不写回 index, 避免改变缓存键
+    command = [
+        "git",
+        "--no-optional-locks",
+        "status",
+        "--porcelain=v2",
+        "--untracked-files=normal",
+        "-z",
+        "--",
+        ".",
+    ]
+    output_rel = os.path.relpath(os.path.abspath(DEFAULT_OUTPUT_DIR), worktree)
+    if not output_rel.startswith(".."):
+        command.append(f":(exclude){output_rel.replace(os.sep, '/')}")
+    records = iter(
+        subprocess.run(
+            command,
+            cwd=worktree,
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=10,
+            encoding="utf-8",
+        ).stdout.split("\0")
+    )
+    modified = untracked = False
+    for record in records:
+        if record.startswith(("1 ", "2 ", "u ")):
+            modified = True
+            if record.startswith("2 "):
+                # 重命名记录之后是原路径
+                next(records, None)
+        elif record.startswith("? "):
+            untracked = True
+    if modified:
+        git_version += "-dirty"
+    # 提交时间带有提交者的时区, 统一转换为 UTC
+    format_time = (
+        datetime.strptime(git_commit_time, "%Y-%m-%d %H:%M:%S %z")
+        .astimezone(timezone.utc)
+        .strftime("%Y-%m-%dT%H:%M:%SZ")
+    )
+    return {
+        "version": git_version,
+        "commit": git_commit,
+        "commit_time": format_time,
+        "status": "dirty" if modified or untracked else "clean",
+    }
+
+
+def get_git_info():
+    """获取 Git 版本信息, 优先使用由 HEAD/index 修改时间校验的磁盘缓存"""
+    global _git_info_cache
+
+    # 如果缓存不存在或无效, 则尝试获取git信息
+    if _git_info_cache["version"] is None:
+        git_dir, common_dir, worktree = find_git_dir()
+        key = git_info_cache_key(git_dir, common_dir, worktree) if git_dir else None
+        memo_key = (git_dir, json.dumps(key)) if key else None
+        info = _git_info_memo.get(memo_key) if key else None
+        if info is None and key:
+            info = load_git_info_cache(git_dir, key)
+        if info is None:
+            try:
+                with _tracer.span("git query", "git"):
+                    info = query_git_info(worktree or ".")
+            except (subprocess.CalledProcessError, ValueError):
+                print_error("警告: 无法获取 Git 版本信息, 可能是当前目录不是 Git 仓库。")
+                return None
+            except subprocess.TimeoutExpired:
+                print_error("获取 Git 版本信息超时。")
+                return None
+            if key:
+                save_git_info_cache(git_dir, key, info)
+        if key:
+            _git_info_memo[memo_key] = info
+        _git_info_cache.update(info)
+
+    return (
+        _git_info_cache["version"],
+        _git_info_cache["commit"],
+        _git_info_cache["commit_time"],
+        _git_info_cache["status"],
+    )
+
+
+def source_date_epoch():
+    """返回可复现构建使用的时间戳(秒)
+
+    优先使用 SOURCE_DATE_EPOCH 环境变量, 其次使用 HEAD 的提交时间; 均不可用时返回 None。
+    """
+    value = os.environ.get("SOURCE_DATE_EPOCH")
+    if value:
+        try:
+            return int(value)
+        except ValueError:
+            print_error(f"SOURCE_DATE_EPOCH 不是有效的时间戳: {value}")
+            return None
+    if _git_info_cache["commit_time"] is None and not get_git_info():
+        return None
+    commit_time = datetime.strptime(_git_info_cache["commit_time"], "%Y-%m-%dT%H:%M:%SZ")
+    return int(commit_time.replace(tzinfo=timezone.utc).timestamp())
+
+
+def generate_output_file_name(base_name, system, git_version=None):
+    """根据操作系统生成默认输出文件名, 可选的git版本号
+
+    只计算路径, 输出目录在实际构建时才创建(--plan-json 不应产生任何文件)。
+    """
+    name = base_name
+    if git_version is not None:
+        name = f"{name}_{git_version}"
+
+    if system == "windows":
+        return os.path.join(DEFAULT_OUTPUT_DIR, f"{name}.exe")
+    return os.path.join(DEFAULT_OUTPUT_DIR, name)
+
+
+def generate_archive_file_name(
+    output_base_name, system, architecture, git_version=None, archive_format="zip"
+):
+    """根据输出文件名、操作系统和架构生成默认的归档文件名, 可选的git版本号"""
+    name = f"{output_base_name}_{system}_{architecture}"
+    if git_version is not None:
+        name = f"{name}_{git_version}"
+    return os.path.join(DEFAULT_OUTPUT_DIR, f"{name}{ARCHIVE_FORMATS[archive_format]}")
+
+
+def run_check_stage(name, func, *func_args, cache=None):
+    """执行单个检查阶段并计时, 返回 (阶段名, 是否成功, 耗时)
+
+    各检查函数失败时会调用 sys.exit, 这里将其转换为失败结果,
+    以便在线程中并行执行时由调用方统一处理。cache 为
+    (指纹, 是否强制重新检查, 计算检查后指纹的函数或 None, 是否缓存失败结果)
+    时启用结果缓存: 命中通过结果直接跳过, 命中失败结果则输出保存的诊断信息。
+    """
+    start_time = time.time()
+    cached = None
+    if cache is not None and not cache[1]:
+        cached = load_check_result(name, cache[0])
+    with _tracer.span(name, "check") as span:
+        if cached is not None:
+            ok, diagnostics = cached["ok"], cached.get("diagnostics", "")
+            span["cached"] = True
+            if not ok:
+                print_error(f"{name} 检查失败(缓存结果, 可使用 --recheck 重新检查)：")
+                print_error(diagnostics)
+        else:
+            diagnostics = ""
+            try:
+                ok = func(*func_args) is not False
+            except SystemExit as e:
+                diagnostics = getattr(e, "diagnostics", "")
+                ok = False
+            except Exception as e:
+                print_error(str(e))
+                ok = False
+            if cache is not None and (ok or (diagnostics and cache[3])):
+                # 会改写文件的检查(tidy/fmt)通过后, 记录的是改写后的源码状态
+                fingerprint = cache[2]() if ok and cache[2] else cache[0]
+                save_check_result(name, fingerprint, ok, diagnostics)
+        span["ok"] = ok
+    elapsed = time.time() - start_time
+    if cached is not None and ok:
+        print_success(f"检查阶段 [{name}] 输入未变化, 使用缓存结果")
+    elif ok:
+        print_success(f"检查阶段 [{name}] 完成, 耗时 {elapsed:.2f} 秒")
+    else:
+        print_error(f"检查阶段 [{name}] 失败, 耗时 {elapsed:.2f} 秒")
+    return name, ok, elapsed
+
+
+def check_fingerprint(go_compiler, use_vendor):
+    """计算检查结果缓存的指纹
+
+    覆盖模块内全部 .go 文件(含测试文件)、go.mod/go.sum、编译器版本与 GOFLAGS。
+    vendor 目录中的代码不参与 ./... 检查, 只计入 vendor/modules.txt。
+    """
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [
+                os.path.abspath("."),
+                get_go_version(go_compiler),
+                os.environ.get("GOFLAGS", ""),
+                use_vendor,
+            ]
+        ).encode("utf-8")
+    )
+    paths = []
+    for dirpath, filenames in iter_source_dirs():
+        rel_dir = os.path.relpath(dirpath).replace(os.sep, "/")
+        if rel_dir == "vendor" or rel_dir.startswith("vendor/"):
+            continue
+        for filename in sorted(filenames):
+            if filename.endswith(".go") and not filename.startswith("."):
+                paths.append(os.path.join(dirpath, filename))
+    paths.extend(
+        path
+        for path in (*MODULE_FILES, os.path.join("vendor", "modules.txt"))
+        if os.path.isfile(path)
+    )
+    digests = file_digests(
+        (path, os.path.relpath(path).replace(os.sep, "/")) for path in paths
+    )
+    for rel_path, file_digest in digests.items():
+        digest.update(f"{rel_path}\0{file_digest}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _check_result_file(name, fingerprint):
+    """返回检查结果缓存文件的路径"""
+    key = hashlib.sha256(f"{name}\0{fingerprint}".encode("utf-8")).hexdigest()
+    return os.path.join(DEFAULT_CACHE_DIR, "checks", key[:2], f"{key}.json")
+
+
+def load_check_result(name, fingerprint):
+    """读取缓存的检查结果 {"ok", "diagnostics"}, 不存在时返回 None"""
+    try:
+        with open(_check_result_file(name, fingerprint), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_check_result(name, fingerprint, ok, diagnostics=""):
+    """保存检查结果, 先写临时文件再原子替换"""
+    path = _check_result_file(name, fingerprint)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"ok": ok, "diagnostics": diagnostics, "time": time.time()}, f)
+        os.replace(tmp_file, path)
+    except OSError as e:
+        print_error(f"写入检查结果缓存失败: {str(e)}")
+
+
+def check_memo_key(go_compiler, entry_file, use_vendor):
+    """计算守护进程中检查结果的键: 与检查结果缓存相同的指纹(含测试文件)加上入口文件"""
+    return check_fingerprint(go_compiler, use_vendor), entry_file
+
+
+def pre_build_checks(
+    go_compiler,
+    entry_file,
+    use_vendor,
+    on_mod_ready=None,
+    skip_mod=False,
+    use_check_cache=False,
+    recheck=(),
+):
+    """构建前的检查工作
+
+    按依赖关系分阶段执行: 先检查编译器与文件, 再执行 vendor/tidy 与 go fmt,
+    最后执行 go vet。可能改写源码的阶段完成后会调用 on_mod_ready,
+    供批量构建提前开始推测性编译, 与 go vet 并行。skip_mod 为 True 时(监视模式下
+    go.mod/go.sum 未变化)只检查入口文件, 跳过编译器检查与 vendor/tidy。
+    use_check_cache 为 True 时按指纹缓存 tidy/vet/fmt 的结果,
+    recheck 中列出的阶段(tidy/vet/fmt)忽略缓存强制重新检查。
+    """
+    timings = []
+
+    # 守护进程中源码、依赖与工具链都未变化时直接复用上次通过的检查结果;
+    # 禁用检查缓存或要求重新检查时不复用
+    if _check_memo is not None and use_check_cache and not recheck:
+        memo_key = check_memo_key(go_compiler, entry_file, use_vendor)
+        if memo_key in _check_memo:
+            print_success("源码与依赖未变化, 复用上次通过的检查结果")
+            if on_mod_ready is not None:
+                on_mod_ready()
+            return True
+
+    def finish(ok):
+        if timings:
+            summary = ", ".join(f"{name} {elapsed:.2f}s" for name, _, elapsed in timings)
+            print_success(f"检查阶段耗时: {summary}")
+        # tidy 与 fmt 可能改写文件, 之后的指纹与缓存键按检查后的源码重新计算
+        _source_hash_cache["hash"] = None
+        if ok and _check_memo is not None:
+            _check_memo[check_memo_key(go_compiler, entry_file, use_vendor)] = True
+        return ok
+
+    def check_files():
+        return (
+            check_go_installed(go_compiler)
+            and check_go_mod_file()
+            and check_entry_file(entry_file)
+        )
+
+    # 阶段一: 检查编译器、go.mod 与入口文件
+    if skip_mod:
+        timings.append(run_check_stage("环境检查", check_entry_file, entry_file))
+    else:
+        timings.append(run_check_stage("环境检查", check_files))
+    if not timings[-1][1]:
+        return finish(False)
+
+    # 阶段二: vendor 与 tidy 会改写 go.mod/go.sum, 必须先于编译和代码检查完成
+    if use_vendor and not skip_mod:
+        timings.append(run_check_stage("go mod vendor", run_go_mod_vendor, go_compiler))
+        if not timings[-1][1]:
+            return finish(False)
+
+    def stage_cache(short_name, fingerprint, settle=None, cache_failure=True):
+        if not use_check_cache:
+            return None
+        forced = "all" in recheck or short_name in recheck
+        return fingerprint, forced, settle, cache_failure
+
+    def fingerprint_now():
+        return check_fingerprint(go_compiler, use_vendor)
+
+    fingerprint = fingerprint_now() if use_check_cache else None
+    if not skip_mod:
+        timings.append(
+            run_check_stage(
+                "go mod tidy",
+                run_go_mod_tidy,
+                go_compiler,
+                use_vendor,
+                # tidy 失败多为网络或代理问题, 只缓存通过的结果
+                cache=stage_cache("tidy", fingerprint, fingerprint_now, False),
+            )
+        )
+        if not timings[-1][1]:
+            return finish(False)
+        if use_check_cache:
+            # tidy 可能改写了 go.mod/go.sum, 后续阶段使用新的指纹
+            fingerprint = fingerprint_now()
+
+    # 阶段三: go fmt 会改写源码, 在推测性编译开始前完成, 编译与注入的指纹都基于格式化后的源码
+    timings.append(
+        run_check_stage(
+            "go fmt",
+            run_gofmt,
+            go_compiler,
+            cache=stage_cache("fmt", fingerprint, fingerprint_now),
+        )
+    )
+    if not timings[-1][1]:
+        return finish(False)
+    if use_check_cache:
+        fingerprint = fingerprint_now()
+    # 源码不再变化, 清空指纹缓存后再通知推测性编译开始
+    _source_hash_cache["hash"] = None
+    if on_mod_ready is not None:
+        on_mod_ready()
+
+    # 阶段四: go vet 只读取源码, 与推测性编译并行执行
+    timings.append(
+        run_check_stage(
+            "go vet",
+            run_code_check,
+            go_compiler,
+            cache=stage_cache("vet", fingerprint),
+        )
+    )
+    return finish(timings[-1][1])
+
+
+def build_single_target(plan, target):
+    """构建单平台模式下的目标, 成功后按计划打包并写入校验和清单"""
+    build_config = target_build_config(
+        plan,
+        target,
+        is_batch=False,
+        use_cache=plan.use_cache,
+        remote_cache=plan.remote_cache,
+        parallelism=plan.parallelism,
+        log_file=target_log_file(target),
+        target_name=target.name,
+        verbose=plan.verbose_build,
+    )
+    _progress.start(target.name, "编译中")
+    try:
+        with _tracer.span(f"build {target.name}", "target") as span:
+            build_result = build_go_app(build_config)
+            span["ok"] = build_result
+    finally:
+        _progress.finish(target.name)
+    save_cache_stats()
+
+    # 判断构建结果
+    if build_result:
+        print_success("构建完成。")
+        entries = []
+        for binary in target.binaries:
+            archive_result = None
+            if binary.archive_file:
+                archive_result = archive_executable(
+                    binary.output_file,
+                    binary.archive_file,
+                    plan.archive_format,
+                    plan.compress_level,
+                    mtime=plan.source_date_epoch,
                 )
-                pass
-        except Exception as e:
-            with lock:
-                fail_count += 1
-                completed_count = success_count + fail_count
-                print_success(
-                    f"已完成 {completed_count}/{total_tasks} 个任务 (成功 {success_count} 个, 失败 {fail_count} 个, 跳过 {skip_count} 个)"
+                trace_archive(target, binary, archive_result)
+            if archive_result or not binary.archive_file:
+                entries.append((binary, archive_result))
+        if plan.write_checksums and entries:
+            write_checksum_manifest(
+                [collect_artifact_entry(target, binary, result) for binary, result in entries]
+            )
+    else:
+        print_error("构建失败, 请检查错误信息。")
+    return build_result
+
+
+def verify_reproducible(plan):
+    """在全新的 GOCACHE 中再次构建计划内的所有目标, 比较两次产物的 SHA-256
+
+    第二次构建不使用产物缓存, 也无法复用 Go 的链接缓存, 打包使用相同的规范化参数。
+    第一次未成功生成产物的目标会被跳过。返回是否全部一致。
+    """
+    print_success("开始校验可复现性, 在隔离的 GOCACHE 中重新构建...")
+    with tempfile.TemporaryDirectory(prefix="verman-verify-") as tmp_dir:
+        go_cache = os.path.join(tmp_dir, "gocache")
+
+        def rebuild(target):
+            # 返回 [(名称, 第一次的摘要, 重新构建的摘要), ...], 重新构建失败时摘要为 None
+            expected = {}
+            for binary in target.binaries:
+                artifact = binary.archive_file or binary.output_file
+                if os.path.isfile(artifact):
+                    expected[binary] = hash_file(artifact)["sha256"]
+            if not expected:
+                return []
+            target_dir = os.path.join(tmp_dir, f"{target.system}_{target.arch}")
+            os.makedirs(target_dir)
+            results = []
+            with _tracer.span(f"verify {target.name}", "verify"):
+                config = target_build_config(
+                    plan,
+                    target,
+                    output_dir=target_dir,
+                    extra_env={"GOCACHE": go_cache},
+                    is_batch=True,
+                    parallelism=plan.parallelism,
                 )
-                print_error(f"构建 {system}/{architecture} 时发生异常: {str(e)}")
+                built = build_go_app(config)
+                for binary, digest in expected.items():
+                    label = target.name
+                    if len(target.binaries) > 1:
+                        label = f"{target.name} {binary.name}"
+                    output_file = os.path.join(target_dir, os.path.basename(binary.output_file))
+                    rebuilt = output_file
+                    ok = built
+                    if ok and binary.archive_file:
+                        rebuilt = os.path.join(target_dir, os.path.basename(binary.archive_file))
+                        ok = archive_executable(
+                            output_file,
+                            rebuilt,
+                            plan.archive_format,
+                            plan.compress_level,
+                            True,
+                            plan.source_date_epoch,
+                        ) is not None
+                    actual = hash_file(rebuilt)["sha256"] if ok else None
+                    results.append((label, digest, actual))
+            return results
+
+        with ThreadPoolExecutor(
+            max_workers=plan.max_workers, thread_name_prefix="verify"
+        ) as executor:
+            results = [r for rs in executor.map(rebuild, plan.targets) for r in rs]
+
+    mismatched = 0
+    for name, expected, actual in results:
+        if actual == expected:
+            print_success(f"{name} 可复现: {expected}")
+        else:
+            mismatched += 1
+            print_error(f"{name} 不可复现: {expected} != {actual or '重新构建失败'}")
+    if not results:
+        print_error("没有可校验的构建产物")
+        return False
+    if mismatched:
+        print_error(f"可复现性校验失败: {mismatched}/{len(results)} 个产物不一致")
+        return False
+    print_success(f"可复现性校验通过: {len(results)} 个产物完全一致")
+    return True
+
+
+class PollingWatcher:
+    """通过定期比较源文件的修改时间与大小检测变化, 适用于所有平台"""
+
+    name = "轮询"
+
+    def __init__(self, root="."):
+        self.root = root
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for path, rel_path in iter_source_files(self.root):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[rel_path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def poll(self, timeout=None):
+        """等待最多 timeout 秒(None 表示一个轮询间隔), 返回变化的相对路径集合"""
+        time.sleep(DEFAULT_WATCH_POLL_INTERVAL if timeout is None else timeout)
+        snapshot = self._scan()
+        changed = {
+            path
+            for path in snapshot.keys() | self._snapshot.keys()
+            if snapshot.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """通过 Linux inotify 监视模块目录, 新建的子目录会自动加入监视"""
+
+    name = "inotify"
+
+    def __init__(self, root="."):
+        import ctypes.util
+
+        self.root = root
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 调用失败")
+        self._dirs = {}
+        for dirpath, _ in iter_source_dirs(root):
+            self._add_watch(dirpath)
+
+    def _add_watch(self, dirpath):
+        import ctypes
+
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(dirpath), INOTIFY_MASK
+        )
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"无法监视目录 {dirpath}")
+        self._dirs[wd] = dirpath
+
+    def poll(self, timeout=None):
+        """等待最多 timeout 秒(None 表示一直等待), 返回变化的相对路径集合"""
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return set()
+        changed = set()
+        data = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # 事件丢失: 补充监视期间新建的目录, 由调用方完整重新扫描
+                for dirpath, _ in iter_source_dirs(self.root):
+                    self._add_watch(dirpath)
+                changed.add(WATCH_RESCAN)
+                continue
+            if wd not in self._dirs or not name or name.startswith("."):
+                continue
+            path = os.path.join(self._dirs[wd], name)
+            rel_path = os.path.relpath(path, self.root).replace(os.sep, "/")
+            if mask & IN_ISDIR:
+                # 新建或移入的目录需要加入监视, 其中已有的文件视为变化
+                if os.path.isdir(path) and os.path.normpath(rel_path) != os.path.normpath(
+                    DEFAULT_OUTPUT_DIR
+                ):
+                    for dirpath, filenames in iter_source_dirs(path):
+                        self._add_watch(dirpath)
+                        changed.update(
+                            os.path.relpath(os.path.join(dirpath, f), self.root).replace(
+                                os.sep, "/"
+                            )
+                            for f in filenames
+                            if is_source_file(f)
+                        )
+                continue
+            if is_source_file(name) and not rel_path.startswith(
+                os.path.normpath(DEFAULT_OUTPUT_DIR) + "/"
+            ):
+                changed.add(rel_path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def create_watcher(root="."):
+    """创建源码监视器, Linux 下优先使用 inotify, 不可用时退回轮询"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print_error(f"inotify 不可用, 改用轮询方式监视: {str(e)}")
+    return PollingWatcher(root)
+
+
+def _content_digest(path):
+    """返回文件内容的 SHA-256, 文件不存在时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def source_file_stats():
+    """返回各源文件的 (修改时间, 大小), 键为相对路径"""
+    stats = {}
+    for path, rel_path in iter_source_files():
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stats[rel_path] = (st.st_mtime_ns, st.st_size)
+    return stats
+
+
+def refresh_rewritten(known, before):
+    """更新检查阶段(go fmt、go mod tidy)改写的文件的内容哈希
+
+    before 为检查前的 source_file_stats(); 这些改写不是用户的修改,
+    不更新时下一次等待会把它们当作变化而再次构建。
+    """
+    after = source_file_stats()
+    for rel_path in before.keys() | after.keys():
+        if before.get(rel_path) != after.get(rel_path):
+            known[rel_path] = _content_digest(rel_path)
+
+
+def wait_for_changes(watcher, known):
+    """等待源码变化并合并连续修改, 返回 (变化的路径集合, 首次检测到变化的时间)
+
+    known 记录各文件最近一次的内容哈希, 只触碰而未改变内容的事件
+    (例如 go mod tidy 重写 go.mod、编辑器的临时文件)会被忽略。
+    监视器返回 WATCH_RESCAN 时重新扫描全部源文件, 并且无论内容是否变化都重新构建。
+    """
+
+    def content_changed(paths):
+        result = set()
+        if WATCH_RESCAN in paths:
+            paths = paths | known.keys() | {rel_path for _, rel_path in iter_source_files()}
+            paths.discard(WATCH_RESCAN)
+            result.add(WATCH_RESCAN)
+        for path in paths:
+            digest = _content_digest(path)
+            if known.get(path) != digest:
+                known[path] = digest
+                result.add(path)
+        return result
+
+    changed = set()
+    while not changed:
+        changed = content_changed(watcher.poll())
+    first_change = time.time()
+    # 最后一次修改后静默 DEFAULT_WATCH_DEBOUNCE 秒才开始构建
+    while True:
+        more = watcher.poll(DEFAULT_WATCH_DEBOUNCE)
+        if not more:
+            return changed, first_change
+        changed |= content_changed(more)
+
+
+def watch_and_rebuild(args):
+    """监视模式: 源码变化后只重新构建当前目标
+
+    go.mod/go.sum 未变化时跳过编译器检查与 vendor/tidy, 只执行 vet/fmt 与构建。
+    """
+    watcher = create_watcher()
+    known = {rel_path: _content_digest(path) for path, rel_path in iter_source_files()}
+    print_success(f"监视模式已启动 ({watcher.name}), 按 Ctrl+C 退出")
+    try:
+        while True:
+            changed, first_change = wait_for_changes(watcher, known)
+            rescan = WATCH_RESCAN in changed
+            changed.discard(WATCH_RESCAN)
+            shown = ", ".join(sorted(changed)[:3])
+            if len(changed) > 3:
+                shown += f" 等 {len(changed)} 个文件"
+            if rescan:
+                print_success("监视事件队列溢出, 已重新扫描源码, 执行完整的检查与构建")
+            else:
+                print_success(f"检测到变化: {shown}")
+            rebuild_start = time.time()
+
+            # 源码与仓库状态已变化, 清空本次运行内的缓存后重新生成构建计划
+            _source_hash_cache["hash"] = None
+            if args.git:
+                for key in _git_info_cache:
+                    _git_info_cache[key] = None
+                if not get_git_info():
+                    continue
+            plan = create_build_plan(args, verbose=False)
+            module_changed = rescan or any(
+                os.path.basename(p) in MODULE_FILES for p in changed
+            )
+            before_checks = source_file_stats()
+            ok = pre_build_checks(
+                plan.go_compiler,
+                plan.entry_file,
+                plan.use_vendor,
+                skip_mod=not module_changed,
+                use_check_cache=plan.use_check_cache,
+                recheck=plan.recheck,
+            )
+            refresh_rewritten(known, before_checks)
+            if ok:
+                # 检查阶段可能改写了源码, 按改写后的源码更新注入的指纹
+                plan = with_source_hash(plan)
+                ok = build_single_target(plan, plan.targets[0])
+            finished = time.time()
+            message = f"耗时 {finished - rebuild_start:.2f} 秒, 自检测到变化起 {finished - first_change:.2f} 秒"
+            if ok:
+                print_success(f"重新构建完成, {message}")
+            else:
+                print_error(f"重新构建失败, {message}")
+    except KeyboardInterrupt:
+        print_success("已退出监视模式")
+    finally:
+        watcher.close()
+
+
+class DaemonOutput:
+    """守护进程中替代标准输出的文件对象, 将输出逐段转发给客户端"""
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def write(self, text):
+        if text and not self._closed:
+            message = json.dumps({"output": text}, ensure_ascii=False) + "\n"
+            with self._lock:
+                try:
+                    self._wfile.write(message.encode("utf-8"))
+                    self._wfile.flush()
+                except OSError:
+                    # 客户端已断开, 丢弃后续输出, 构建继续执行完毕
+                    self._closed = True
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def socketserver_class(cls, base_name):
+    """将 cls 与 socketserver 中名为 base_name 的基类组合成实际使用的类
+
+    socketserver 与 socket 只在守护进程、客户端与构建代理中导入, 普通构建不承担其导入开销。
+    """
+    import socketserver
+
+    return type(cls.__name__, (cls, getattr(socketserver, base_name)), {})
+
+
+class DaemonRequestHandler:
+    """处理一个客户端连接: 读取一行 JSON 请求, 流式返回输出, 最后返回退出码
+
+    与 socketserver.StreamRequestHandler 组合后使用(见 socketserver_class)。
+    """
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        if not isinstance(request, dict) or not hmac.compare_digest(
+            str(request.get("token", "")), self.server.token
+        ):
+            # 令牌不匹配: 不是当前用户发起的请求(TCP 端口对本机所有用户可见)
+            self._send({"output": f"{RED_BOLD}error: 构建守护进程拒绝了未授权的请求{RESET}\n"})
+            self._send({"exit": 1})
+            return
+        if request.get("command") == "stop":
+            self._send({"exit": 0})
+            # shutdown 会等待 serve_forever 退出, 必须在其他线程中调用
+            threading.Thread(target=self.server.shutdown).start()
+            return
+        exit_code = run_daemon_request(
+            request.get("argv", []),
+            request.get("cwd", "."),
+            request.get("env"),
+            DaemonOutput(self.wfile),
+        )
+        self._send({"exit": exit_code})
+
+    def _send(self, message):
+        try:
+            self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        except OSError:
+            pass
+
+
+def run_daemon_request(argv, cwd, env, output):
+    """在守护进程内执行一次构建请求, 返回退出码
+
+    请求按顺序逐个执行(工作目录、环境变量与标准输出是进程级状态)。执行期间
+    使用客户端的环境变量(GOFLAGS、CGO_ENABLED、SOURCE_DATE_EPOCH 等), 结束后恢复。
+    每次请求前清空与源码和仓库状态相关的缓存, 工具链探测、Git 信息与检查结果
+    则按指纹跨请求复用。
+    """
+    saved_argv, saved_cwd, saved_env = sys.argv, os.getcwd(), dict(os.environ)
+    for key in _git_info_cache:
+        _git_info_cache[key] = None
+    _source_hash_cache["hash"] = None
+    # 共享的 GOCACHE/GOMODCACHE 由预热按当前环境重新确定
+    _shared_go_env.clear()
+    start_time = time.time()
+    try:
+        if env is not None:
+            os.environ.clear()
+            os.environ.update(env)
+        os.chdir(cwd)
+        sys.argv = [saved_argv[0], *argv]
+        with redirect_stdout(output), redirect_stderr(output):
+            try:
+                main()
+                return 0
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int):
+                    return e.code or 0
+                return 1
+            except Exception as e:
+                print_error(f"守护进程执行构建失败: {str(e)}")
+                return 1
+            finally:
+                _tracer.save()
+    except OSError as e:
+        output.write(f"{RED_BOLD}error: 无法切换到目录 {cwd}: {str(e)}{RESET}\n")
+        return 1
+    finally:
+        sys.argv = saved_argv
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+        _shared_go_env.clear()
+        print_success(f"已处理构建请求: {' '.join(argv)} ({time.time() - start_time:.2f} 秒)")
+
+
+def connect_daemon():
+    """连接构建守护进程, 未运行时抛出 OSError"""
+    import socket
+
+    if hasattr(socket, "AF_UNIX"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = DEFAULT_DAEMON_SOCKET
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = ("127.0.0.1", DEFAULT_DAEMON_PORT)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def read_token_file(path):
+    """读取令牌文件中的访问令牌, 令牌文件不存在时返回空字符串"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def write_token_file(path):
+    """生成新的访问令牌并写入仅当前用户可读写的令牌文件"""
+    import secrets
+
+    token = secrets.token_hex(32)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+def run_daemon():
+    """启动构建守护进程, 优先监听 Unix 套接字, 不支持时监听本机 TCP 端口
+
+    TCP 端口对本机所有用户可见, 因此每个请求都必须携带令牌文件中的访问令牌。
+    """
+    import socket
+    import socketserver
+
+    global _check_memo
+    _check_memo = {}
+    os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+    handler = socketserver_class(DaemonRequestHandler, "StreamRequestHandler")
+    if hasattr(socket, "AF_UNIX"):
+        if os.path.exists(DEFAULT_DAEMON_SOCKET):
+            try:
+                connect_daemon().close()
+                print_error(f"构建守护进程已在运行: {DEFAULT_DAEMON_SOCKET}")
+                sys.exit(1)
+            except OSError:
+                # 上次异常退出残留的套接字文件
+                os.remove(DEFAULT_DAEMON_SOCKET)
+        server = socketserver.UnixStreamServer(DEFAULT_DAEMON_SOCKET, handler)
+        os.chmod(DEFAULT_DAEMON_SOCKET, 0o600)
+        address = DEFAULT_DAEMON_SOCKET
+    else:
+        try:
+            connect_daemon().close()
+            print_error(f"构建守护进程已在运行: 127.0.0.1:{DEFAULT_DAEMON_PORT}")
+            sys.exit(1)
+        except OSError:
+            pass
+        server = socketserver.TCPServer(("127.0.0.1", DEFAULT_DAEMON_PORT), handler)
+        address = f"127.0.0.1:{DEFAULT_DAEMON_PORT}"
+    server.token = write_token_file(DEFAULT_DAEMON_TOKEN_FILE)
+    print_success(f"构建守护进程已启动, 监听 {address}, 按 Ctrl+C 退出")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if hasattr(socket, "AF_UNIX") and os.path.exists(DEFAULT_DAEMON_SOCKET):
+            os.remove(DEFAULT_DAEMON_SOCKET)
+        if os.path.exists(DEFAULT_DAEMON_TOKEN_FILE):
+            os.remove(DEFAULT_DAEMON_TOKEN_FILE)
+    print_success("构建守护进程已退出")
+
+
+def run_client(request):
+    """将请求发送给构建守护进程并输出结果, 返回退出码; 守护进程未运行时返回 None"""
+    try:
+        sock = connect_daemon()
+    except OSError:
+        return None
+    request = {**request, "token": read_token_file(DEFAULT_DAEMON_TOKEN_FILE)}
+    try:
+        with sock, sock.makefile("rb") as reader:
+            sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+            for line in reader:
+                message = json.loads(line)
+                if "output" in message:
+                    sys.stdout.write(message["output"])
+                    sys.stdout.flush()
+                elif "exit" in message:
+                    return message["exit"]
+    except KeyboardInterrupt:
+        return 130
+    print_error("与构建守护进程的连接意外断开")
+    return 1
+
+
+def parse_agent_address(address, default_host="127.0.0.1"):
+    """解析 "主机:端口"、"主机" 或 "端口" 形式的构建代理地址, 返回 (主机, 端口)"""
+    host, _, port = address.rpartition(":")
+    if not host and not port.isdigit():
+        host, port = port, str(DEFAULT_AGENT_PORT)
+    if not port.isdigit():
+        raise ValueError(f"无效的构建代理地址: {address}")
+    return host.strip("[]") or default_host, int(port)
+
+
+def write_frame(wfile, header, payloads=()):
+    """写入一帧构建代理消息: 长度前缀的 JSON 头部, 随后依次是 payloads 中各文件的原始内容
+
+    头部中必须按相同顺序给出各文件的大小(size 字段或 artifacts 中各项的 size),
+    接收方据此读取原始数据。
+    """
+    data = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    wfile.write(AGENT_FRAME.pack(len(data)) + data)
+    for payload in payloads:
+        with open(payload, "rb") as f:
+            shutil.copyfileobj(f, wfile, STREAM_CHUNK_SIZE)
+    wfile.flush()
+
+
+def read_frame(rfile, max_length=AGENT_MAX_HEADER):
+    """读取一帧构建代理消息的 JSON 头部, 连接已关闭时返回 None"""
+    prefix = rfile.read(AGENT_FRAME.size)
+    if not prefix:
+        return None
+    if len(prefix) < AGENT_FRAME.size:
+        raise ValueError("消息帧不完整")
+    (length,) = AGENT_FRAME.unpack(prefix)
+    if length > max_length:
+        raise ValueError(f"消息头部过长: {length} 字节")
+    data = rfile.read(length)
+    if len(data) < length:
+        raise ValueError("消息帧不完整")
+    return json.loads(data)
+
+
+def read_payload(rfile, size, fileobj):
+    """从连接中读取 size 字节的原始数据写入 fileobj"""
+    remaining = size
+    while remaining:
+        chunk = rfile.read(min(STREAM_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise ValueError("连接在传输数据时关闭")
+        fileobj.write(chunk)
+        remaining -= len(chunk)
+
+
+async def send_frame(writer, header, payloads=()):
+    """write_frame 的异步版本, 用于协调端"""
+    data = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    writer.write(AGENT_FRAME.pack(len(data)) + data)
+    for payload in payloads:
+        with open(payload, "rb") as f:
+            for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+                writer.write(chunk)
+                await writer.drain()
+    await writer.drain()
+
+
+async def recv_frame(reader):
+    """read_frame 的异步版本, 连接关闭时抛出 asyncio.IncompleteReadError"""
+    (length,) = AGENT_FRAME.unpack(await reader.readexactly(AGENT_FRAME.size))
+    if length > AGENT_MAX_HEADER:
+        raise ValueError(f"消息头部过长: {length} 字节")
+    return json.loads(await reader.readexactly(length))
+
+
+async def recv_payload(reader, size, fileobj):
+    """read_payload 的异步版本"""
+    import asyncio
+
+    remaining = size
+    while remaining:
+        chunk = await reader.read(min(STREAM_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise asyncio.IncompleteReadError(b"", remaining)
+        fileobj.write(chunk)
+        remaining -= len(chunk)
+
+
+def snapshot_files(root="."):
+    """列出需要发送给构建代理的文件, 返回 (路径, 相对路径) 列表
+
+    Git 仓库中为已跟踪及未被忽略的未跟踪文件(包含 go:embed 引用的资源),
+    否则为全部 Go 源文件与模块文件; 输出目录总是被排除。
+    """
+    try:
+        listed = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            capture_output=True,
+            check=True,
+            timeout=30,
+            cwd=root,
+        ).stdout.decode("utf-8")
+    except (OSError, subprocess.SubprocessError):
+        return list(iter_source_files(root))
+    output_prefix = os.path.normpath(DEFAULT_OUTPUT_DIR).replace(os.sep, "/") + "/"
+    files = []
+    for rel_path in sorted(set(filter(None, listed.split("\0")))):
+        path = os.path.join(root, rel_path)
+        # 已删除但尚未提交的文件仍会被 ls-files 列出
+        if rel_path.startswith(output_prefix) or not os.path.isfile(path):
+            continue
+        files.append((path, rel_path))
+    return files
+
+
+def create_source_snapshot(directory):
+    """将工作区打包为 tar.gz 源码快照, 返回 (快照 ID, 快照文件路径)
+
+    快照 ID 由各文件的相对路径与内容哈希计算, 内容哈希复用 stat 索引;
+    构建代理按 ID 缓存已解包的快照, 源码未变化时不会重复传输。
+    """
+    import tarfile
+
+    files = snapshot_files()
+    digest = hashlib.sha256()
+    for rel_path, file_digest in file_digests(files).items():
+        digest.update(f"{rel_path}\0{file_digest}\n".encode("utf-8"))
+    snapshot_id = digest.hexdigest()[:32]
+    path = os.path.join(directory, f"{snapshot_id}.tar.gz")
+    with _tracer.span("source snapshot", "agent") as span:
+        # 源码压缩率高, 最低压缩级别即可显著减少传输量
+        with tarfile.open(path, "w:gz", compresslevel=1, dereference=True) as tar:
+            for file_path, rel_path in files:
+                tar.add(file_path, rel_path, recursive=False)
+        span["files"] = len(files)
+        span["size"] = os.path.getsize(path)
+    print_success(
+        f"已创建源码快照 {snapshot_id[:12]}: {len(files)} 个文件, {span['size'] / 1024:.1f} KB"
+    )
+    return snapshot_id, path
+
+
+def agent_token_file():
+    """返回构建代理访问令牌文件的路径"""
+    return DEFAULT_AGENT_TOKEN_FILE or os.path.join(DEFAULT_CACHE_DIR, "agent.token")
+
+
+def agent_auth_mac(token, challenge):
+    """计算构建代理握手中对随机挑战值的应答: HMAC-SHA256(令牌, 挑战值)"""
+    return hmac.new(token.encode("utf-8"), challenge.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def agent_target_env(env):
+    """返回发送给构建代理的目标环境变量, 目标使用了代理不接受的环境变量时返回 None
+
+    代理只接受 AGENT_ENV_KEYS 中的环境变量, 其余由代理按目标平台自行组装(与本机默认值一致)。
+    """
+    env = dict(env)
+    sent = {key: value for key, value in env.items() if key in AGENT_ENV_KEYS}
+    if dict(build_target_env(env["GOOS"], env["GOARCH"]), **sent) != env:
+        return None
+    return sent
+
+
+async def open_agent_connection(agent):
+    """连接构建代理并完成认证握手, 返回 (reader, writer)"""
+    import asyncio
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(agent.host, agent.port), AGENT_CONNECT_TIMEOUT
+    )
+    try:
+        challenge = await asyncio.wait_for(recv_frame(reader), AGENT_CONNECT_TIMEOUT)
+        mac = agent_auth_mac(agent.token, str(challenge.get("challenge", "")))
+        await send_frame(writer, {"command": "auth", "mac": mac})
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
+
+
+class BuildAgent:
+    """协调端所连接的一个构建代理, 记录其并发数与已上传的源码快照"""
+
+    def __init__(self, address, token, hello=None):
+        import asyncio
+
+        self.address = address
+        self.token = token
+        hello = hello or {}
+        self.host, self.port = parse_agent_address(address)
+        self.workers = max(1, int(hello.get("workers", 1)))
+        self.go_version = hello.get("go_version")
+        self.alive = True
+        self.snapshots = set()
+        self.lock = asyncio.Lock()
+
+
+async def connect_agents(addresses, go_version):
+    """与各构建代理握手, 返回可用的 BuildAgent 列表, 连接失败或认证失败的代理会被跳过"""
+    import asyncio
+
+    token = read_token_file(agent_token_file())
+
+    async def hello(address):
+        try:
+            agent = BuildAgent(address, token)
+            reader, writer = await open_agent_connection(agent)
+            try:
+                await send_frame(writer, {"command": "hello"})
+                response = await asyncio.wait_for(recv_frame(reader), AGENT_CONNECT_TIMEOUT)
+            finally:
+                writer.close()
+            if not response.get("ok"):
+                raise ValueError(response.get("error", "握手失败"))
+        except (OSError, ValueError, EOFError, asyncio.TimeoutError) as e:
+            print_error(f"无法连接构建代理 {address}, 已跳过: {str(e) or type(e).__name__}")
+            return None
+        agent = BuildAgent(address, token, response)
+        print_success(
+            f"已连接构建代理 {address} ({response.get('host')}): {agent.workers} 个并发, {agent.go_version}"
+        )
+        if go_version and agent.go_version and go_version.split()[2:3] != agent.go_version.split()[2:3]:
+            print_error(f"构建代理 {address} 的 Go 版本与本机不一致: {agent.go_version}")
+        return agent
+
+    if not addresses:
+        return []
+    if not token:
+        print_error(f"未找到构建代理访问令牌 {agent_token_file()}, 不使用构建代理")
+        return []
+    return [agent for agent in await asyncio.gather(*map(hello, addresses)) if agent]
 
-    # 创建线程池
-    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
-        # 提交所有构建任务
-        futures = []
-        for system in SUPPORTED_PLATFORMS:
-            for architecture in SUPPORTED_ARCHITECTURES:
-                futures.append(executor.submit(build_task, system, architecture))
 
-        # 等待所有任务完成, 设置超时时间为30分钟
+async def upload_snapshot(agent, snapshot):
+    """确保构建代理上存在指定的源码快照, 不存在时上传"""
+    snapshot_id, path = snapshot
+    async with agent.lock:
+        if snapshot_id in agent.snapshots:
+            return
+        reader, writer = await open_agent_connection(agent)
         try:
-            for future in futures:
-                future.result(timeout=args.timeout)
-        except concurrent.futures.TimeoutError:
-            print_error("任务执行超时, 强制终止线程池")
-            executor._threads.clear()
-            concurrent.futures.thread._threads_queues.clear()
-            fail_count += len([f for f in futures if not f.done()])
+            await send_frame(writer, {"command": "has_snapshot", "snapshot": snapshot_id})
+            response = await recv_frame(reader)
+            if not response.get("present"):
+                with _tracer.span(f"upload snapshot {agent.address}", "agent"):
+                    await send_frame(
+                        writer,
+                        {
+                            "command": "snapshot",
+                            "snapshot": snapshot_id,
+                            "size": os.path.getsize(path),
+                        },
+                        [path],
+                    )
+                    response = await recv_frame(reader)
+                if not response.get("ok"):
+                    raise ValueError(response.get("error", "上传源码快照失败"))
+                print_success(f"已上传源码快照到构建代理 {agent.address}")
+        finally:
+            writer.close()
+        agent.snapshots.add(snapshot_id)
 
-    total_elapsed_time = time.time() - total_start_time
-    print_success(
-        f"批量构建完成, 成功 {success_count} 个, 失败 {fail_count} 个, 跳过 {skip_count} 个"
-    )
-    print_success(f"总耗时: {total_elapsed_time:.2f} 秒")
 
+async def request_agent_build(agent, snapshot_id, plan, target, timeout):
+    """请求构建代理构建单个目标并取回产物, 返回 (是否成功, 各可执行文件的打包结果)
 
-def single_build(args, system, architecture, output_file, zip_file):
-    """执行单个平台和架构的构建"""
+    各产物写入原本的输出路径(需要打包时为归档文件), 写入前校验代理给出的 SHA-256。
+    """
+    reader, writer = await open_agent_connection(agent)
+    tmp_file = None
     try:
-        # 设置环境变量
-        env = os.environ.copy()
-        env["GOOS"] = system
-        env["GOARCH"] = architecture
+        await send_frame(
+            writer,
+            {
+                "command": "build",
+                "snapshot": snapshot_id,
+                "use_vendor_in_build": plan.use_vendor_in_build,
+                "reproducible": plan.reproducible,
+                "archive_format": plan.archive_format,
+                "compress_level": plan.compress_level,
+                "source_date_epoch": plan.source_date_epoch,
+                "verbose": plan.verbose_build,
+                "timeout": timeout,
+                "target": {
+                    "name": target.name,
+                    "env": agent_target_env(target.env),
+                    "binaries": [
+                        {
+                            "package": b.package,
+                            "output_name": os.path.basename(b.output_file),
+                            "archive_name": (
+                                os.path.basename(b.archive_file) if b.archive_file else None
+                            ),
+                            "ldflags": b.ldflags,
+                        }
+                        for b in target.binaries
+                    ],
+                },
+            },
+        )
+        response = await recv_frame(reader)
+        # 代理只返回输出的末尾, 同样写入本机的目标日志
+        with BuildLog(target_log_file(target)) as log:
+            log.feed(f"# 构建代理 {agent.address}\n{response.get('log', '')}".encode("utf-8"))
+        if not response.get("ok"):
+            print_error(f"构建 {target.name} 失败 (构建代理 {agent.address})：")
+            print_error((response.get("log") or response.get("error") or "").strip())
+            return False, None
+        archive_results = []
+        for binary, artifact in zip(target.binaries, response["artifacts"]):
+            destination = binary.archive_file or binary.output_file
+            tmp_file = f"{destination}.agent{id(target)}"
+            os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+            with open(tmp_file, "wb") as f:
+                stream = HashingStream(f)
+                await recv_payload(reader, artifact["size"], stream)
+            if stream.digest()["sha256"] != artifact["sha256"]:
+                raise ValueError(f"{target.name} 的产物 {binary.name} 在传输中损坏")
+            if not binary.archive_file:
+                os.chmod(tmp_file, 0o755)
+            os.replace(tmp_file, destination)
+            archive_results.append(
+                {"archive": artifact["archive"], "binary": artifact["binary"]}
+                if binary.archive_file
+                else None
+            )
+    finally:
+        writer.close()
+        if tmp_file and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return True, archive_results
 
-        # 获取构建时间
-        build_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-        # 处理Git信息
-        ldflags = args.ldflags
-        if args.git:
-            if _git_info_cache["version"] is None:
-                return False
-            ldflags = LD_FLAGS_TEMPLATE.format(
-                app_name=BASE_OUTPUT_NAME,
-                git_version=_git_info_cache["version"],
-                git_commit=_git_info_cache["commit"],
-                commit_time=_git_info_cache["commit_time"],
-                build_time=build_time,
-                tree_state=_git_info_cache["status"],
-            )
+class BuildAgentServer:
+    """构建代理: 接收协调端上传的源码快照, 按请求构建单个目标并返回产物
 
-        # 执行构建
-        build_config = BuildConfig(
-            go_compiler=args.go_compiler,
-            output_file=output_file,
-            entry_file=args.entry,
-            ldflags=ldflags,
-            use_vendor_in_build=args.use_vendor_in_build,
-            is_batch=True,
-            args=args,
-        )
+    与 socketserver.ThreadingTCPServer 组合后使用(见 socketserver_class)。
+    """
 
-        # 构建
-        build_result = build_go_app(build_config)
+    daemon_threads = True
+    allow_reuse_address = True
 
-        # 压缩
-        if build_result and args.zip and zip_file:
-            zip_executable(output_file, zip_file, True)
+    def __init__(self, address, handler, go_compiler, workers, parallelism):
+        super().__init__(address, handler)
+        self.go_compiler = go_compiler
+        self.go_version = get_go_version(go_compiler)
+        self.workers = workers
+        self.parallelism = parallelism
+        self.build_slots = threading.BoundedSemaphore(workers)
+        self.root = os.path.join(DEFAULT_CACHE_DIR, "agent")
+        os.makedirs(os.path.join(self.root, "snapshots"), exist_ok=True)
+        self.token = read_token_file(agent_token_file())
+        if not self.token:
+            self.token = write_token_file(agent_token_file())
+            print_success(f"已生成构建代理访问令牌 {agent_token_file()}, 请将其复制到协调端的同一路径")
 
-        return build_result
-    except Exception as e:
-        print_error(f"构建 {system}/{architecture} 失败: {str(e)}")
-        return False
+    def authenticate(self, rfile, wfile):
+        """向协调端发送随机挑战值并校验应答, 认证失败时返回 False
 
+        认证前只接受很短的头部, 未认证的连接不会读取任何请求内容。
+        """
+        import secrets
 
-def get_git_info():
-    """获取 Git 版本信息"""
-    global _git_info_cache
+        challenge = secrets.token_hex(16)
+        write_frame(wfile, {"challenge": challenge})
+        response = read_frame(rfile, AGENT_AUTH_MAX_HEADER)
+        if (
+            not isinstance(response, dict)
+            or response.get("command") != "auth"
+            or not hmac.compare_digest(
+                str(response.get("mac", "")), agent_auth_mac(self.token, challenge)
+            )
+        ):
+            write_frame(wfile, {"ok": False, "error": "构建代理认证失败, 请检查访问令牌"})
+            return False
+        return True
 
-    # 如果缓存不存在或无效, 则尝试获取git信息
-    if _git_info_cache["version"] is None:
+    def snapshot_dir(self, snapshot_id):
+        if not re.fullmatch(r"[0-9a-f]{32}", snapshot_id or ""):
+            raise ValueError(f"无效的快照 ID: {snapshot_id}")
+        return os.path.join(self.root, "snapshots", snapshot_id)
+
+    def extract_snapshot(self, snapshot_id, rfile, size):
+        """接收并解包源码快照; 先解包到临时目录再改名, 并发上传同一快照时只保留一份"""
+        import tarfile
+
+        snapshot_dir = self.snapshot_dir(snapshot_id)
+        tmp_dir = f"{snapshot_dir}.tmp{os.getpid()}_{threading.get_ident()}"
+        archive = f"{tmp_dir}.tar.gz"
         try:
-            git_version = subprocess.run(
-                ["git", "describe", "--tags", "--always", "--dirty"],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=10,
-                encoding="utf-8",
-            ).stdout.strip()
-            git_commit = subprocess.run(
-                ["git", "rev-parse", "--short", "HEAD"],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=10,
-                encoding="utf-8",
-            ).stdout.strip()
-            git_commit_time = subprocess.run(
-                ["git", "log", "-1", "--format=%cd", "--date=iso"],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=10,
-                encoding="utf-8",
-            ).stdout.strip()
-            git_status = (
-                "dirty"
-                if subprocess.run(
-                    ["git", "status", "--porcelain"],
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    encoding="utf-8",
-                ).stdout.strip()
-                else "clean"
+            with open(archive, "wb") as f:
+                read_payload(rfile, size, f)
+            with tarfile.open(archive, "r:gz") as tar:
+                for member in tar.getmembers():
+                    parts = member.name.split("/")
+                    if os.path.isabs(member.name) or ".." in parts or not (
+                        member.isfile() or member.isdir()
+                    ):
+                        raise ValueError(f"源码快照中包含不安全的条目: {member.name}")
+                # Python 3.12 起提供解包过滤器, 旧版本依赖上面的检查
+                kwargs = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+                tar.extractall(tmp_dir, **kwargs)
+            try:
+                os.replace(tmp_dir, snapshot_dir)
+            except OSError:
+                if not os.path.isdir(snapshot_dir):
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if os.path.exists(archive):
+                os.remove(archive)
+        self.prune_snapshots()
+
+    def prune_snapshots(self):
+        """只保留最近使用的 AGENT_MAX_SNAPSHOTS 个快照"""
+        base = os.path.join(self.root, "snapshots")
+        snapshots = []
+        for name in os.listdir(base):
+            path = os.path.join(base, name)
+            if re.fullmatch(r"[0-9a-f]{32}", name) and os.path.isdir(path):
+                snapshots.append((os.stat(path).st_mtime, path))
+        for _, path in sorted(snapshots, reverse=True)[AGENT_MAX_SNAPSHOTS:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def build(self, request, wfile):
+        """在快照目录中构建请求的目标, 将结果与产物写回协调端"""
+        target = request["target"]
+        binaries = target["binaries"]
+        target_env = target.get("env") or {}
+        rejected = sorted(set(target_env) - AGENT_ENV_KEYS)
+        if rejected or not {"GOOS", "GOARCH"} <= target_env.keys():
+            error = f"不接受的环境变量: {', '.join(rejected)}" if rejected else "缺少 GOOS/GOARCH"
+            write_frame(wfile, {"ok": False, "error": error})
+            return
+        snapshot_dir = self.snapshot_dir(request["snapshot"])
+        if not os.path.isdir(snapshot_dir):
+            write_frame(wfile, {"ok": False, "error": "源码快照不存在"})
+            return
+        # 更新修改时间, 作为快照淘汰的使用时间依据
+        os.utime(snapshot_dir)
+        with tempfile.TemporaryDirectory(prefix="build-", dir=self.root) as work_dir:
+            config = BuildConfig(
+                go_compiler=self.go_compiler,
+                **binary_fields(
+                    [
+                        (
+                            b["package"],
+                            os.path.join(work_dir, os.path.basename(b["output_name"])),
+                            b["ldflags"],
+                        )
+                        for b in binaries
+                    ]
+                ),
+                use_vendor_in_build=request["use_vendor_in_build"],
+                is_batch=True,
+                env=dict(build_target_env(target_env["GOOS"], target_env["GOARCH"]), **target_env),
+                parallelism=self.parallelism,
+                reproducible=request["reproducible"],
+                verbose=request.get("verbose", False),
+                workdir=snapshot_dir,
             )
-            format_time = datetime.strptime(
-                git_commit_time, "%Y-%m-%d %H:%M:%S %z"
-            ).strftime("%Y-%m-%dT%H:%M:%SZ")
-            _git_info_cache["version"] = git_version
-            _git_info_cache["commit"] = git_commit
-            _git_info_cache["commit_time"] = format_time
-            _git_info_cache["status"] = git_status
-        except subprocess.CalledProcessError:
-            print_error("警告: 无法获取 Git 版本信息, 可能是当前目录不是 Git 仓库。")
-            return None
-        except subprocess.TimeoutExpired:
-            print_error("获取 Git 版本信息超时。")
-            return None
+            command = prepare_build_command(config)
+            if command is None:
+                write_frame(wfile, {"ok": False, "error": "vendor 目录不存在"})
+                return
+            # 快照目录不是 Git 仓库, 版本信息已由链接器标志注入
+            if not config.reproducible:
+                command.insert(2, "-buildvcs=false")
+            start_time = time.time()
+            # 代理端不写日志文件, 只把输出末尾返回给协调端
+            with self.build_slots, BuildLog() as build_log:
+                try:
+                    ok = (
+                        stream_process(
+                            command,
+                            build_log,
+                            env=prepare_build_env(config),
+                            cwd=snapshot_dir,
+                            timeout=request.get("timeout"),
+                        )
+                        == 0
+                    )
+                except subprocess.TimeoutExpired:
+                    build_log.feed(f"构建超时({request.get('timeout')} 秒)\n".encode("utf-8"))
+                    ok = False
+                collect_build_outputs(config, ok)
+            log = build_log.summary()[-AGENT_LOG_LIMIT:]
+            duration = time.time() - start_time
+            print_success(
+                f"{target['name']} 构建{'成功' if ok else '失败'}, 耗时 {duration:.2f} 秒"
+            )
+            response = {"ok": ok, "log": log, "duration": duration}
+            if not ok:
+                write_frame(wfile, response)
+                return
 
-    return (
-        _git_info_cache["version"],
-        _git_info_cache["commit"],
-        _git_info_cache["commit_time"],
-        _git_info_cache["status"],
-    )
+            # 产物按请求中可执行文件的顺序依次跟在响应头部之后
+            paths, artifacts = [], []
+            for binary, (_, output_file, _) in zip(binaries, config_binaries(config)):
+                if binary.get("archive_name"):
+                    path = os.path.join(work_dir, os.path.basename(binary["archive_name"]))
+                    archived = archive_executable(
+                        output_file,
+                        path,
+                        request["archive_format"],
+                        request["compress_level"],
+                        True,
+                        request["source_date_epoch"],
+                    )
+                    if archived is None:
+                        write_frame(wfile, {"ok": False, "log": log, "error": "打包失败"})
+                        return
+                    artifact = {"archive": archived["archive"], "binary": archived["binary"]}
+                    digest = archived["archive"]
+                else:
+                    path, artifact = output_file, {}
+                    digest = hash_file(path)
+                artifact.update(size=digest["size"], sha256=digest["sha256"])
+                paths.append(path)
+                artifacts.append(artifact)
+            response["artifacts"] = artifacts
+            write_frame(wfile, response, paths)
 
 
-def generate_output_file_name(base_name, system, git_version=None):
-    """根据操作系统生成默认输出文件名, 可选的git版本号"""
-    # 创建输出目录, 如果不存在则创建
-    os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
+class AgentRequestHandler:
+    """处理协调端的一个连接, 连接内可依次发送多个请求
 
-    name = base_name
-    if git_version is not None:
-        name = f"{name}_{git_version}"
+    与 socketserver.StreamRequestHandler 组合后使用(见 socketserver_class)。
+    """
 
-    if system == "windows":
-        return os.path.join(DEFAULT_OUTPUT_DIR, f"{name}.exe")
-    return os.path.join(DEFAULT_OUTPUT_DIR, name)
+    def handle(self):
+        import tarfile
 
+        try:
+            # 握手阶段限时, 避免未认证的空闲连接长期占用线程
+            self.connection.settimeout(AGENT_CONNECT_TIMEOUT)
+            if not self.server.authenticate(self.rfile, self.wfile):
+                print_error(f"已拒绝未认证的连接: {self.client_address[0]}")
+                return
+            self.connection.settimeout(None)
+            while True:
+                request = read_frame(self.rfile)
+                if request is None:
+                    return
+                command = request.get("command")
+                if command == "hello":
+                    write_frame(
+                        self.wfile,
+                        {
+                            "ok": True,
+                            "host": platform.node(),
+                            "workers": self.server.workers,
+                            "go_version": self.server.go_version,
+                        },
+                    )
+                elif command == "has_snapshot":
+                    present = os.path.isdir(self.server.snapshot_dir(request["snapshot"]))
+                    write_frame(self.wfile, {"ok": True, "present": present})
+                elif command == "snapshot":
+                    self.server.extract_snapshot(
+                        request["snapshot"], self.rfile, request["size"]
+                    )
+                    print_success(f"已接收源码快照 {request['snapshot'][:12]}")
+                    write_frame(self.wfile, {"ok": True})
+                elif command == "build":
+                    self.server.build(request, self.wfile)
+                else:
+                    write_frame(self.wfile, {"ok": False, "error": f"未知的请求: {command}"})
+        except (OSError, ValueError, KeyError, tarfile.TarError) as e:
+            print_error(f"处理协调端请求失败: {str(e)}")
+            try:
+                write_frame(self.wfile, {"ok": False, "error": str(e)})
+            except OSError:
+                pass
 
-def generate_zip_file_name(output_base_name, system, architecture, git_version=None):
-    """根据输出文件名、操作系统和架构生成默认的 zip 文件名, 可选的git版本号"""
-    os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
-    name = f"{output_base_name}_{system}_{architecture}"
-    if git_version is not None:
-        name = f"{name}_{git_version}"
-    return os.path.join(DEFAULT_OUTPUT_DIR, f"{name}.zip")
 
+def create_agent_server(address, go_compiler, workers, parallelism):
+    """创建监听 address 的构建代理服务器, 端口为 0 时由系统分配"""
+    return socketserver_class(BuildAgentServer, "ThreadingTCPServer")(
+        address,
+        socketserver_class(AgentRequestHandler, "StreamRequestHandler"),
+        go_compiler,
+        workers,
+        parallelism,
+    )
 
-def pre_build_checks(go_compiler, entry_file, use_vendor):
-    """构建前的检查工作"""
-    if not check_go_installed(go_compiler):
-        return False
-    if not check_go_mod_file():
-        return False
-    if not check_entry_file(entry_file):
-        return False
-    if use_vendor:
-        try:
-            run_go_mod_vendor(go_compiler)
-        except Exception as e:
-            print_error(str(e))
-            return False
+
+def run_agent(args):
+    """以构建代理方式运行, 接收协调端通过 --agents 分发的构建目标"""
     try:
-        run_go_mod_tidy(go_compiler, use_vendor)
-        run_code_check(go_compiler)
-        run_gofmt(go_compiler)
-    except Exception as e:
+        host, port = parse_agent_address(args.agent)
+    except ValueError as e:
         print_error(str(e))
-        return False
-    return True
+        sys.exit(1)
+    if get_go_version(args.go_compiler) is None:
+        print_error(f"未找到 Go 编译器: {args.go_compiler}")
+        sys.exit(1)
+    cpus = effective_cpu_count()[0]
+    workers, parallelism = resolve_concurrency(args.max_workers, max(args.max_workers, cpus))
+    server = create_agent_server((host, port), args.go_compiler, workers, parallelism)
+    print_success(f"构建代理已启动, 监听 {host}:{port}, 按 Ctrl+C 退出")
+    if host not in ("127.0.0.1", "localhost", "::1"):
+        print_error("警告: 构建代理会构建协调端发送的任意代码, 请只在可信网络中监听非本机地址")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print_success("构建代理已退出")
 
 
 def parse_arguments():
@@ -586,7 +4855,10 @@ def parse_arguments():
         "-o", "--output", help="指定输出文件名(无需指定后缀)", default=BASE_OUTPUT_NAME
     )
     parser.add_argument(
-        "-e", "--entry", help="指定入口文件路径", default=DEFAULT_ENTRY_FILE
+        "-e",
+        "--entry",
+        help="指定入口文件路径, 多个入口(包目录或 ./cmd/... 形式的包模式)以逗号分隔, 每个目标的全部 main 包由一次 go build 构建",
+        default=DEFAULT_ENTRY_FILE,
     )
     parser.add_argument(
         "-l", "--ldflags", help="指定构建时的链接器标志", default=DEFAULT_LDFLAGS
@@ -615,10 +4887,28 @@ def parse_arguments():
         "-z",
         "--zip",
         action="store_true",
-        help="是否将构建成功的可执行文件打包到 ZIP 文件中",
+        help="是否将构建成功的可执行文件打包到归档文件中",
         default=DEFAULT_PACKAGE_ZIP,
     )
-    parser.add_argument("--zip-file", help="指定打包输出的 ZIP 文件名", default=None)
+    parser.add_argument("--zip-file", help="指定打包输出的归档文件名", default=None)
+    parser.add_argument(
+        "--archive-format",
+        choices=list(ARCHIVE_FORMATS),
+        help="指定打包格式",
+        default=DEFAULT_ARCHIVE_FORMAT,
+    )
+    parser.add_argument(
+        "--no-checksums",
+        action="store_true",
+        help=f"不在输出目录生成 {CHECKSUM_FILE_NAME} 与 {MANIFEST_FILE_NAME}",
+        default=not DEFAULT_WRITE_CHECKSUMS,
+    )
+    parser.add_argument(
+        "--compress-level",
+        type=int,
+        help="指定压缩级别(zip/gz/bz2 为 0-9, bz2 最低为 1, xz 为 0-9 预设)",
+        default=DEFAULT_COMPRESS_LEVEL,
+    )
     parser.add_argument(
         "-git",
         action="store_true",
@@ -657,11 +4947,33 @@ def parse_arguments():
         help="启用批量构建模式, 构建所有支持的平台和架构组合",
         default=False,
     )
+    parser.add_argument(
+        "--batch-platforms",
+        help="批量构建模式下的目标平台列表, 以逗号分隔, 支持简写",
+        default=",".join(DEFAULT_BATCH_PLATFORMS),
+    )
+    parser.add_argument(
+        "--batch-archs",
+        help=f"批量构建模式下的目标架构列表, 以逗号分隔, 可选 {','.join(SUPPORTED_ARCHITECTURES)}",
+        default=",".join(DEFAULT_BATCH_ARCHITECTURES),
+    )
+    parser.add_argument(
+        "--estimate",
+        action="store_true",
+        help="批量构建开始前根据历史耗时打印预计总耗时和关键路径",
+        default=False,
+    )
+    parser.add_argument(
+        "--no-warmup",
+        action="store_true",
+        help="批量构建模式下跳过模块下载和标准库预编译的预热阶段",
+        default=False,
+    )
     parser.add_argument(
         "-w",
         "--max-workers",
         type=int,
-        help="批量构建模式下的最大并发线程数",
+        help="批量构建模式下的最大并发线程数, 默认根据 CPU 配额与可用内存自动计算",
         default=DEFAULT_CONCURRENCY,
     )
     parser.add_argument(
@@ -671,6 +4983,70 @@ def parse_arguments():
         help="批量构建模式下每个任务的超时时间(秒), 默认30分钟(1800秒)",
         default=DEFAULT_TIMEOUT,
     )
+    parser.add_argument(
+        "--plan-json",
+        nargs="?",
+        const="-",
+        help="仅输出解析后的构建计划(JSON)而不执行构建, 可指定输出文件, 默认输出到标准输出",
+        default=None,
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="构建完成后监视源码与 go.mod/go.sum 的变化, 自动重新构建当前目标",
+        default=False,
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="以守护进程方式运行, 在本机套接字上接收构建请求并保持工具链、Git 信息与检查结果常驻",
+        default=False,
+    )
+    parser.add_argument(
+        "--client",
+        action="store_true",
+        help="将本次命令行参数转发给构建守护进程执行, 守护进程未运行时在本地执行",
+        default=False,
+    )
+    parser.add_argument(
+        "--daemon-stop",
+        action="store_true",
+        help="停止正在运行的构建守护进程",
+        default=False,
+    )
+    parser.add_argument(
+        "--agent",
+        help="以构建代理方式运行, 监听指定的 [主机:]端口 并构建协调端分发的目标; 只指定端口时仅监听本机",
+        default=None,
+    )
+    parser.add_argument(
+        "--agents",
+        help=f"批量构建时将目标分发给逗号分隔的构建代理列表(主机:端口, 默认端口 {DEFAULT_AGENT_PORT})",
+        default=",".join(DEFAULT_AGENTS),
+    )
+    parser.add_argument(
+        "--trace",
+        help="将各阶段与各目标的耗时以 Chrome trace-event 格式写入指定文件",
+        default=None,
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="输出启动阶段(导入模块、解析参数、探测工具链、获取 Git 信息、生成构建计划)各步骤的耗时",
+        default=False,
+    )
+    parser.add_argument(
+        "--verbose-build",
+        action="store_true",
+        help=f"向 go build 传递 -v, 正在编译的包会写入 {DEFAULT_LOG_DIR} 下的目标日志并显示在实时进度中",
+        default=False,
+    )
+    parser.add_argument(
+        "--no-progress",
+        action="store_true",
+        help="不在终端中显示各在途目标的实时进度",
+        default=not DEFAULT_SHOW_PROGRESS,
+    )
     parser.add_argument(
         "-i",
         "--install",
@@ -692,8 +5068,71 @@ def parse_arguments():
         default=False,
     )
 
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="禁用本地构建产物缓存, 始终执行 go build",
+        default=not DEFAULT_USE_CACHE,
+    )
+    parser.add_argument(
+        "--remote-cache",
+        help="多个构建节点共享的远程产物缓存: 共享目录路径或支持 GET/PUT 的 http(s) 地址",
+        default=DEFAULT_REMOTE_CACHE,
+    )
+    parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="可复现构建: 构建时间取自 SOURCE_DATE_EPOCH 或提交时间, 使用 -trimpath、-buildvcs=false 与空 build ID, 并规范化归档元数据",
+        default=DEFAULT_REPRODUCIBLE,
+    )
+    parser.add_argument(
+        "--verify-reproducible",
+        action="store_true",
+        help="以可复现模式构建后在全新的 GOCACHE 中再次构建, 比较两次产物的哈希",
+        default=False,
+    )
+    parser.add_argument(
+        "--no-check-cache",
+        action="store_true",
+        help="禁用检查结果缓存, 每次都执行 go mod tidy/go vet/go fmt",
+        default=not DEFAULT_USE_CHECK_CACHE,
+    )
+    parser.add_argument(
+        "--recheck",
+        nargs="?",
+        const="all",
+        help="忽略缓存的检查结果强制重新检查, 可指定逗号分隔的阶段: tidy,vet,fmt, 默认全部",
+        default="",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="输出当前模块源码树的内容指纹(即注入的 sourceHash)后退出",
+        default=False,
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="打印本地构建产物缓存的统计信息后退出",
+        default=False,
+    )
+
     args = parser.parse_args()  # 解析命令行参数
 
+    # 解析构建代理列表
+    args.agents = [item.strip() for item in args.agents.split(",") if item.strip()]
+
+    # 校验可复现性时总是以可复现模式构建
+    if args.verify_reproducible:
+        args.reproducible = True
+
+    # 解析需要强制重新检查的阶段
+    args.recheck = tuple(item.strip() for item in args.recheck.split(",") if item.strip())
+    for item in args.recheck:
+        if item != "all" and item not in CACHED_CHECKS:
+            print_error(f"不支持的检查阶段: {item}, 可选值: all, {', '.join(CACHED_CHECKS)}")
+            sys.exit(1)
+
     # 处理平台简写
     if args.platform and args.platform in PLATFORM_SHORTCUTS:
         args.platform = PLATFORM_SHORTCUTS[args.platform]
@@ -703,8 +5142,9 @@ def parse_arguments():
         args.arch = ARCHITECTURE_SHORTCUTS[args.arch]
 
     # 检查不支持的架构组合
-    if args.platform == "darwin" and args.arch in ("386", "arm"):
-        print_error(f"不支持的架构组合: darwin/{args.arch}, macOS不支持32位架构")
+    if (args.platform, args.arch) in UNSUPPORTED_TARGETS:
+        reason = UNSUPPORTED_TARGETS[(args.platform, args.arch)]
+        print_error(f"不支持的架构组合: {args.platform}/{args.arch}, {reason}")
         return None
 
     return args
@@ -718,8 +5158,10 @@ def install_executable(executable_path, args=None):
         executable_path: 要安装的可执行文件路径
         args: 命令行参数对象, 包含force等标志
     """
-    # 检查GOPATH环境变量
+    # 检查GOPATH环境变量, 未设置时使用 go env 给出的默认值
     gopath = os.getenv("GOPATH")
+    if not gopath and args:
+        gopath = toolchain_env(args.go_compiler, "GOPATH")
     if not gopath:
         print_error("未找到GOPATH环境变量, 请先设置GOPATH")
         return False
@@ -768,11 +5210,74 @@ def install_executable(executable_path, args=None):
 
 
 def main():
+    global _tracer, _progress, _startup_profile
+
     # 记录开始时间
     start_time = time.time()
+    startup_start = time.perf_counter()
 
     # 解析命令行参数
     args = parse_arguments()
+    _tracer = Tracer(args.trace)
+    _startup_profile = StartupProfile(args.profile_startup)
+    # 守护进程中模块早已导入, 只统计本次请求的耗时
+    in_daemon = _check_memo is not None
+    if not in_daemon:
+        _startup_profile.add("导入模块", IMPORTS_END_TIME - SCRIPT_START_TIME)
+    _startup_profile.add("解析参数", time.perf_counter() - startup_start)
+    # 只在终端中显示实时进度, 重定向到文件或守护进程客户端时按原样逐行输出
+    _progress = ProgressDisplay(
+        sys.stdout if not args.no_progress and sys.stdout.isatty() else None
+    )
+
+    # 守护进程按顺序处理请求, 常驻的模式会使守护进程无法再处理后续请求
+    if args.client or _check_memo is not None:
+        resident = [
+            option
+            for option, enabled in (
+                ("--daemon", args.daemon),
+                ("--watch", args.watch),
+                ("--agent", args.agent),
+            )
+            if enabled
+        ]
+        if resident:
+            print_error(f"{', '.join(resident)} 不能通过构建守护进程执行, 请去掉 --client 直接运行")
+            sys.exit(1)
+
+    # 守护进程模式: 常驻并处理客户端转发的构建请求
+    if args.daemon:
+        run_daemon()
+        sys.exit(0)
+
+    # 客户端模式: 转发参数给守护进程并输出结果
+    if args.client or args.daemon_stop:
+        if args.daemon_stop:
+            exit_code = run_client({"command": "stop"})
+        else:
+            argv = [arg for arg in sys.argv[1:] if arg != "--client"]
+            exit_code = run_client({"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)})
+        if exit_code is not None:
+            sys.exit(exit_code)
+        if args.daemon_stop:
+            print_error("构建守护进程未运行")
+            sys.exit(1)
+        print_error("未连接到构建守护进程, 在本地执行构建")
+
+    # 构建代理模式: 常驻并构建协调端分发的目标
+    if args.agent:
+        run_agent(args)
+        sys.exit(0)
+
+    # 仅输出源码树指纹
+    if args.fingerprint:
+        print(hash_source_tree())
+        sys.exit(0)
+
+    # 仅打印缓存统计信息
+    if args.cache_stats:
+        print_cache_stats()
+        sys.exit(0)
 
     # 如果指定了单独安装参数
     if args.install:
@@ -785,136 +5290,85 @@ def main():
         print_error("批量构建模式下不能使用简单文件名格式, 请移除-s/--simple-name参数")
         return None
 
-    # 如果启用了git标志, 提前获取git信息
+    # 监视模式只重新构建当前目标
+    if args.batch and args.watch:
+        print_error("批量构建模式下不能使用监视模式, 请移除--watch参数")
+        sys.exit(1)
+    if args.agents and not args.batch:
+        print_error("构建代理只用于批量构建模式, 请添加-batch参数或移除--agents参数")
+        sys.exit(1)
+    if args.watch and args.verify_reproducible:
+        print_error("监视模式下不能校验可复现性, 请移除--verify-reproducible参数")
+        sys.exit(1)
+
+    # 探测工具链(版本、缓存目录与支持的目标), 结果缓存在磁盘上
+    with _startup_profile.phase("探测工具链"):
+        probe_toolchain(args.go_compiler)
+
+    # 如果启用了git标志, 提前获取git信息(输出计划 JSON 时保持标准输出干净)
     if args.git:
-        print_success("正在获取 Git 信息...")
-        if not get_git_info():
+        if not args.plan_json:
+            print_success("正在获取 Git 信息...")
+        with _tracer.span("git info", "git"), _startup_profile.phase("获取 Git 信息"):
+            git_info = get_git_info()
+        if not git_info:
             sys.exit(1)
 
+    # 一次性解析出构建计划, 后续只执行计划
+    with _tracer.span("create plan", "plan"), _startup_profile.phase("生成构建计划"):
+        plan = create_build_plan(args)
+    if args.plan_json != "-":
+        _startup_profile.report(
+            time.perf_counter() - (startup_start if in_daemon else SCRIPT_START_TIME)
+        )
+    if args.plan_json:
+        write_plan_json(plan, args.plan_json)
+        sys.exit(0)
+
     # 如果是批量构建模式
     if args.batch:
         try:
-            batch_build(args)
+            with _tracer.span("batch build", "plan"):
+                batch_build(args, plan)
         except Exception as e:
             print_error(f"批量构建失败: {str(e)}")
             sys.exit(1)
+        # 与构建时使用的计划一致: 指纹按检查后的源码计算
+        plan = with_source_hash(plan)
+        if args.verify_reproducible and not verify_reproducible(plan):
+            sys.exit(1)
         sys.exit(0)
 
-    entry_file = args.entry  # 指定入口文件路径
-    ldflags = args.ldflags  # 指定构建时的链接器标志
-    go_compiler = args.go_compiler  # 指定 Go 编译器的绝对路径
-    use_vendor = args.use_vendor  # 是否通过 vendor 克隆依赖到项目目录下
-    zip_flag = args.zip  # 是否将构建成功的可执行文件打包到 ZIP 文件中
-    inject_git = args.git  # 是否注入 Git 信息
-    output_base_name = args.output  # 指定输出文件名
-
-    # 获取操作系统和架构信息
-    system = args.platform if args.platform else platform.system().lower()
-    architecture = args.arch if args.arch else platform.machine().lower()
-
-    # 检查是否仅构建当前平台
-    if args.current_platform_only and system != platform.system().lower():
-        print_error(
-            f"当前平台为 {platform.system().lower()}, 不允许构建 {system} 平台的可执行文件"
-        )
-        sys.exit(1)
-
-    # 自动转换x86_64为amd64
-    if architecture == "x86_64":
-        architecture = "amd64"
-
-    # 校验平台和架构是否支持
-    if system not in SUPPORTED_PLATFORMS:
-        print_error(f"不支持的平台: {system}, 支持的平台: {SUPPORTED_PLATFORMS}")
-        print_error(
-            "支持的平台简写: "
-            + ", ".join([f"{k}({v})" for k, v in PLATFORM_SHORTCUTS.items()])
-        )
-        sys.exit(1)
-    if architecture not in SUPPORTED_ARCHITECTURES:
-        print_error(
-            f"不支持的架构: {architecture}, 支持的架构: {SUPPORTED_ARCHITECTURES}"
-        )
-        print_error(
-            "支持的架构简写: "
-            + ", ".join([f"{k}({v})" for k, v in ARCHITECTURE_SHORTCUTS.items()])
-        )
-        sys.exit(1)
-
     # 验证文件路径
-    if not os.path.exists(entry_file):
-        print_error(f"入口文件 {entry_file} 不存在")
+    missing = missing_entries(plan.entry_file)
+    if missing:
+        print_error(f"入口文件 {', '.join(missing)} 不存在")
         sys.exit(1)
 
     # 执行构建前的检查工作
-    if not pre_build_checks(go_compiler, entry_file, use_vendor):
+    if not pre_build_checks(
+        plan.go_compiler,
+        plan.entry_file,
+        plan.use_vendor,
+        use_check_cache=plan.use_check_cache,
+        recheck=plan.recheck,
+    ):
         sys.exit(1)
 
-    # 获取构建时间
-    build_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-
-    # 根据参数注入 Git 信息
-    if inject_git:
-        # 直接从缓存获取git信息
-        git_version = _git_info_cache["version"]
-        git_commit = _git_info_cache["commit"]
-        format_time = _git_info_cache["commit_time"]
-        git_status = _git_info_cache["status"]
-        if git_version is None:
-            sys.exit(1)
-        # 注入 Git 信息到链接器标志
-        ldflags = LD_FLAGS_TEMPLATE.format(
-            app_name=output_base_name,
-            git_version=git_version,
-            git_commit=git_commit,
-            commit_time=format_time,
-            build_time=build_time,
-            tree_state=git_status,
-        )
-        print_success(f"Git信息已注入: {git_version} ({git_commit})")
-
-    # 生成默认的 zip 文件名
-    if args.zip_file is None:
-        zip_file = generate_zip_file_name(
-            output_base_name, system, architecture, git_version if inject_git else None
-        )
-    else:
-        zip_file = args.zip_file
+    # 检查阶段可能改写了源码, 按改写后的源码更新注入的指纹
+    plan = with_source_hash(plan)
+    target = plan.targets[0]
 
-    # 如果指定了简单文件名格式, 生成则生成不带系统架构信息的输出文件名
-    if args.simple_name:
-        base_name = f"{BASE_OUTPUT_NAME}"
-        # 生成默认的输出文件名
-        output_file = generate_output_file_name(base_name, system, None)
-    else:
-        # 生成带有系统和架构信息的默认输出文件名
-        base_name = f"{BASE_OUTPUT_NAME}_{system}_{architecture}"
-        # 生成默认的输出文件名
-        output_file = generate_output_file_name(
-            base_name, system, git_version if inject_git else None
+    if args.git:
+        print_success(
+            f"Git信息已注入: {_git_info_cache['version']} ({_git_info_cache['commit']})"
         )
 
     # 执行构建命令
     print_success("开始构建...")
-    build_config = BuildConfig(
-        go_compiler=go_compiler,
-        output_file=output_file,
-        entry_file=entry_file,
-        ldflags=ldflags,
-        use_vendor_in_build=args.use_vendor_in_build,
-        is_batch=args.batch,
-        args=args,
-    )
-    build_result = build_go_app(build_config)
-
-    # 判断构建结果
-    if build_result:
-        if not args.batch:
-            print_success("构建完成。")
-        if zip_flag:
-            zip_executable(output_file, zip_file, args.batch)
-    else:
-        print_error("构建失败, 请检查错误信息。")
+    build_result = build_single_target(plan, target)
+    if args.verify_reproducible and not (build_result and verify_reproducible(plan)):
+        sys.exit(1)
 
     # 记录结束时间
     end_time = time.time()
@@ -922,12 +5376,21 @@ def main():
     elapsed_time = end_time - start_time
     print_success(f"本次构建耗时: {elapsed_time:.2f} 秒")
 
+    # 监视源码变化并自动重新构建
+    if args.watch:
+        watch_and_rebuild(args)
+        sys.exit(0)
+
     # 单独构建模式下自动安装
-    if args.auto_install and not args.batch:
-        if not install_executable(output_file, args):
-            sys.exit(1)
+    if args.auto_install:
+        for binary in target.binaries:
+            if not install_executable(binary.output_file, args):
+                sys.exit(1)
         sys.exit(0)
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        _tracer.save()
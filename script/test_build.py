@@ -0,0 +1,679 @@
+"""build.py 的回归测试
+
+在临时 Git 项目中直接调用 build.py 的函数, 只依赖标准库与 git:
+
+    python -m unittest discover -s script
+"""
+
+import io
+import os
+import json
+import hashlib
+import sys
+import collections
+import shutil
+import tempfile
+import time
+import unittest
+import threading
+import subprocess
+from unittest import mock
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import build  # noqa: E402
+
+
+GIT = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com"]
+
+
+def git(*args, cwd="."):
+    subprocess.run(GIT + list(args), cwd=cwd, check=True, capture_output=True)
+
+
+def write_file(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def touch_later(path):
+    """将文件的修改时间推后, 避免与上一次读取落在同一时间粒度内"""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 5 * 10**9))
+
+
+class ProjectTestCase(unittest.TestCase):
+    """在临时目录中创建带有提交与标签的 Go 项目, 缓存目录同样位于临时目录"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="verman-test-")
+        self.old_cwd = os.getcwd()
+        self.old_cache_dir = build.DEFAULT_CACHE_DIR
+        build.DEFAULT_CACHE_DIR = os.path.join(self.root, "cache")
+        self.project = os.path.join(self.root, "project")
+        os.makedirs(self.project)
+        os.chdir(self.project)
+        write_file("go.mod", "module example.com/test\n\ngo 1.21\n")
+        write_file("main.go", "package main\n\nfunc main() {}\n")
+        write_file("main_test.go", "package main\n\nimport \"testing\"\n\nfunc TestMain(t *testing.T) {}\n")
+        git("init", "-q")
+        git("add", ".")
+        git("commit", "-q", "-m", "init")
+        git("tag", "v0.1.0")
+        # 文件修改时间早于 index, 避免 git 因时间戳相近而在每次 describe 时重写 index
+        for name in ("go.mod", "main.go", "main_test.go"):
+            st = os.stat(name)
+            os.utime(name, ns=(st.st_atime_ns, st.st_mtime_ns - 100 * 10**9))
+        git("update-index", "--refresh")
+        self.reset_caches()
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        build.DEFAULT_CACHE_DIR = self.old_cache_dir
+        self.reset_caches()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def run_main(self, *argv):
+        """以给定的命令行参数运行 build.py, 返回退出码"""
+        with mock.patch.object(sys, "argv", ["build.py", *argv]), self.assertRaises(SystemExit) as cm:
+            build.main()
+        return cm.exception.code or 0
+
+    def reset_caches(self):
+        """清空进程内缓存, 模拟一次新的运行(磁盘缓存保留)"""
+        build._git_info_cache.update(version=None, commit=None, commit_time=None, status=None)
+        build._git_info_memo.clear()
+        build._source_hash_cache["hash"] = None
+        build._cache_size["bytes"] = None
+
+
+class GitInfoCacheTest(ProjectTestCase):
+    """Git 信息缓存不能在工作区变化后返回过期的仓库状态"""
+
+    def git_info(self):
+        self.reset_caches()
+        return build.get_git_info()
+
+    def prime_clean(self):
+        """写入磁盘缓存, 再确认第二次调用命中缓存"""
+        self.assertEqual(self.git_info()[3], "clean")
+        self.assertEqual(self.git_info()[3], "clean")
+
+    def test_clean_tree(self):
+        version, _, _, status = self.git_info()
+        self.assertEqual((version, status), ("v0.1.0", "clean"))
+        # 构建输出目录不影响仓库状态
+        os.makedirs(build.DEFAULT_OUTPUT_DIR)
+        write_file(os.path.join(build.DEFAULT_OUTPUT_DIR, "myapp"), "binary")
+        self.assertEqual(self.git_info()[3], "clean")
+
+    def test_modified_test_file_is_dirty(self):
+        self.prime_clean()
+        with open("main_test.go", "a", encoding="utf-8") as f:
+            f.write("\n// changed\n")
+        touch_later("main_test.go")
+        version, _, _, status = self.git_info()
+        self.assertEqual(status, "dirty")
+        self.assertTrue(version.endswith("-dirty"), version)
+
+    def test_untracked_source_is_dirty(self):
+        self.prime_clean()
+        write_file("extra.go", "package main\n\nfunc init() { panic(\"extra\") }\n")
+        self.assertEqual(self.git_info()[3], "dirty")
+        os.remove("extra.go")
+        self.assertEqual(self.git_info()[3], "clean")
+
+    def test_index_matches_ls_files(self):
+        os.makedirs(os.path.join("pkg", "sub"))
+        write_file(os.path.join("pkg", "sub", "a_long_file_name.go"), "package sub\n")
+        write_file(".gitignore", "output/\n")
+        git("add", ".")
+        git("commit", "-q", "-m", "more")
+        git_dir, common_dir, _ = build.find_git_dir()
+        expected = subprocess.run(
+            ["git", "ls-files"], capture_output=True, text=True, check=True
+        ).stdout.split()
+        for version in ("2", "3", "4"):
+            git("update-index", "--index-version", version)
+            self.assertEqual(build.read_git_index(git_dir, common_dir), expected, version)
+
+    def test_query_uses_two_git_calls(self):
+        calls = []
+        real_run = subprocess.run
+
+        def run(command, *args, **kwargs):
+            calls.append(command)
+            return real_run(command, *args, **kwargs)
+
+        with mock.patch.object(build.subprocess, "run", run):
+            self.assertEqual(self.git_info()[0], "v0.1.0")
+        self.assertLessEqual(len(calls), 2, calls)
+
+
+class SourceHashTest(ProjectTestCase):
+    """检查阶段改写源码后, 注入的 sourceHash 按改写后的源码重新计算"""
+
+    def test_plan_uses_rewritten_sources(self):
+        with mock.patch.object(sys, "argv", ["build.py", "-git", "--no-cache"]):
+            args = build.parse_arguments()
+        self.assertTrue(build.get_git_info())
+        plan = build.create_build_plan(args, verbose=False)
+        before = build.hash_source_tree()
+        self.assertIn(f".sourceHash={before}", plan.targets[0].binaries[0].ldflags)
+
+        # 模拟 go fmt 改写源码; 检查结束时会清空指纹缓存
+        write_file("main.go", "package main\n\nfunc main() { println() }\n")
+        build._source_hash_cache["hash"] = None
+        plan = build.with_source_hash(plan)
+        after = build.hash_source_tree()
+        self.assertNotEqual(before, after)
+        ldflags = plan.targets[0].binaries[0].ldflags
+        self.assertIn(f".sourceHash={after}", ldflags)
+        self.assertNotIn(before, ldflags)
+
+
+class BuildPlanTest(ProjectTestCase):
+    """生成构建计划只计算路径, 不在项目中创建文件"""
+
+    def test_plan_does_not_create_output_dir(self):
+        with mock.patch.object(sys, "argv", ["build.py", "-git", "-z", "--plan-json", "-"]):
+            args = build.parse_arguments()
+        self.assertTrue(build.get_git_info())
+        plan = build.create_build_plan(args, verbose=False)
+        self.assertTrue(plan.targets[0].binaries[0].output_file.startswith(build.DEFAULT_OUTPUT_DIR))
+        self.assertFalse(os.path.exists(build.DEFAULT_OUTPUT_DIR))
+
+
+class ArtifactCacheTest(ProjectTestCase):
+    """本地产物缓存: 缓存键的稳定性、命中与未命中、按最近最少使用淘汰"""
+
+    def setUp(self):
+        super().setUp()
+        self.stats = mock.patch.dict(build._cache_stats, {k: 0 for k in build._cache_stats})
+        self.stats.start()
+        self.addCleanup(self.stats.stop)
+        go_version = mock.patch.object(
+            build, "get_go_version", return_value="go version go1.21.0 linux/amd64"
+        )
+        go_version.start()
+        self.addCleanup(go_version.stop)
+
+    def config(self, ldflags="-s -w", **env):
+        return build.BuildConfig(
+            go_compiler="go",
+            output_file="app",
+            ldflags=ldflags,
+            entry_file="main.go",
+            use_vendor_in_build=False,
+            env=dict(build.build_target_env("linux", "amd64"), **env),
+        )
+
+    def key(self, config):
+        self.reset_caches()
+        return build.compute_artifact_key(config, build.prepare_build_env(config))
+
+    def store(self, key, content, mtime):
+        write_file("artifact", content)
+        build.cache_store(key, "artifact")
+        entry = build._cache_entry_path(key)
+        os.utime(entry, (mtime, mtime))
+        return entry
+
+    def test_key_is_stable(self):
+        key = self.key(self.config())
+        self.assertEqual(self.key(self.config()), key)
+        # 非可复现模式下构建时间不影响缓存键
+        self.assertEqual(
+            self.key(self.config("-X 'gitee.com/MM-Q/verman.buildTime=2024-01-01T00:00:00Z'")),
+            self.key(self.config("-X 'gitee.com/MM-Q/verman.buildTime=2025-06-01T12:00:00Z'")),
+        )
+        self.assertNotEqual(self.key(self.config(GOARCH="arm64")), key)
+        write_file("main.go", "package main\n\nfunc main() { println() }\n")
+        self.assertNotEqual(self.key(self.config()), key)
+
+    def test_hit_and_miss(self):
+        key = "ab" + "1" * 62
+        self.assertFalse(build.cache_lookup(key, os.path.join("out", "app")))
+        self.store(key, "binary", time.time())
+        self.assertTrue(build.cache_lookup(key, os.path.join("out", "app")))
+        with open(os.path.join("out", "app"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "binary")
+        self.assertEqual((build._cache_stats["hits"], build._cache_stats["misses"]), (1, 1))
+
+    def test_lru_eviction_order(self):
+        now = time.time()
+        old = self.store("aa" + "0" * 62, "x" * 100, now - 300)
+        used = self.store("bb" + "0" * 62, "x" * 100, now - 200)
+        new = self.store("cc" + "0" * 62, "x" * 100, now - 100)
+        # 命中会刷新访问时间, 被使用过的条目成为最近使用的
+        build.cache_lookup("bb" + "0" * 62, os.path.join("out", "app"))
+        build.evict_cache(250)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(used))
+        self.assertTrue(os.path.exists(new))
+        build.evict_cache(150)
+        self.assertFalse(os.path.exists(new))
+        self.assertTrue(os.path.exists(used))
+        self.assertEqual(build._cache_stats["evictions"], 2)
+
+    def test_store_walks_cache_only_when_over_limit(self):
+        walk = mock.patch.object(build, "list_cache_entries", wraps=build.list_cache_entries)
+        with mock.patch.object(build, "DEFAULT_CACHE_MAX_SIZE", 250), walk as entries:
+            self.store("aa" + "0" * 62, "x" * 100, time.time() - 20)
+            self.store("bb" + "0" * 62, "x" * 100, time.time() - 10)
+            # 首次写入时统计一次总大小, 之后未超出上限时不再遍历缓存目录
+            self.assertEqual(entries.call_count, 1)
+            self.store("cc" + "0" * 62, "x" * 100, time.time())
+            self.assertEqual(entries.call_count, 2)
+        self.assertEqual(build._cache_size["bytes"], 200)
+        self.assertEqual(build._cache_stats["evictions"], 1)
+
+
+class ArchiveTest(ProjectTestCase):
+    """在进程池中打包可执行文件, 检查各归档格式的成员与返回的摘要"""
+
+    CONTENT = "binary content " * 100
+
+    def setUp(self):
+        super().setUp()
+        self.binary = os.path.join(self.root, "myapp")
+
+    def archive(self, archive_format, name, mtime=None):
+        """打包一个新写入的可执行文件(打包成功后可执行文件会被删除)"""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        write_file(self.binary, self.CONTENT)
+        os.chmod(self.binary, 0o700)
+        self.binary_digest = build.hash_file(self.binary)
+        archive_file = os.path.join(self.root, name + build.ARCHIVE_FORMATS[archive_format])
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            result = pool.submit(
+                build.archive_executable, self.binary, archive_file, archive_format, None, True, mtime
+            ).result()
+        self.assertIsNotNone(result)
+        return archive_file, result
+
+    def members(self, archive_file, archive_format):
+        """返回归档中各成员的 (名称, 内容, 权限)"""
+        import tarfile
+        import zipfile
+
+        if archive_format == "zip":
+            with zipfile.ZipFile(archive_file) as zipf:
+                return [
+                    (info.filename, zipf.read(info), (info.external_attr >> 16) & 0o777)
+                    for info in zipf.infolist()
+                ]
+        with tarfile.open(archive_file) as tar:
+            return [
+                (member.name, tar.extractfile(member).read(), member.mode)
+                for member in tar.getmembers()
+            ]
+
+    def test_formats(self):
+        for archive_format in build.ARCHIVE_FORMATS:
+            with self.subTest(archive_format=archive_format):
+                archive_file, result = self.archive(archive_format, f"app-{archive_format}")
+                ((name, data, _),) = self.members(archive_file, archive_format)
+                self.assertEqual((name, data), ("myapp", self.CONTENT.encode("utf-8")))
+                self.assertEqual(result["archive"]["sha256"], build.hash_file(archive_file)["sha256"])
+                self.assertEqual(result["binary"]["sha256"], self.binary_digest["sha256"])
+                self.assertFalse(os.path.exists(self.binary))
+
+    def test_reproducible_archives(self):
+        for archive_format in build.ARCHIVE_FORMATS:
+            with self.subTest(archive_format=archive_format):
+                first, _ = self.archive(archive_format, "first", mtime=1700000000)
+                time.sleep(0.01)
+                second, _ = self.archive(archive_format, "second", mtime=1700000000)
+                with open(first, "rb") as a, open(second, "rb") as b:
+                    self.assertEqual(a.read(), b.read())
+                ((_, _, mode),) = self.members(first, archive_format)
+                self.assertEqual(mode, build.REPRODUCIBLE_FILE_MODE)
+
+
+@unittest.skipUnless(shutil.which("go"), "需要 Go 编译器")
+class ChecksumManifestTest(ProjectTestCase):
+    """批量构建并打包后, SHA256SUMS 与 manifest.json 中的摘要与实际文件一致"""
+
+    def test_batch_archives(self):
+        import tarfile
+
+        with redirect_stdout(io.StringIO()):
+            code = self.run_main(
+                "-git",
+                "-batch",
+                "--batch-platforms", "linux",
+                "--batch-archs", "amd64,arm64",
+                "-z",
+                "--archive-format", "tar.gz",
+                "--no-cache",
+                "--no-warmup",
+                "--no-progress",
+            )
+        self.assertEqual(code, 0)
+        output = build.DEFAULT_OUTPUT_DIR
+        with open(os.path.join(output, build.CHECKSUM_FILE_NAME), encoding="utf-8") as f:
+            sums = dict(reversed(line.split("  ", 1)) for line in f.read().splitlines())
+        self.assertEqual(
+            sorted(sums), [f"myapp_linux_{arch}_v0.1.0.tar.gz" for arch in ("amd64", "arm64")]
+        )
+        with open(os.path.join(output, build.MANIFEST_FILE_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest["version"], "v0.1.0")
+        self.assertEqual(sorted(a["file"] for a in manifest["artifacts"]), sorted(sums))
+        for artifact in manifest["artifacts"]:
+            path = os.path.join(output, artifact["file"])
+            digest = build.hash_file(path)
+            self.assertEqual(sums[artifact["file"]], digest["sha256"])
+            self.assertEqual((artifact["sha256"], artifact["size"]), (digest["sha256"], digest["size"]))
+            with tarfile.open(path) as tar:
+                (member,) = tar.getmembers()
+                content = tar.extractfile(member).read()
+            self.assertEqual(member.name, artifact["binary"]["file"])
+            self.assertEqual(artifact["binary"]["sha256"], hashlib.sha256(content).hexdigest())
+
+
+@unittest.skipUnless(shutil.which("go"), "需要 Go 编译器")
+class CheckCacheTest(ProjectTestCase):
+    """检查结果缓存: 输入未变化时跳过 tidy/fmt/vet, 源码变化或要求重新检查时重新执行"""
+
+    STAGES = ("run_go_mod_tidy", "run_gofmt", "run_code_check")
+
+    def checks(self, **kwargs):
+        """执行一次构建前检查, 返回 (是否通过, 实际执行的阶段)"""
+        calls = []
+        patches = [
+            mock.patch.object(build, name, side_effect=self.recorder(name, calls))
+            for name in self.STAGES
+        ]
+        for patch in patches:
+            patch.start()
+        try:
+            with redirect_stdout(io.StringIO()):
+                ok = build.pre_build_checks("go", "main.go", False, use_check_cache=True, **kwargs)
+        finally:
+            for patch in patches:
+                patch.stop()
+        return ok, calls
+
+    @staticmethod
+    def recorder(name, calls):
+        real = getattr(build, name)
+
+        def run(*args, **kwargs):
+            calls.append(name)
+            return real(*args, **kwargs)
+
+        return run
+
+    def test_unchanged_inputs_hit_cache(self):
+        self.assertEqual(self.checks(), (True, list(self.STAGES)))
+        self.assertEqual(self.checks(), (True, []))
+
+    def test_source_edit_invalidates(self):
+        self.checks()
+        write_file("main_test.go", "package main\n\nimport \"testing\"\n\nfunc TestOther(t *testing.T) {}\n")
+        ok, calls = self.checks()
+        self.assertTrue(ok)
+        self.assertIn("run_code_check", calls)
+        self.assertIn("run_gofmt", calls)
+
+    def test_recheck_forces_stage(self):
+        self.checks()
+        self.assertEqual(self.checks(recheck=("vet",)), (True, ["run_code_check"]))
+
+    def test_cached_failure_is_replayed(self):
+        write_file("main.go", "package main\n\nimport \"fmt\"\n\nfunc main() { fmt.Printf(\"%d\\n\", \"x\") }\n")
+        self.assertEqual(self.checks(), (False, list(self.STAGES)))
+        self.assertEqual(self.checks(), (False, []))
+
+
+class RemoteCacheTestMixin:
+    """远程缓存后端的通用用例: 命中、哈希不一致时忽略、上传中断不留下可用对象"""
+
+    KEY = "ab" + "0" * 62
+
+    def setUp(self):
+        super().setUp()
+        self.artifact = os.path.join(self.root, "artifact")
+        write_file(self.artifact, "binary content")
+        self.output = os.path.join(self.root, "restored")
+        self.stats = mock.patch.dict(build._cache_stats, {k: 0 for k in build._cache_stats})
+        self.stats.start()
+        self.addCleanup(self.stats.stop)
+        self.output_stream = redirect_stdout(io.StringIO())
+        self.output_stream.__enter__()
+        self.addCleanup(self.output_stream.__exit__, None, None, None)
+
+    def lookup(self):
+        return build.remote_cache_lookup(self.backend(), self.KEY, self.output)
+
+    def test_store_then_lookup(self):
+        build.remote_cache_store(self.backend(), self.KEY, self.artifact)
+        self.assertTrue(self.lookup())
+        with open(self.output, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "binary content")
+        self.assertEqual(build._cache_stats["remote_hits"], 1)
+
+    def test_lookup_missing(self):
+        self.assertFalse(self.lookup())
+        self.assertEqual(build._cache_stats["remote_misses"], 1)
+
+    def test_corrupted_object_is_ignored(self):
+        build.remote_cache_store(self.backend(), self.KEY, self.artifact)
+        self.corrupt(f"{self.KEY[:2]}/{self.KEY}")
+        self.assertFalse(self.lookup())
+        self.assertFalse(os.path.exists(self.output))
+        self.assertEqual(build._cache_stats["remote_errors"], 1)
+        self.assertEqual([f for f in os.listdir(self.root) if f.startswith("restored")], [])
+
+    def test_interrupted_upload_leaves_no_object(self):
+        backend = self.backend()
+        with self.interrupted_upload():
+            build.remote_cache_store(backend, self.KEY, self.artifact)
+        self.assertFalse(backend.available)
+        # 元数据在产物之后上传, 产物上传失败时不会出现可被命中的对象
+        self.assertNotIn(f"{self.KEY[:2]}/{self.KEY}.json", self.stored_names())
+        self.assertFalse(self.lookup())
+        self.assertFalse(os.path.exists(self.output))
+
+
+class DirectoryCacheBackendTest(RemoteCacheTestMixin, ProjectTestCase):
+    def backend(self):
+        return build.DirectoryCacheBackend(os.path.join(self.root, "remote"))
+
+    def corrupt(self, name):
+        write_file(os.path.join(self.root, "remote", name), "tampered")
+
+    def interrupted_upload(self):
+        def copyfile(src, dst):
+            # 写入一半后中断
+            with open(src, "rb") as f, open(dst, "wb") as out:
+                out.write(f.read(4))
+            raise OSError("连接中断")
+
+        return mock.patch.object(build.shutil, "copyfile", copyfile)
+
+    def test_interrupted_upload_leaves_no_partial_file(self):
+        with self.interrupted_upload():
+            build.remote_cache_store(self.backend(), self.KEY, self.artifact)
+        self.assertEqual(self.stored_names(), [])
+
+    def stored_names(self):
+        remote = os.path.join(self.root, "remote")
+        return [
+            os.path.relpath(os.path.join(dirpath, f), remote)
+            for dirpath, _, filenames in os.walk(remote)
+            for f in filenames
+        ]
+
+
+class HttpCacheBackendTest(RemoteCacheTestMixin, ProjectTestCase):
+    def setUp(self):
+        super().setUp()
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        objects = self.objects = {}
+        self.fail_puts = False
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                data = objects.get(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_PUT(self):
+                length = int(self.headers["Content-Length"])
+                if test.fail_puts:
+                    # 只收到部分数据时连接中断, 服务端保留了不完整的对象
+                    objects[self.path] = self.rfile.read(min(4, length))
+                    self.close_connection = True
+                    return
+                objects[self.path] = self.rfile.read(length)
+                self.send_response(201)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def backend(self):
+        return build.HttpCacheBackend(f"http://127.0.0.1:{self.server.server_address[1]}/cache/")
+
+    def corrupt(self, name):
+        self.objects[f"/cache/{name}"] = b"tampered"
+
+    def interrupted_upload(self):
+        return mock.patch.object(self, "fail_puts", True)
+
+    def stored_names(self):
+        return sorted(name[len("/cache/") :] for name in self.objects)
+
+
+@unittest.skipUnless(shutil.which("go"), "需要 Go 编译器")
+class AgentTest(ProjectTestCase):
+    """在本机启动两个构建代理, 批量构建的目标分发给两者并取回产物"""
+
+    def setUp(self):
+        super().setUp()
+        self.built = collections.defaultdict(list)
+        # 代理线程与构建过程的输出不显示在测试结果中
+        self.output = io.StringIO()
+        stdout = redirect_stdout(self.output)
+        stdout.__enter__()
+        self.addCleanup(stdout.__exit__, None, None, None)
+        self.servers = [self.start_agent() for _ in range(2)]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        super().tearDown()
+
+    def start_agent(self):
+        server = build.create_agent_server(("127.0.0.1", 0), "go", 1, 1)
+        real_build = server.build
+
+        def counting_build(request, wfile):
+            self.built[server.server_address[1]].append(request["target"]["name"])
+            real_build(request, wfile)
+
+        server.build = counting_build
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def test_targets_spread_across_agents(self):
+        agents = ",".join(f"127.0.0.1:{s.server_address[1]}" for s in self.servers)
+        platforms = ("linux", "windows", "darwin")
+        code = self.run_main(
+            "-batch",
+            "--batch-platforms", ",".join(platforms),
+            "--batch-archs", "amd64,arm64",
+            "--no-cache",
+            "--no-warmup",
+            "--no-progress",
+            "-w", "1",
+            "--agents", agents,
+        )
+        self.assertEqual(code, 0)
+        for server in self.servers:
+            self.assertTrue(self.built[server.server_address[1]], self.built)
+        outputs = os.listdir(build.DEFAULT_OUTPUT_DIR)
+        for system in platforms:
+            for arch in ("amd64", "arm64"):
+                self.assertTrue(any(f"_{system}_{arch}" in name for name in outputs), outputs)
+
+    def test_rejects_wrong_token(self):
+        import socket
+
+        with socket.create_connection(self.servers[0].server_address) as sock:
+            rfile, wfile = sock.makefile("rb"), sock.makefile("wb")
+            challenge = build.read_frame(rfile)["challenge"]
+            build.write_frame(wfile, {"command": "auth", "mac": build.agent_auth_mac("wrong", challenge)})
+            self.assertFalse(build.read_frame(rfile)["ok"])
+            self.assertIsNone(build.read_frame(rfile))
+        self.assertFalse(self.built)
+
+    def test_agent_env_allowlist(self):
+        env = build.build_target_env("linux", "arm64")
+        self.assertEqual(build.agent_target_env(env), {"GOOS": "linux", "GOARCH": "arm64", "CGO_ENABLED": "0"})
+        self.assertIsNone(build.agent_target_env(build.build_target_env("linux", "amd64", ["GOFLAGS=-toolexec=x"])))
+
+
+class FakeWatcher:
+    """按顺序返回预设的事件集合, 之后不再有变化"""
+
+    def __init__(self, *events):
+        self.events = list(events)
+
+    def poll(self, timeout=None):
+        return self.events.pop(0) if self.events else set()
+
+
+class WatchRescanTest(ProjectTestCase):
+    """监视器丢失事件后必须完整重新扫描并重新构建"""
+
+    def known(self):
+        return {rel_path: build._content_digest(path) for path, rel_path in build.iter_source_files()}
+
+    def test_overflow_forces_rebuild(self):
+        changed, _ = build.wait_for_changes(FakeWatcher({build.WATCH_RESCAN}), self.known())
+        self.assertEqual(changed, {build.WATCH_RESCAN})
+
+    def test_overflow_reports_lost_changes(self):
+        known = self.known()
+        write_file("main.go", "package main\n\nfunc main() { println() }\n")
+        write_file("extra.go", "package main\n")
+        changed, _ = build.wait_for_changes(FakeWatcher({build.WATCH_RESCAN}), known)
+        self.assertEqual(changed, {build.WATCH_RESCAN, "main.go", "extra.go"})
+        self.assertEqual(known["extra.go"], build._content_digest("extra.go"))
+
+    def test_check_rewrites_are_not_changes(self):
+        known = self.known()
+        before = build.source_file_stats()
+        # 模拟 go fmt 改写源码
+        write_file("main.go", "package main\n\nfunc main() {}\n\n")
+        touch_later("main.go")
+        build.refresh_rewritten(known, before)
+        self.assertEqual(known["main.go"], build._content_digest("main.go"))
+        # 改写产生的事件被忽略, 只有用户之后的修改触发构建
+        write_file("main_test.go", "package main\n")
+        watcher = FakeWatcher({"main.go"}, set(), {"main_test.go"})
+        self.assertEqual(build.wait_for_changes(watcher, known)[0], {"main_test.go"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,12 +7,16 @@ package verman
 
 /*
 示例编译时注入版本信息:
-go build -ldflags "-X 'gitee.com/MM-Q/verman.appName=myapp' -X 'gitee.com/MM-Q/verman.gitVersion=v1.0.0' -X 'gitee.com/MM-Q/verman.gitCommit=abc1234' -X 'gitee.com/MM-Q/verman.gitTreeState=clean' -X 'gitee.com/MM-Q/verman.gitCommitTime=2024-01-01T12:00:00Z' -X 'gitee.com/MM-Q/verman.buildTime=2024-01-01T12:00:00Z'" main.go
+go build -ldflags "-X 'gitee.com/MM-Q/verman.appName=myapp' -X 'gitee.com/MM-Q/verman.gitVersion=v1.0.0' -X 'gitee.com/MM-Q/verman.gitCommit=abc1234' -X 'gitee.com/MM-Q/verman.gitTreeState=clean' -X 'gitee.com/MM-Q/verman.gitCommitTime=2024-01-01T12:00:00Z' -X 'gitee.com/MM-Q/verman.buildTime=2024-01-01T12:00:00Z' -X 'gitee.com/MM-Q/verman.sourceHash=9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08'" main.go
 */
 
 import (
 	"fmt"
+	"io"
 	"runtime"
+	"strings"
+	"sync/atomic"
+	"unicode/utf8"
 )
 
 // 私有版本信息变量，在编译时注入
@@ -23,6 +27,7 @@ var (
 	gitTreeState  string // Git 仓库状态(如 clean, dirty)
 	gitCommitTime string // Git 提交时间(如 2024-01-01T12:00:00Z)
 	buildTime     string // 构建时间(如 2024-01-01T12:00:00Z)
+	sourceHash    string // 源码树内容指纹(由 build.py --fingerprint 计算)
 )
 
 // Info 版本信息结构体
@@ -33,8 +38,26 @@ type Info struct {
 	GitTreeState  string // Git 仓库状态
 	GitCommitTime string // Git 提交时间
 	BuildTime     string // 构建时间
+	SourceHash    string // 源码树内容指纹
 	GoVersion     string // Go 运行时版本
 	Platform      string // 平台信息
+
+	cache atomic.Value // *formatted，最近一次生成的全部格式化结果
+}
+
+// fields 生成格式化结果所依据的字段快照
+type fields struct {
+	appName, gitVersion, gitCommit, gitTreeState, gitCommitTime string
+	buildTime, sourceHash, goVersion, platform                  string
+}
+
+// formatted 由同一份字段快照生成的全部格式化结果
+type formatted struct {
+	src                                 fields
+	version, simple, full, detail       string
+	complete, banner, table, build, git string
+	json, prometheus                    string
+	compact                             []byte // 紧凑 JSON，供 AppendJSON、WriteTo 与 MarshalJSON 使用，只读
 }
 
 // V 全局版本信息实例，供外部使用
@@ -61,6 +84,9 @@ func init() {
 	if buildTime == "" {
 		buildTime = "unknown"
 	}
+	if sourceHash == "" {
+		sourceHash = "unknown"
+	}
 
 	// 创建全局实例
 	V = &Info{
@@ -70,9 +96,40 @@ func init() {
 		GitTreeState:  gitTreeState,                                       // Git 仓库状态
 		GitCommitTime: gitCommitTime,                                      // Git 提交时间
 		BuildTime:     buildTime,                                          // 构建时间
+		SourceHash:    sourceHash,                                         // 源码树内容指纹
 		GoVersion:     runtime.Version(),                                  // Go 运行时版本
 		Platform:      fmt.Sprintf("%s/%s", runtime.GOOS, runtime.GOARCH), // 平台信息
 	}
+
+	// 注入的版本信息在运行期间不再变化，提前生成全部格式，之后的调用不再分配内存
+	V.formats()
+}
+
+// snapshot 返回当前字段的快照
+func (i *Info) snapshot() fields {
+	return fields{
+		appName:       i.AppName,
+		gitVersion:    i.GitVersion,
+		gitCommit:     i.GitCommit,
+		gitTreeState:  i.GitTreeState,
+		gitCommitTime: i.GitCommitTime,
+		buildTime:     i.BuildTime,
+		sourceHash:    i.SourceHash,
+		goVersion:     i.GoVersion,
+		platform:      i.Platform,
+	}
+}
+
+// formats 返回缓存的格式化结果；首次调用或字段被修改后重新生成。
+// 并发调用时可能重复生成，但结果相同，任一份写入缓存均可。
+func (i *Info) formats() *formatted {
+	src := i.snapshot()
+	if f, ok := i.cache.Load().(*formatted); ok && f.src == src {
+		return f
+	}
+	f := format(src)
+	i.cache.Store(f)
+	return f
 }
 
 // Version 返回格式为"程序名 version 版本号 平台/架构"的字符串
@@ -81,7 +138,7 @@ func init() {
 //
 //	MyApp version v1.0.0 linux/amd64
 func (i *Info) Version() string {
-	return fmt.Sprintf("%s version %s %s", i.AppName, i.GitVersion, i.Platform)
+	return i.formats().version
 }
 
 // Simple 返回格式为"程序名 v1.0.0"的字符串
@@ -90,7 +147,7 @@ func (i *Info) Version() string {
 //
 //	MyApp v1.0.0
 func (i *Info) Simple() string {
-	return fmt.Sprintf("%s %s", i.AppName, i.GitVersion)
+	return i.formats().simple
 }
 
 // Full 返回格式为"程序名 version 版本号 平台/架构 (commit: abc1234)"的字符串
@@ -99,7 +156,7 @@ func (i *Info) Simple() string {
 //
 //	MyApp version v1.0.0 linux/amd64 (commit: abc1234)
 func (i *Info) Full() string {
-	return fmt.Sprintf("%s version %s %s (commit: %s)", i.AppName, i.GitVersion, i.Platform, i.GitCommit)
+	return i.formats().full
 }
 
 // Detail 返回格式为"程序名 v1.0.0 linux/amd64 built at 2024-01-01"的字符串
@@ -108,17 +165,16 @@ func (i *Info) Full() string {
 //
 //	MyApp v1.0.0 linux/amd64 built at 2024-01-01
 func (i *Info) Detail() string {
-	return fmt.Sprintf("%s %s %s built at %s", i.AppName, i.GitVersion, i.Platform, i.BuildTime)
+	return i.formats().detail
 }
 
 // Complete 返回包含所有信息的完整字符串
 //
 // 示例:
 //
-//	MyApp v1.0.0 linux/amd64 (commit: abc1234, tree: clean, built: 2024-01-01T12:00:00Z, go: go1.19)"
+//	MyApp v1.0.0 linux/amd64 (commit: abc1234, tree: clean, source: 9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08, built: 2024-01-01T12:00:00Z, go: go1.19)"
 func (i *Info) Complete() string {
-	return fmt.Sprintf("%s %s %s (commit: %s, tree: %s, built: %s, go: %s)",
-		i.AppName, i.GitVersion, i.Platform, i.GitCommit, i.GitTreeState, i.BuildTime, i.GoVersion)
+	return i.formats().complete
 }
 
 // Banner 返回横幅格式(多行)
@@ -128,8 +184,7 @@ func (i *Info) Complete() string {
 //	MyApp v2.1.0
 //	Platform: linux/amd64 | Go: go1.22.1
 func (i *Info) Banner() string {
-	return fmt.Sprintf(`%s %s
-Platform: %s | Go: %s`, i.AppName, i.GitVersion, i.Platform, i.GoVersion)
+	return i.formats().banner
 }
 
 // Table 返回表格格式(多行)
@@ -141,17 +196,11 @@ Platform: %s | Go: %s`, i.AppName, i.GitVersion, i.Platform, i.GoVersion)
 //	Platform    : linux/amd64
 //	Commit      : a1b2c3d4e5f6
 //	Tree State  : clean
+//	Source Hash : 9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08
 //	Build Time  : 2024-03-15T15:00:00Z
 //	Go Version  : go1.22.1
 func (i *Info) Table() string {
-	return fmt.Sprintf(`Application : %s
-Version     : %s
-Platform    : %s
-Commit      : %s
-Tree State  : %s
-Build Time  : %s
-Go Version  : %s`,
-		i.AppName, i.GitVersion, i.Platform, i.GitCommit, i.GitTreeState, i.BuildTime, i.GoVersion)
+	return i.formats().table
 }
 
 // Build 返回构建信息格式
@@ -161,7 +210,7 @@ Go Version  : %s`,
 //	MyApp v2.1.0
 //	Built at 2024-03-15T15:00:00Z with go1.22.1
 func (i *Info) Build() string {
-	return fmt.Sprintf("%s %s\nBuilt at %s with %s", i.AppName, i.GitVersion, i.BuildTime, i.GoVersion)
+	return i.formats().build
 }
 
 // Git 返回Git信息格式
@@ -171,11 +220,9 @@ func (i *Info) Build() string {
 //	Version: v2.1.0
 //	Commit: a1b2c3d4e5f6 (clean)
 //	Commit Time: 2024-03-15T14:30:00Z
+//	Source Hash: 9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08
 func (i *Info) Git() string {
-	return fmt.Sprintf(`Version: %s
-Commit: %s (%s)
-Commit Time: %s`,
-		i.GitVersion, i.GitCommit, i.GitTreeState, i.GitCommitTime)
+	return i.formats().git
 }
 
 // JSON 返回JSON格式
@@ -189,18 +236,178 @@ Commit Time: %s`,
 //		  "gitTreeState": "clean",
 //		  "gitCommitTime": "2024-03-15T14:30:00Z",
 //		  "buildTime": "2024-03-15T15:00:00Z",
+//		  "sourceHash": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
 //		  "goVersion": "go1.22.1",
 //		  "platform": "linux/amd64"
 //	 }
 func (i *Info) JSON() string {
-	return fmt.Sprintf(`{
-  "appName": "%s",
-  "gitVersion": "%s",
-  "gitCommit": "%s",
-  "gitTreeState": "%s",
-  "gitCommitTime": "%s",
-  "buildTime": "%s",
-  "goVersion": "%s",
-  "platform": "%s"
-}`, i.AppName, i.GitVersion, i.GitCommit, i.GitTreeState, i.GitCommitTime, i.BuildTime, i.GoVersion, i.Platform)
+	return i.formats().json
+}
+
+// Prometheus 返回 Prometheus 文本格式的 build_info 指标，包含 HELP、TYPE 与取值三行，
+// 可直接追加到 /metrics 的输出中
+//
+// 示例:
+//
+//	# HELP build_info Build information of the application.
+//	# TYPE build_info gauge
+//	build_info{app="MyApp",version="v2.1.0",commit="a1b2c3d4e5f6",tree_state="clean",go_version="go1.22.1",platform="linux/amd64"} 1
+func (i *Info) Prometheus() string {
+	return i.formats().prometheus
+}
+
+// AppendJSON 将紧凑格式的 JSON 追加到 dst 并返回扩展后的切片，字段与 JSON() 相同。
+// dst 容量足够时不分配内存，适合在日志或响应缓冲区中直接嵌入版本信息。
+//
+// 示例:
+//
+//	{"appName":"MyApp","gitVersion":"v2.1.0",...,"platform":"linux/amd64"}
+func (i *Info) AppendJSON(dst []byte) []byte {
+	return append(dst, i.formats().compact...)
+}
+
+// WriteTo 将紧凑格式的 JSON 写入 w，实现 io.WriterTo 接口
+func (i *Info) WriteTo(w io.Writer) (int64, error) {
+	n, err := w.Write(i.formats().compact)
+	return int64(n), err
+}
+
+// MarshalJSON 实现 json.Marshaler 接口，输出与 AppendJSON 相同
+func (i *Info) MarshalJSON() ([]byte, error) {
+	return i.AppendJSON(nil), nil
+}
+
+// format 按各方法的格式生成全部字符串
+func format(s fields) *formatted {
+	return &formatted{
+		src:     s,
+		version: fmt.Sprintf("%s version %s %s", s.appName, s.gitVersion, s.platform),
+		simple:  fmt.Sprintf("%s %s", s.appName, s.gitVersion),
+		full:    fmt.Sprintf("%s version %s %s (commit: %s)", s.appName, s.gitVersion, s.platform, s.gitCommit),
+		detail:  fmt.Sprintf("%s %s %s built at %s", s.appName, s.gitVersion, s.platform, s.buildTime),
+		complete: fmt.Sprintf("%s %s %s (commit: %s, tree: %s, source: %s, built: %s, go: %s)",
+			s.appName, s.gitVersion, s.platform, s.gitCommit, s.gitTreeState, s.sourceHash, s.buildTime, s.goVersion),
+		banner: fmt.Sprintf(`%s %s
+Platform: %s | Go: %s`, s.appName, s.gitVersion, s.platform, s.goVersion),
+		table: fmt.Sprintf(`Application : %s
+Version     : %s
+Platform    : %s
+Commit      : %s
+Tree State  : %s
+Source Hash : %s
+Build Time  : %s
+Go Version  : %s`,
+			s.appName, s.gitVersion, s.platform, s.gitCommit, s.gitTreeState, s.sourceHash, s.buildTime, s.goVersion),
+		build: fmt.Sprintf("%s %s\nBuilt at %s with %s", s.appName, s.gitVersion, s.buildTime, s.goVersion),
+		git: fmt.Sprintf(`Version: %s
+Commit: %s (%s)
+Commit Time: %s
+Source Hash: %s`,
+			s.gitVersion, s.gitCommit, s.gitTreeState, s.gitCommitTime, s.sourceHash),
+		json:    string(appendJSON(nil, s, true)),
+		compact: appendJSON(nil, s, false),
+		prometheus: "# HELP build_info Build information of the application.\n" +
+			"# TYPE build_info gauge\n" +
+			"build_info{app=" + quoteLabel(s.appName) +
+			",version=" + quoteLabel(s.gitVersion) +
+			",commit=" + quoteLabel(s.gitCommit) +
+			",tree_state=" + quoteLabel(s.gitTreeState) +
+			",go_version=" + quoteLabel(s.goVersion) +
+			",platform=" + quoteLabel(s.platform) + "} 1\n",
+	}
+}
+
+// labelEscaper 按 Prometheus 文本格式转义标签值中的反斜杠、双引号与换行
+var labelEscaper = strings.NewReplacer(`\`, `\\`, `"`, `\"`, "\n", `\n`)
+
+// quoteLabel 返回加上双引号并转义后的标签值
+func quoteLabel(value string) string {
+	return `"` + labelEscaper.Replace(value) + `"`
+}
+
+// appendJSON 将字段快照编码为 JSON 追加到 dst；indent 为 true 时每个字段一行并缩进两个空格
+func appendJSON(dst []byte, s fields, indent bool) []byte {
+	pairs := [...]struct{ key, value string }{
+		{"appName", s.appName},
+		{"gitVersion", s.gitVersion},
+		{"gitCommit", s.gitCommit},
+		{"gitTreeState", s.gitTreeState},
+		{"gitCommitTime", s.gitCommitTime},
+		{"buildTime", s.buildTime},
+		{"sourceHash", s.sourceHash},
+		{"goVersion", s.goVersion},
+		{"platform", s.platform},
+	}
+
+	dst = append(dst, '{')
+	for n, p := range pairs {
+		if n > 0 {
+			dst = append(dst, ',')
+		}
+		if indent {
+			dst = append(dst, "\n  "...)
+		}
+		dst = appendQuoted(dst, p.key)
+		dst = append(dst, ':')
+		if indent {
+			dst = append(dst, ' ')
+		}
+		dst = appendQuoted(dst, p.value)
+	}
+	if indent {
+		dst = append(dst, '\n')
+	}
+	return append(dst, '}')
+}
+
+// hexDigits 用于 \u00XX 转义
+const hexDigits = "0123456789abcdef"
+
+// appendQuoted 将 s 编码为 JSON 字符串追加到 dst，转义规则与 encoding/json 一致:
+// 引号、反斜杠与控制字符转义，<、>、& 及 U+2028、U+2029 转为 \uXXXX，非法 UTF-8 替换为 \ufffd
+func appendQuoted(dst []byte, s string) []byte {
+	dst = append(dst, '"')
+	start := 0
+	for i := 0; i < len(s); {
+		if b := s[i]; b < utf8.RuneSelf {
+			if b >= 0x20 && b != '"' && b != '\\' && b != '<' && b != '>' && b != '&' {
+				i++
+				continue
+			}
+			dst = append(dst, s[start:i]...)
+			switch b {
+			case '"', '\\':
+				dst = append(dst, '\\', b)
+			case '\n':
+				dst = append(dst, '\\', 'n')
+			case '\r':
+				dst = append(dst, '\\', 'r')
+			case '\t':
+				dst = append(dst, '\\', 't')
+			default:
+				dst = append(dst, '\\', 'u', '0', '0', hexDigits[b>>4], hexDigits[b&0xF])
+			}
+			i++
+			start = i
+			continue
+		}
+		r, size := utf8.DecodeRuneInString(s[i:])
+		if r == utf8.RuneError && size == 1 {
+			dst = append(dst, s[start:i]...)
+			dst = append(dst, `\ufffd`...)
+			i += size
+			start = i
+			continue
+		}
+		if r == '\u2028' || r == '\u2029' {
+			dst = append(dst, s[start:i]...)
+			dst = append(dst, '\\', 'u', '2', '0', '2', hexDigits[r&0xF])
+			i += size
+			start = i
+			continue
+		}
+		i += size
+	}
+	dst = append(dst, s[start:]...)
+	return append(dst, '"')
 }
@@ -1,7 +1,11 @@
 package verman
 
 import (
+	"bytes"
+	"encoding/json"
 	"fmt"
+	"io"
+	"strings"
 	"testing"
 )
 
@@ -15,6 +19,7 @@ func TestAllFormats(t *testing.T) {
 		GitTreeState:  "clean",
 		GitCommitTime: "2024-03-15T14:30:00Z",
 		BuildTime:     "2024-03-15T15:00:00Z",
+		SourceHash:    "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
 		GoVersion:     "go1.22.1",
 		Platform:      "linux/amd64",
 	}
@@ -106,6 +111,13 @@ func TestAllFormats(t *testing.T) {
 			t.Errorf("%s() returned too short string: %q", name, result)
 		}
 	}
+
+	// 验证包含构建来源的格式都输出了源码树指纹
+	for _, name := range []string{"Complete", "Git", "Table", "JSON"} {
+		if !strings.Contains(formats[name], info.SourceHash) {
+			t.Errorf("%s() does not contain source hash: %q", name, formats[name])
+		}
+	}
 }
 
 // TestGlobalInstance 测试全局实例 V
@@ -151,46 +163,235 @@ func TestEdgeCases(t *testing.T) {
 	fmt.Printf("Table():\n%s\n", partialInfo.Table())
 }
 
-// BenchmarkAllMethods 性能基准测试
-func BenchmarkAllMethods(b *testing.B) {
-	info := &Info{
+// TestFormatCache 测试格式化结果的缓存: 重复调用不分配内存, 字段修改后重新生成
+func TestFormatCache(t *testing.T) {
+	info := newBenchInfo()
+	for name, method := range allMethods(info) {
+		first := method()
+		if allocs := testing.AllocsPerRun(100, func() { method() }); allocs != 0 {
+			t.Errorf("%s() allocates %.0f times per call after the first call", name, allocs)
+		}
+		if method() != first {
+			t.Errorf("%s() returned a different result on the second call", name)
+		}
+	}
+
+	// 全局实例在 init 中已生成全部格式, 首次调用也不分配内存
+	if allocs := testing.AllocsPerRun(100, func() { V.Complete() }); allocs != 0 {
+		t.Errorf("V.Complete() allocates %.0f times per call", allocs)
+	}
+
+	// 修改字段后缓存失效, 输出新的值
+	info.GitVersion = "v9.9.9"
+	if got := info.Simple(); got != "BenchApp v9.9.9" {
+		t.Errorf("Simple() after field change = %q, want %q", got, "BenchApp v9.9.9")
+	}
+}
+
+// TestJSONEscaping 测试 JSON 输出的转义与 encoding/json 一致, 且各输出方式结果相同
+func TestJSONEscaping(t *testing.T) {
+	info := newBenchInfo()
+	info.AppName = `My "App" \ <beta> & co`
+	info.GitVersion = "v1.0.0\n\t\x01"
+	info.GitCommit = "caf\xe9\u2028"
+
+	want, err := json.Marshal(struct {
+		AppName       string `json:"appName"`
+		GitVersion    string `json:"gitVersion"`
+		GitCommit     string `json:"gitCommit"`
+		GitTreeState  string `json:"gitTreeState"`
+		GitCommitTime string `json:"gitCommitTime"`
+		BuildTime     string `json:"buildTime"`
+		SourceHash    string `json:"sourceHash"`
+		GoVersion     string `json:"goVersion"`
+		Platform      string `json:"platform"`
+	}{info.AppName, info.GitVersion, info.GitCommit, info.GitTreeState, info.GitCommitTime,
+		info.BuildTime, info.SourceHash, info.GoVersion, info.Platform})
+	if err != nil {
+		t.Fatal(err)
+	}
+
+	if got := info.AppendJSON([]byte("prefix:")); string(got) != "prefix:"+string(want) {
+		t.Errorf("AppendJSON() = %s, want %s", got, want)
+	}
+
+	var buf bytes.Buffer
+	if n, err := info.WriteTo(&buf); err != nil || n != int64(len(want)) || buf.String() != string(want) {
+		t.Errorf("WriteTo() = %d, %v, %s, want %s", n, err, buf.String(), want)
+	}
+
+	if got, err := json.Marshal(info); err != nil || string(got) != string(want) {
+		t.Errorf("json.Marshal() = %s, %v, want %s", got, err, want)
+	}
+
+	// JSON() 是同一内容的缩进格式
+	var indented bytes.Buffer
+	if err := json.Indent(&indented, want, "", "  "); err != nil {
+		t.Fatal(err)
+	}
+	if info.JSON() != indented.String() {
+		t.Errorf("JSON() = %s, want %s", info.JSON(), indented.String())
+	}
+
+	var decoded map[string]string
+	if err := json.Unmarshal([]byte(info.JSON()), &decoded); err != nil {
+		t.Fatalf("JSON() is not valid JSON: %v", err)
+	}
+	if decoded["appName"] != info.AppName || decoded["gitVersion"] != info.GitVersion {
+		t.Errorf("JSON() round trip = %q, %q", decoded["appName"], decoded["gitVersion"])
+	}
+
+	// 调用方修改 MarshalJSON 的返回值不影响缓存
+	out, _ := info.MarshalJSON()
+	out[0] = 'x'
+	if got := info.AppendJSON(nil); got[0] != '{' {
+		t.Errorf("MarshalJSON() result shares memory with the cache")
+	}
+
+	// 容量足够时追加不分配内存
+	dst := make([]byte, 0, 1024)
+	if allocs := testing.AllocsPerRun(100, func() { info.AppendJSON(dst[:0]) }); allocs != 0 {
+		t.Errorf("AppendJSON() allocates %.0f times per call", allocs)
+	}
+}
+
+// TestPrometheus 测试 build_info 指标的格式与标签值转义
+func TestPrometheus(t *testing.T) {
+	info := newBenchInfo()
+	want := `# HELP build_info Build information of the application.
+# TYPE build_info gauge
+build_info{app="BenchApp",version="v1.0.0",commit="abc123",tree_state="clean",go_version="go1.22.0",platform="linux/amd64"} 1
+`
+	if got := info.Prometheus(); got != want {
+		t.Errorf("Prometheus() = %q, want %q", got, want)
+	}
+
+	info.AppName = "a\\b\"c\nd"
+	if got := info.Prometheus(); !strings.Contains(got, `app="a\\b\"c\nd"`) {
+		t.Errorf("Prometheus() did not escape label value: %q", got)
+	}
+}
+
+// newBenchInfo 创建基准测试使用的 Info
+func newBenchInfo() *Info {
+	return &Info{
 		AppName:       "BenchApp",
 		GitVersion:    "v1.0.0",
 		GitCommit:     "abc123",
 		GitTreeState:  "clean",
 		GitCommitTime: "2024-01-01T12:00:00Z",
 		BuildTime:     "2024-01-01T12:30:00Z",
+		SourceHash:    "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
 		GoVersion:     "go1.22.0",
 		Platform:      "linux/amd64",
 	}
+}
+
+// allMethods 返回 Info 的全部格式化方法
+func allMethods(info *Info) map[string]func() string {
+	return map[string]func() string{
+		"Simple":     info.Simple,
+		"Version":    info.Version,
+		"Full":       info.Full,
+		"Detail":     info.Detail,
+		"Complete":   info.Complete,
+		"Banner":     info.Banner,
+		"Build":      info.Build,
+		"Git":        info.Git,
+		"Table":      info.Table,
+		"JSON":       info.JSON,
+		"Prometheus": info.Prometheus,
+	}
+}
+
+// BenchmarkAllMethods 性能基准测试
+func BenchmarkAllMethods(b *testing.B) {
+	info := newBenchInfo()
+
+	for _, name := range []string{"Simple", "Version", "Full", "Detail", "Complete", "Banner", "Build", "Git", "Table", "JSON", "Prometheus"} {
+		method := allMethods(info)[name]
+		b.Run(name, func(b *testing.B) {
+			b.ReportAllocs()
+			for i := 0; i < b.N; i++ {
+				method()
+			}
+		})
+	}
+}
 
-	b.Run("Simple", func(b *testing.B) {
+// BenchmarkParallel 并发访问基准测试, 模拟服务在每个请求中读取版本信息
+func BenchmarkParallel(b *testing.B) {
+	b.Run("Global", func(b *testing.B) {
+		b.ReportAllocs()
+		b.RunParallel(func(pb *testing.PB) {
+			for pb.Next() {
+				V.Version()
+				V.JSON()
+			}
+		})
+	})
+
+	b.Run("Shared", func(b *testing.B) {
+		info := newBenchInfo()
+		b.ReportAllocs()
+		b.RunParallel(func(pb *testing.PB) {
+			for pb.Next() {
+				info.Complete()
+				info.Table()
+			}
+		})
+	})
+}
+
+// BenchmarkUncached 字段每次都变化时的生成开销, 作为缓存命中的对照
+func BenchmarkUncached(b *testing.B) {
+	info := newBenchInfo()
+	versions := []string{"v1.0.0", "v1.0.1"}
+	b.ReportAllocs()
+	for i := 0; i < b.N; i++ {
+		info.GitVersion = versions[i%2]
+		info.Complete()
+	}
+}
+
+// BenchmarkJSONOutput 对比 JSON() 与 AppendJSON、WriteTo、MarshalJSON 等输出方式
+func BenchmarkJSONOutput(b *testing.B) {
+	info := newBenchInfo()
+
+	b.Run("JSON", func(b *testing.B) {
+		b.ReportAllocs()
+		var buf []byte
 		for i := 0; i < b.N; i++ {
-			info.Simple()
+			buf = append(buf[:0], info.JSON()...)
 		}
 	})
 
-	b.Run("Version", func(b *testing.B) {
+	b.Run("AppendJSON", func(b *testing.B) {
+		b.ReportAllocs()
+		var buf []byte
 		for i := 0; i < b.N; i++ {
-			info.Version()
+			buf = info.AppendJSON(buf[:0])
 		}
 	})
 
-	b.Run("Complete", func(b *testing.B) {
+	b.Run("WriteTo", func(b *testing.B) {
+		b.ReportAllocs()
 		for i := 0; i < b.N; i++ {
-			info.Complete()
+			info.WriteTo(io.Discard)
 		}
 	})
 
-	b.Run("JSON", func(b *testing.B) {
+	b.Run("MarshalJSON", func(b *testing.B) {
+		b.ReportAllocs()
 		for i := 0; i < b.N; i++ {
-			info.JSON()
+			info.MarshalJSON()
 		}
 	})
 
-	b.Run("Table", func(b *testing.B) {
+	b.Run("EncodingJSON", func(b *testing.B) {
+		b.ReportAllocs()
 		for i := 0; i < b.N; i++ {
-			info.Table()
+			json.Marshal(info)
 		}
 	})
 }
@@ -0,0 +1,150 @@
+// Package vermanhttp 提供输出 verman 版本信息的 http.Handler。
+//
+// 响应体、ETag 与响应头在创建处理器时一次生成，之后每个请求只写出预先生成的内容，
+// 负载均衡器的高频健康检查几乎没有额外开销。带有匹配 If-None-Match 的请求返回 304。
+//
+// 单独成包是为了让只引用 verman 的命令行程序不必链接 net/http。
+//
+// 示例:
+//
+//	http.Handle("/version", vermanhttp.Handler(nil))
+//	http.Handle("/metrics/build_info", vermanhttp.MetricsHandler(nil))
+package vermanhttp
+
+import (
+	"crypto/sha256"
+	"encoding/hex"
+	"net/http"
+	"strconv"
+
+	"gitee.com/MM-Q/verman"
+)
+
+// 响应的内容类型
+const (
+	jsonContentType    = "application/json; charset=utf-8"
+	metricsContentType = "text/plain; version=0.0.4; charset=utf-8"
+)
+
+// handler 输出固定响应体的处理器
+type handler struct {
+	body []byte // 响应体
+	etag string // 强 ETag，含双引号
+
+	// 预先构造的响应头取值，每个请求直接放入 Header，不再分配内存
+	etagHeader       []string
+	contentType      []string
+	contentLength    []string
+	cacheControl     []string
+	allowHeader      []string
+	notAllowedBody   []byte
+	notAllowedLength []string
+}
+
+// Handler 返回以紧凑 JSON 输出 info 的处理器，内容与 info.AppendJSON 相同。
+// info 为 nil 时使用全局实例 verman.V；创建之后再修改 info 的字段不会反映到响应中。
+func Handler(info *verman.Info) http.Handler {
+	if info == nil {
+		info = verman.V
+	}
+	return newHandler(info.AppendJSON(nil), jsonContentType)
+}
+
+// MetricsHandler 返回以 Prometheus 文本格式输出 build_info 指标的处理器，内容与 info.Prometheus() 相同。
+// info 为 nil 时使用全局实例 verman.V；创建之后再修改 info 的字段不会反映到响应中。
+func MetricsHandler(info *verman.Info) http.Handler {
+	if info == nil {
+		info = verman.V
+	}
+	return newHandler([]byte(info.Prometheus()), metricsContentType)
+}
+
+// newHandler 根据响应体生成 ETag 与全部响应头
+func newHandler(body []byte, contentType string) *handler {
+	sum := sha256.Sum256(body)
+	etag := `"` + hex.EncodeToString(sum[:16]) + `"`
+	notAllowed := []byte(http.StatusText(http.StatusMethodNotAllowed) + "\n")
+	return &handler{
+		body:             body,
+		etag:             etag,
+		etagHeader:       []string{etag},
+		contentType:      []string{contentType},
+		contentLength:    []string{strconv.Itoa(len(body))},
+		cacheControl:     []string{"no-cache"},
+		allowHeader:      []string{"GET, HEAD"},
+		notAllowedBody:   notAllowed,
+		notAllowedLength: []string{strconv.Itoa(len(notAllowed))},
+	}
+}
+
+// ServeHTTP 只接受 GET 与 HEAD 请求；If-None-Match 与 ETag 匹配时返回 304
+func (h *handler) ServeHTTP(w http.ResponseWriter, r *http.Request) {
+	header := w.Header()
+	if r.Method != http.MethodGet && r.Method != http.MethodHead {
+		header["Allow"] = h.allowHeader
+		header["Content-Type"] = []string{"text/plain; charset=utf-8"}
+		header["Content-Length"] = h.notAllowedLength
+		w.WriteHeader(http.StatusMethodNotAllowed)
+		w.Write(h.notAllowedBody)
+		return
+	}
+
+	// Header 的键使用规范形式，可直接赋值而无需经过 Header.Set
+	header["Etag"] = h.etagHeader
+	header["Cache-Control"] = h.cacheControl
+	if inm := r.Header["If-None-Match"]; len(inm) > 0 && matchETag(inm, h.etag) {
+		w.WriteHeader(http.StatusNotModified)
+		return
+	}
+
+	header["Content-Type"] = h.contentType
+	header["Content-Length"] = h.contentLength
+	w.WriteHeader(http.StatusOK)
+	if r.Method != http.MethodHead {
+		w.Write(h.body)
+	}
+}
+
+// matchETag 判断 If-None-Match 的取值中是否有与 etag 匹配的条目。
+// 按 RFC 9110 对 If-None-Match 使用弱比较: 忽略 W/ 前缀，"*" 匹配任意实体；格式错误的条目被忽略。
+func matchETag(values []string, etag string) bool {
+	for _, value := range values {
+		for len(value) > 0 {
+			// 跳过分隔符与空白
+			if c := value[0]; c == ',' || c == ' ' || c == '\t' {
+				value = value[1:]
+				continue
+			}
+			if value[0] == '*' {
+				return true
+			}
+			if len(value) >= 2 && value[0] == 'W' && value[1] == '/' {
+				value = value[2:]
+			}
+
+			// 取出一个条目: 带引号时到闭合引号为止，否则到下一个逗号为止
+			end := 0
+			if len(value) > 0 && value[0] == '"' {
+				end = 1
+				for end < len(value) && value[end] != '"' {
+					end++
+				}
+				if end < len(value) {
+					end++
+				}
+			}
+			for end < len(value) && value[end] != ',' {
+				end++
+			}
+			entry := value[:end]
+			for len(entry) > 0 && (entry[len(entry)-1] == ' ' || entry[len(entry)-1] == '\t') {
+				entry = entry[:len(entry)-1]
+			}
+			if entry == etag {
+				return true
+			}
+			value = value[end:]
+		}
+	}
+	return false
+}
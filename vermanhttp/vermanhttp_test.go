@@ -0,0 +1,167 @@
+package vermanhttp
+
+import (
+	"net/http"
+	"net/http/httptest"
+	"testing"
+
+	"gitee.com/MM-Q/verman"
+)
+
+// newTestInfo 创建测试使用的 Info
+func newTestInfo() *verman.Info {
+	return &verman.Info{
+		AppName:       "TestApp",
+		GitVersion:    "v1.2.3",
+		GitCommit:     "abc123",
+		GitTreeState:  "clean",
+		GitCommitTime: "2024-01-01T12:00:00Z",
+		BuildTime:     "2024-01-01T12:30:00Z",
+		SourceHash:    "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+		GoVersion:     "go1.22.0",
+		Platform:      "linux/amd64",
+	}
+}
+
+// serve 发送一次请求并返回响应
+func serve(h http.Handler, method, ifNoneMatch string) *httptest.ResponseRecorder {
+	r := httptest.NewRequest(method, "/version", nil)
+	if ifNoneMatch != "" {
+		r.Header.Set("If-None-Match", ifNoneMatch)
+	}
+	w := httptest.NewRecorder()
+	h.ServeHTTP(w, r)
+	return w
+}
+
+// TestHandler 测试版本信息处理器的响应体、响应头与 304 处理
+func TestHandler(t *testing.T) {
+	info := newTestInfo()
+	h := Handler(info)
+
+	w := serve(h, http.MethodGet, "")
+	if w.Code != http.StatusOK {
+		t.Fatalf("GET status = %d, want 200", w.Code)
+	}
+	if got, want := w.Body.String(), string(info.AppendJSON(nil)); got != want {
+		t.Errorf("GET body = %s, want %s", got, want)
+	}
+	if got := w.Header().Get("Content-Type"); got != jsonContentType {
+		t.Errorf("Content-Type = %q", got)
+	}
+	etag := w.Header().Get("ETag")
+	if len(etag) < 3 || etag[0] != '"' || etag[len(etag)-1] != '"' {
+		t.Fatalf("ETag = %q, want a strong quoted tag", etag)
+	}
+
+	// 相同内容的处理器生成相同的 ETag, 多个实例之间可以互相验证
+	if other := serve(Handler(newTestInfo()), http.MethodGet, "").Header().Get("ETag"); other != etag {
+		t.Errorf("ETag differs between handlers with identical content: %q vs %q", other, etag)
+	}
+
+	for _, inm := range []string{etag, "W/" + etag, `"other", ` + etag, "*", `bad, ` + etag} {
+		w := serve(h, http.MethodGet, inm)
+		if w.Code != http.StatusNotModified {
+			t.Errorf("If-None-Match %q: status = %d, want 304", inm, w.Code)
+		}
+		if w.Body.Len() != 0 {
+			t.Errorf("If-None-Match %q: 304 response has a body", inm)
+		}
+		if w.Header().Get("ETag") != etag {
+			t.Errorf("If-None-Match %q: 304 response is missing the ETag", inm)
+		}
+	}
+
+	for _, inm := range []string{`"other"`, etag[:len(etag)-1], `W/"x", "y"`} {
+		if w := serve(h, http.MethodGet, inm); w.Code != http.StatusOK {
+			t.Errorf("If-None-Match %q: status = %d, want 200", inm, w.Code)
+		}
+	}
+
+	head := serve(h, http.MethodHead, "")
+	if head.Code != http.StatusOK || head.Body.Len() != 0 {
+		t.Errorf("HEAD status = %d, body length = %d", head.Code, head.Body.Len())
+	}
+
+	post := serve(h, http.MethodPost, "")
+	if post.Code != http.StatusMethodNotAllowed || post.Header().Get("Allow") != "GET, HEAD" {
+		t.Errorf("POST status = %d, Allow = %q", post.Code, post.Header().Get("Allow"))
+	}
+
+	// 内容变化时 ETag 也随之变化
+	info.GitVersion = "v1.2.4"
+	if changed := serve(Handler(info), http.MethodGet, etag); changed.Code != http.StatusOK || changed.Header().Get("ETag") == etag {
+		t.Errorf("ETag did not change with content")
+	}
+}
+
+// TestMetricsHandler 测试 build_info 指标处理器
+func TestMetricsHandler(t *testing.T) {
+	info := newTestInfo()
+	w := serve(MetricsHandler(info), http.MethodGet, "")
+	if w.Code != http.StatusOK {
+		t.Fatalf("status = %d, want 200", w.Code)
+	}
+	if got := w.Body.String(); got != info.Prometheus() {
+		t.Errorf("body = %q, want %q", got, info.Prometheus())
+	}
+	if got := w.Header().Get("Content-Type"); got != metricsContentType {
+		t.Errorf("Content-Type = %q", got)
+	}
+
+	// 未指定 info 时使用全局实例
+	if got := serve(MetricsHandler(nil), http.MethodGet, "").Body.String(); got != verman.V.Prometheus() {
+		t.Errorf("MetricsHandler(nil) body = %q", got)
+	}
+}
+
+// discardWriter 复用响应头的 ResponseWriter, 基准测试中排除记录器本身的开销
+type discardWriter struct {
+	header http.Header
+}
+
+func (w *discardWriter) Header() http.Header         { return w.header }
+func (w *discardWriter) Write(b []byte) (int, error) { return len(b), nil }
+func (w *discardWriter) WriteHeader(int)             {}
+
+// BenchmarkHandler 健康检查式的高频请求基准测试
+func BenchmarkHandler(b *testing.B) {
+	h := Handler(nil)
+	etag := serve(h, http.MethodGet, "").Header().Get("ETag")
+
+	for _, bc := range []struct {
+		name        string
+		ifNoneMatch string
+	}{
+		{"OK", ""},
+		{"NotModified", etag},
+	} {
+		b.Run(bc.name, func(b *testing.B) {
+			r := httptest.NewRequest(http.MethodGet, "/version", nil)
+			if bc.ifNoneMatch != "" {
+				r.Header.Set("If-None-Match", bc.ifNoneMatch)
+			}
+			w := &discardWriter{header: http.Header{}}
+			b.ReportAllocs()
+			b.ResetTimer()
+			for i := 0; i < b.N; i++ {
+				h.ServeHTTP(w, r)
+			}
+		})
+	}
+
+	// 对照: 每个请求调用 verman.V.JSON() 的常见手写处理器
+	b.Run("HandWritten", func(b *testing.B) {
+		handWritten := http.HandlerFunc(func(w http.ResponseWriter, r *http.Request) {
+			w.Header().Set("Content-Type", "application/json")
+			w.Write([]byte(verman.V.JSON()))
+		})
+		r := httptest.NewRequest(http.MethodGet, "/version", nil)
+		w := &discardWriter{header: http.Header{}}
+		b.ReportAllocs()
+		b.ResetTimer()
+		for i := 0; i < b.N; i++ {
+			handWritten.ServeHTTP(w, r)
+		}
+	})
+}